@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 {
     'name': 'MakiPartner API Extensions',
-    'version': '1.0.0',
+    'version': '1.1.0',
     'category': 'API',
     'summary': 'APIs personalizadas para el frontend de MakiPartner',
     'description': """
@@ -32,6 +32,7 @@
         'security/ir.model.access.csv',
         'security/security.xml',
         'data/rate_limit_data.xml',
+        'data/ir_cron_data.xml',
     ],
     'external_dependencies': {
         'python': ['PyJWT', 'redis', 'ratelimit']
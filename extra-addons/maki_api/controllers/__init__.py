@@ -7,4 +7,6 @@ from . import sales
 from . import crm
 from . import hr
 from . import inventory
-from . import projects
\ No newline at end of file
+from . import projects
+from . import sync
+from . import images
\ No newline at end of file
@@ -1,27 +1,32 @@
 # -*- coding: utf-8 -*-
 import json
 import jwt
+import uuid
 import hashlib
 import logging
 from datetime import datetime, timedelta
 
-from odoo import http, fields
+from odoo import http, fields, SUPERUSER_ID
 from odoo.http import request, Response
 from odoo.exceptions import AccessError, ValidationError
 from odoo.tools import config
 from odoo.addons.auth_signup.models.res_users import SignupError
 
-from .main import MakiAPIController, rate_limit, log_api_call
+from .main import MakiAPIController, rate_limit, log_api_call, stateless
+from ..tools.jwt_auth import token_cache
 
 _logger = logging.getLogger(__name__)
 
 class AuthController(MakiAPIController):
     """Controlador de autenticación con JWT"""
     
-    def _generate_jwt_token(self, user, token_type='access'):
-        """Generate a JWT token for the given user"""
-        secret_key = request.env['ir.config_parameter'].sudo().get_param('maki_api.jwt_secret_key')
+    def _generate_jwt_token(self, user, token_type='access', family=None, profile=None):
+        """Generate a JWT token for the given user
         
+        Access tokens embed the user's profile (see res.users._get_token_profile).
+        Refresh tokens carry a family id (`fam`) shared by all the refresh
+        tokens obtained from the same login through rotation.
+        """
         # Set expiration based on token type
         if token_type == 'access':
             # Access tokens expire in 1 hour
@@ -41,15 +46,44 @@ class AuthController(MakiAPIController):
             'jti': token_id  # JWT ID (unique identifier for this token)
         }
         
-        return jwt.encode(payload, secret_key, algorithm='HS256')
+        if token_type == 'refresh':
+            payload['fam'] = family or token_id  # refresh token family
+        else:
+            payload.update(profile or user.sudo()._get_token_profile())
+        
+        return request.env['maki_api.jwt_keys'].sudo().encode_token(payload)
+    
+    def _get_profile_data(self, user_id, profile):
+        """Datos del usuario a partir del perfil de su token, sin leer el usuario"""
+        groups, companies = request.env['res.users'].sudo()._get_token_profile_catalog()
+        return {
+            'id': user_id,
+            'name': profile.get('name'),
+            'login': profile.get('login'),
+            'email': profile.get('email'),
+            'company': {
+                'id': profile['cid'],
+                'name': companies.get(profile['cid'])
+            } if profile.get('cid') else None,
+            'groups': [{
+                'id': group_id,
+                'name': groups[group_id][0],
+                'category': groups[group_id][1]
+            } for group_id in profile.get('gids', []) if group_id in groups],
+            'is_admin': profile.get('adm', False),
+            'last_login': profile.get('ll'),
+            'timezone': profile.get('tz') or 'UTC',
+            'language': profile.get('lang') or 'en_US'
+        }
     
     def _generate_refresh_token(self, user):
         """Generate a refresh token for the user"""
         return self._generate_jwt_token(user, token_type='refresh')
     
     @http.route('/api/v1/auth/login', type='http', auth='none', methods=['POST'], csrf=False)
+    @stateless
     @rate_limit()
-    @log_api_call()
+    @log_api_call
     def login(self, **kw):
         """Login endpoint that returns JWT tokens"""
         try:
@@ -69,9 +103,12 @@ class AuthController(MakiAPIController):
             if not login or not password:
                 return self._error_response('Missing credentials', 400)
             
-            # Authenticate user
+            # Authenticate user (sin sesión: la API solo usa tokens; maki_api_login
+            # hace que el login se registre en diferido, ver res.users._login)
             try:
-                uid = request.session.authenticate(request.session.db, login, password)
+                uid = request.env['res.users'].authenticate(
+                    request.db, login, password, {'interactive': True, 'maki_api_login': True}
+                )
             except Exception as e:
                 _logger.error(f"Authentication error: {str(e)}")
                 return self._error_response('Authentication failed', 401)
@@ -85,25 +122,26 @@ class AuthController(MakiAPIController):
             if not user.active:
                 return self._error_response('Account is disabled', 403)
                 
-            # Generate tokens
-            access_token = self._generate_jwt_token(user, 'access')
+            # Generate tokens (el último login lo registra en diferido
+            # res.users._update_last_login al autenticar)
+            profile = user._get_token_profile()
+            profile['ll'] = fields.Datetime.now().isoformat()
+            access_token = self._generate_jwt_token(user, 'access', profile=profile)
             refresh_token = self._generate_jwt_token(user, 'refresh')
             
-            # Update last login
-            user.write({'login_date': fields.Datetime.now()})
-            
             # Prepare user data for response
+            profile_data = self._get_profile_data(user.id, profile)
             user_data = {
                 'id': user.id,
-                'name': user.name,
-                'login': user.login,
-                'email': user.email,
-                'company': user.company_id.name if user.company_id else None,
-                'groups': [group.name for group in user.groups_id],
-                'is_admin': user.has_group('base.group_system'),
-                'last_login': user.login_date.isoformat() if user.login_date else None,
-                'tz': user.tz,
-                'lang': user.lang
+                'name': profile['name'],
+                'login': profile['login'],
+                'email': profile['email'],
+                'company': profile_data['company']['name'] if profile_data['company'] else None,
+                'groups': [group['name'] for group in profile_data['groups']],
+                'is_admin': profile['adm'],
+                'last_login': profile['ll'],
+                'tz': profile['tz'],
+                'lang': profile['lang']
             }
             
             return self._success_response({
@@ -119,8 +157,9 @@ class AuthController(MakiAPIController):
             return self._error_response(f'Server error: {str(e)}', 500)
     
     @http.route('/api/v1/auth/refresh', type='http', auth='none', methods=['POST'], csrf=False)
+    @stateless
     @rate_limit()
-    @log_api_call()
+    @log_api_call
     def refresh(self, **kw):
         """Endpoint to refresh the access token using a refresh token"""
         try:
@@ -141,22 +180,13 @@ class AuthController(MakiAPIController):
             
             # Decode and validate the refresh token
             try:
-                # First decode without verification to get the JTI
-                unverified_payload = jwt.decode(refresh_token, options={"verify_signature": False})
-                jti = unverified_payload.get('jti')
+                # Verify the token with the same key registry that signed it
+                payload = request.env['maki_api.jwt_keys'].sudo().decode_token(refresh_token)
+                jti = payload.get('jti')
                 
                 if not jti:
                     return self._error_response('Invalid token format', 400)
                 
-                # Check if token is blacklisted
-                TokenBlacklist = request.env['maki_api.token_blacklist'].sudo()
-                if TokenBlacklist.search([('jti', '=', jti)]):
-                    return self._error_response('Token has been revoked', 401)
-                
-                # Now verify the token
-                secret_key = config.get('jwt_refresh_secret_key', 'your-refresh-secret-key')
-                payload = jwt.decode(refresh_token, secret_key, algorithms=['HS256'])
-                
                 # Verify it's a refresh token
                 if payload.get('type') != 'refresh':
                     return self._error_response('Invalid token type', 400)
@@ -164,21 +194,46 @@ class AuthController(MakiAPIController):
                 user_id = payload.get('sub')
                 if not user_id:
                     return self._error_response('Invalid token', 400)
-                    
-                # Find user
+                
                 user = request.env['res.users'].sudo().browse(int(user_id))
-                if not user.exists():
+                
+                # Check if token is blacklisted
+                TokenBlacklist = request.env['maki_api.token_blacklist'].sudo()
+                if TokenBlacklist.is_blacklisted(jti):
+                    # A rotated refresh token used again means its family leaked:
+                    # revoke every token of the user
+                    revoked = TokenBlacklist.search([('jti', '=', jti)], limit=1)
+                    if revoked.reason == 'rotated':
+                        _logger.warning(f"Refresh token reuse detected for user {user_id}")
+                        user.revoke_all_tokens()
+                    return self._error_response('Token has been revoked', 401)
+                
+                # Check the user exists, is active and did not revoke its tokens
+                epoch = request.env['res.users'].sudo()._get_token_epoch(user.id)
+                if epoch is None:
                     return self._error_response('User not found', 404)
-                    
-                # Check if account is disabled
-                if not user.active:
+                if not epoch[0]:
                     return self._error_response('Account is disabled', 403)
-                    
-                # Generate new access token
+                if epoch[1] and payload.get('iat', 0) < epoch[1]:
+                    return self._error_response('Token has been revoked', 401)
+                
+                # Rotate: the used refresh token is revoked and replaced by a
+                # new one of the same family
+                TokenBlacklist.add_token_to_blacklist(
+                    jti=jti,
+                    user_id=user.id,
+                    token_type='refresh',
+                    expires_at=datetime.fromtimestamp(payload['exp']),
+                    reason='rotated'
+                )
+                
+                # Generate new tokens
                 access_token = self._generate_jwt_token(user, 'access')
+                new_refresh_token = self._generate_jwt_token(user, 'refresh', family=payload.get('fam') or jti)
                 
                 return self._success_response({
                     'access_token': access_token,
+                    'refresh_token': new_refresh_token,
                     'token_type': 'Bearer',
                     'expires_in': 86400  # 24 hours in seconds
                 })
@@ -194,8 +249,9 @@ class AuthController(MakiAPIController):
             return self._error_response(f'Server error: {str(e)}', 500)
     
     @http.route('/api/v1/auth/logout', type='http', auth='none', methods=['POST'], csrf=False)
+    @stateless
     @rate_limit()
-    @log_api_call()
+    @log_api_call
     def logout(self, **kw):
         try:
             # Get the token from the Authorization header
@@ -227,6 +283,9 @@ class AuthController(MakiAPIController):
             env = request.env(user=SUPERUSER_ID)
             blacklist_model = env['maki_api.token_blacklist']
             
+            # Forget the token in this worker's verified-token cache
+            token_cache.discard(request.env.cr.dbname, token)
+            
             # Check if token is already blacklisted
             if blacklist_model.is_blacklisted(decoded_token['jti']):
                 return self._success_response({
@@ -234,19 +293,15 @@ class AuthController(MakiAPIController):
                 })
             
             # Add token to blacklist
-            blacklist_model.add_to_blacklist(
+            blacklist_model.add_token_to_blacklist(
                 jti=decoded_token['jti'],
                 user_id=int(user_id),
                 token_type=token_type,
                 expires_at=datetime.fromtimestamp(decoded_token.get('exp', 0)),
-                revoked_by=int(user_id),
-                reason='User logout'
+                reason='logout',
+                revoked_by_id=int(user_id)
             )
             
-            # Clean up expired tokens periodically
-            if random.random() < 0.1:  # 10% chance to run cleanup
-                blacklist_model.cleanup_expired_tokens()
-            
             return self._success_response({
                 'message': 'Logged out successfully'
             })
@@ -255,34 +310,59 @@ class AuthController(MakiAPIController):
             _logger.exception('Error during logout: %s', str(e))
             return self._error_response(f'Server error: {str(e)}', 500)
     
-    @http.route('/api/v1/auth/me', type='json', auth='user', methods=['GET'], csrf=False)
-    @rate_limit(limit=50, window=300)
+    @http.route('/api/v1/auth/logout-all', type='http', auth='jwt', methods=['POST'], csrf=False)
+    @rate_limit(limit=5, window=300)
     @log_api_call
-    def get_current_user(self):
-        """Obtener información del usuario actual"""
+    def logout_all(self, **kw):
+        """Revoke every token of the user ("log out everywhere")"""
         try:
-            user = request.env.user
+            # Move the user's token epoch forward: no token ids are stored
+            request.env.user.sudo().revoke_all_tokens()
+            token_cache.discard(request.env.cr.dbname, request.jwt_token)
             
             return self._success_response({
-                'id': user.id,
-                'name': user.name,
-                'login': user.login,
-                'email': user.email,
-                'company': {
-                    'id': user.company_id.id,
-                    'name': user.company_id.name
-                } if user.company_id else None,
-                'groups': [{
-                    'id': group.id,
-                    'name': group.name,
-                    'category': group.category_id.name if group.category_id else None
-                } for group in user.groups_id],
-                'is_admin': user.has_group('base.group_system'),
-                'last_login': user.login_date.isoformat() if user.login_date else None,
-                'timezone': user.tz or 'UTC',
-                'language': user.lang or 'en_US'
+                'message': 'Logged out from all sessions'
             })
             
+        except Exception as e:
+            _logger.exception('Error during logout-all: %s', str(e))
+            return self._error_response(f'Server error: {str(e)}', 500)
+    
+    @http.route(['/api/v1/auth/jwks.json', '/.well-known/jwks.json'], type='http', auth='none', methods=['GET'], csrf=False)
+    @stateless
+    def jwks(self, **kw):
+        """Claves públicas para verificar los tokens fuera de Odoo (JWKS)
+        
+        Solo se publican las claves asimétricas (RS256/EdDSA); los tokens
+        firmados con HS256 solo se pueden verificar en Odoo.
+        """
+        jwks = request.env(user=SUPERUSER_ID)['maki_api.jwt_keys'].get_jwks()
+        return Response(
+            json.dumps(jwks),
+            content_type='application/json',
+            headers=[('Cache-Control', 'public, max-age=300')]
+        )
+    
+    @http.route('/api/v1/auth/me', type='json', auth='jwt', methods=['GET'], csrf=False)
+    @rate_limit(limit=50, window=300)
+    @log_api_call
+    def get_current_user(self):
+        """Obtener información del usuario actual
+        
+        Se sirve del perfil firmado en el token de acceso, que se invalida
+        cuando cambian los grupos, compañías, idioma o zona horaria.
+        """
+        try:
+            payload = request.jwt_payload
+            if 'gids' in payload:
+                return self._success_response(self._get_profile_data(request.env.uid, payload))
+            
+            # Tokens emitidos antes de incluir el perfil
+            user = request.env.user
+            return self._success_response(
+                self._get_profile_data(user.id, user.sudo()._get_token_profile())
+            )
+            
         except Exception as e:
             _logger.error(f"Get current user error: {str(e)}")
             return self._error_response(
@@ -290,7 +370,7 @@ class AuthController(MakiAPIController):
                 "INTERNAL_ERROR"
             )
     
-    @http.route('/api/v1/auth/change-password', type='json', auth='user', methods=['POST'], csrf=False)
+    @http.route('/api/v1/auth/change-password', type='json', auth='jwt', methods=['POST'], csrf=False)
     @rate_limit(limit=5, window=300)  # Muy restrictivo para cambio de contraseña
     @log_api_call
     def change_password(self):
@@ -324,16 +404,19 @@ class AuthController(MakiAPIController):
                     "PASSWORD_TOO_SHORT"
                 )
             
-            # Cambiar contraseña
+            # Cambiar contraseña (revoca todos los tokens emitidos hasta ahora)
             user.sudo().write({
                 'password': new_password
             })
             
             _logger.info(f"Password changed for user {user.id}")
             
-            return self._success_response(
-                message="Password changed successfully"
-            )
+            # Nuevos tokens para la sesión actual
+            return self._success_response({
+                'access_token': self._generate_jwt_token(user, 'access'),
+                'refresh_token': self._generate_jwt_token(user, 'refresh'),
+                'token_type': 'Bearer'
+            }, message="Password changed successfully")
             
         except Exception as e:
             _logger.error(f"Change password error: {str(e)}")
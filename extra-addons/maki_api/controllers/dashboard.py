@@ -9,7 +9,7 @@ from odoo.http import request
 from odoo.exceptions import AccessError, ValidationError
 from odoo.tools import float_round
 
-from .main import MakiAPIController, jwt_required, rate_limit, log_api_call
+from .main import MakiAPIController, rate_limit, log_api_call
 
 _logger = logging.getLogger(__name__)
 
@@ -45,8 +45,7 @@ class DashboardController(MakiAPIController):
             end = (start + relativedelta(months=1)) - timedelta(days=1)
             return start, end
     
-    @http.route('/api/v1/dashboard/overview', type='json', auth='user', methods=['GET'], csrf=False)
-    @jwt_required
+    @http.route('/api/v1/dashboard/overview', type='json', auth='jwt', methods=['GET'], csrf=False)
     @rate_limit(limit=30, window=300)
     @log_api_call
     def dashboard_overview(self):
@@ -310,8 +309,7 @@ class DashboardController(MakiAPIController):
             _logger.error(f"Project metrics error: {str(e)}")
             return {}
     
-    @http.route('/api/v1/dashboard/charts/sales-trend', type='json', auth='user', methods=['GET'], csrf=False)
-    @jwt_required
+    @http.route('/api/v1/dashboard/charts/sales-trend', type='json', auth='jwt', methods=['GET'], csrf=False)
     @rate_limit(limit=20, window=300)
     @log_api_call
     def sales_trend_chart(self):
@@ -9,15 +9,14 @@ from odoo.http import request
 from odoo.exceptions import AccessError, ValidationError
 from odoo.tools import float_round
 
-from .main import MakiAPIController, jwt_required, rate_limit, log_api_call
+from .main import MakiAPIController, rate_limit, log_api_call
 
 _logger = logging.getLogger(__name__)
 
 class FinanceController(MakiAPIController):
     """Controlador para APIs financieras"""
     
-    @http.route('/api/v1/finance/invoices', type='json', auth='user', methods=['GET'], csrf=False)
-    @jwt_required
+    @http.route('/api/v1/finance/invoices', type='json', auth='jwt', methods=['GET'], csrf=False)
     @rate_limit(limit=50, window=300)
     @log_api_call
     def get_invoices(self):
@@ -97,8 +96,7 @@ class FinanceController(MakiAPIController):
                 str(e)
             )
     
-    @http.route('/api/v1/finance/invoices/<int:invoice_id>', type='json', auth='user', methods=['GET'], csrf=False)
-    @jwt_required
+    @http.route('/api/v1/finance/invoices/<int:invoice_id>', type='json', auth='jwt', methods=['GET'], csrf=False)
     @rate_limit(limit=100, window=300)
     @log_api_call
     def get_invoice_detail(self, invoice_id):
@@ -113,88 +111,11 @@ class FinanceController(MakiAPIController):
                     "INVOICE_NOT_FOUND"
                 )
             
-            # Líneas de la factura
-            lines_data = []
-            for line in invoice.invoice_line_ids:
-                lines_data.append({
-                    'id': line.id,
-                    'product': {
-                        'id': line.product_id.id,
-                        'name': line.product_id.name,
-                        'default_code': line.product_id.default_code
-                    } if line.product_id else None,
-                    'name': line.name,
-                    'quantity': float_round(line.quantity, 2),
-                    'price_unit': float_round(line.price_unit, 2),
-                    'discount': float_round(line.discount, 2),
-                    'price_subtotal': float_round(line.price_subtotal, 2),
-                    'price_total': float_round(line.price_total, 2),
-                    'account': {
-                        'id': line.account_id.id,
-                        'code': line.account_id.code,
-                        'name': line.account_id.name
-                    } if line.account_id else None,
-                    'tax_ids': [{
-                        'id': tax.id,
-                        'name': tax.name,
-                        'amount': tax.amount
-                    } for tax in line.tax_ids]
-                })
+            detail = self._prepare_invoice_details(invoice)[invoice.id]
+            if isinstance(detail, Exception):
+                raise detail
             
-            # Pagos relacionados
-            payments_data = []
-            for payment in invoice._get_reconciled_payments():
-                payments_data.append({
-                    'id': payment.id,
-                    'name': payment.name,
-                    'date': payment.date.isoformat() if payment.date else None,
-                    'amount': float_round(payment.amount, 2),
-                    'payment_method': payment.payment_method_line_id.name if payment.payment_method_line_id else None,
-                    'journal': {
-                        'id': payment.journal_id.id,
-                        'name': payment.journal_id.name
-                    } if payment.journal_id else None
-                })
-            
-            invoice_detail = {
-                'id': invoice.id,
-                'name': invoice.name,
-                'invoice_date': invoice.invoice_date.isoformat() if invoice.invoice_date else None,
-                'due_date': invoice.invoice_date_due.isoformat() if invoice.invoice_date_due else None,
-                'partner': {
-                    'id': invoice.partner_id.id,
-                    'name': invoice.partner_id.name,
-                    'vat': invoice.partner_id.vat,
-                    'email': invoice.partner_id.email,
-                    'phone': invoice.partner_id.phone,
-                    'street': invoice.partner_id.street,
-                    'city': invoice.partner_id.city,
-                    'country': invoice.partner_id.country_id.name if invoice.partner_id.country_id else None
-                } if invoice.partner_id else None,
-                'amount_untaxed': float_round(invoice.amount_untaxed, 2),
-                'amount_tax': float_round(invoice.amount_tax, 2),
-                'amount_total': float_round(invoice.amount_total, 2),
-                'amount_residual': float_round(invoice.amount_residual, 2),
-                'state': invoice.state,
-                'payment_state': invoice.payment_state,
-                'currency': {
-                    'id': invoice.currency_id.id,
-                    'name': invoice.currency_id.name,
-                    'symbol': invoice.currency_id.symbol
-                } if invoice.currency_id else None,
-                'ref': invoice.ref,
-                'invoice_origin': invoice.invoice_origin,
-                'narration': invoice.narration,
-                'lines': lines_data,
-                'payments': payments_data,
-                'company': {
-                    'id': invoice.company_id.id,
-                    'name': invoice.company_id.name,
-                    'vat': invoice.company_id.vat
-                } if invoice.company_id else None
-            }
-            
-            return self._success_response(invoice_detail)
+            return self._success_response(detail)
             
         except Exception as e:
             _logger.error(f"Get invoice detail error: {str(e)}")
@@ -204,8 +125,161 @@ class FinanceController(MakiAPIController):
                 str(e)
             )
     
-    @http.route('/api/v1/finance/payments', type='json', auth='user', methods=['GET'], csrf=False)
-    @jwt_required
+    @http.route('/api/v1/finance/invoices/batch', type='json', auth='jwt', methods=['POST'], csrf=False)
+    @rate_limit(limit=50, window=300)
+    @log_api_call
+    def get_invoices_batch(self):
+        """Obtener el detalle de varias facturas en una sola llamada"""
+        try:
+            ids, error = self._get_batch_ids(request.jsonrequest or {})
+            if error:
+                return error
+            
+            return self._batch_response(
+                request.env['account.move'].browse(ids),
+                self._prepare_invoice_details,
+                "Invoice not found",
+                "INVOICE_NOT_FOUND",
+                "INVOICE_DETAIL_ERROR"
+            )
+            
+        except Exception as e:
+            _logger.error(f"Get invoices batch error: {str(e)}")
+            return self._error_response(
+                "Error retrieving invoices", 
+                "INVOICES_BATCH_ERROR",
+                str(e)
+            )
+    
+    def _get_invoice_payments(self, invoice):
+        """Pagos conciliados con las líneas por cobrar/pagar de la factura
+        
+        Equivale a invoice._get_reconciled_payments(), pero recorre campos
+        que _prepare_invoice_details ya precargó para todo el lote.
+        """
+        term_lines = invoice.line_ids.filtered(
+            lambda line: line.account_id.account_type in ('asset_receivable', 'liability_payable')
+        )
+        counterpart_lines = term_lines.matched_debit_ids.debit_move_id | term_lines.matched_credit_ids.credit_move_id
+        return counterpart_lines.payment_id
+    
+    def _prepare_invoice_details(self, invoices):
+        """Construir el detalle de varias facturas cargando sus relaciones en bloque
+        
+        Returns:
+            dict: id de la factura -> detalle, o la excepción si falló su serialización
+        """
+        # Precargar relaciones de todas las facturas a la vez
+        invoices.mapped('invoice_line_ids.product_id')
+        invoices.mapped('invoice_line_ids.account_id')
+        invoices.mapped('invoice_line_ids.tax_ids')
+        invoices.mapped('partner_id.country_id')
+        term_lines = invoices.mapped('line_ids').filtered(
+            lambda line: line.account_id.account_type in ('asset_receivable', 'liability_payable')
+        )
+        payments = (
+            term_lines.mapped('matched_debit_ids.debit_move_id.payment_id')
+            | term_lines.mapped('matched_credit_ids.credit_move_id.payment_id')
+        )
+        payments.mapped('payment_method_line_id')
+        payments.mapped('journal_id')
+        
+        details = {}
+        for invoice in invoices:
+            try:
+                details[invoice.id] = self._prepare_invoice_detail(invoice)
+            except Exception as e:
+                _logger.error(f"Invoice {invoice.id} detail error: {str(e)}")
+                details[invoice.id] = e
+        return details
+    
+    def _prepare_invoice_detail(self, invoice):
+        """Construir el detalle de una factura"""
+        # Líneas de la factura
+        lines_data = []
+        for line in invoice.invoice_line_ids:
+            lines_data.append({
+                'id': line.id,
+                'product': {
+                    'id': line.product_id.id,
+                    'name': line.product_id.name,
+                    'default_code': line.product_id.default_code
+                } if line.product_id else None,
+                'name': line.name,
+                'quantity': float_round(line.quantity, 2),
+                'price_unit': float_round(line.price_unit, 2),
+                'discount': float_round(line.discount, 2),
+                'price_subtotal': float_round(line.price_subtotal, 2),
+                'price_total': float_round(line.price_total, 2),
+                'account': {
+                    'id': line.account_id.id,
+                    'code': line.account_id.code,
+                    'name': line.account_id.name
+                } if line.account_id else None,
+                'tax_ids': [{
+                    'id': tax.id,
+                    'name': tax.name,
+                    'amount': tax.amount
+                } for tax in line.tax_ids]
+            })
+        
+        # Pagos relacionados, a partir de las conciliaciones ya precargadas
+        payments = self._get_invoice_payments(invoice)
+        payments_data = []
+        for payment in payments:
+            payments_data.append({
+                'id': payment.id,
+                'name': payment.name,
+                'date': payment.date.isoformat() if payment.date else None,
+                'amount': float_round(payment.amount, 2),
+                'payment_method': payment.payment_method_line_id.name if payment.payment_method_line_id else None,
+                'journal': {
+                    'id': payment.journal_id.id,
+                    'name': payment.journal_id.name
+                } if payment.journal_id else None
+            })
+        
+        invoice_detail = {
+            'id': invoice.id,
+            'name': invoice.name,
+            'invoice_date': invoice.invoice_date.isoformat() if invoice.invoice_date else None,
+            'due_date': invoice.invoice_date_due.isoformat() if invoice.invoice_date_due else None,
+            'partner': {
+                'id': invoice.partner_id.id,
+                'name': invoice.partner_id.name,
+                'vat': invoice.partner_id.vat,
+                'email': invoice.partner_id.email,
+                'phone': invoice.partner_id.phone,
+                'street': invoice.partner_id.street,
+                'city': invoice.partner_id.city,
+                'country': invoice.partner_id.country_id.name if invoice.partner_id.country_id else None
+            } if invoice.partner_id else None,
+            'amount_untaxed': float_round(invoice.amount_untaxed, 2),
+            'amount_tax': float_round(invoice.amount_tax, 2),
+            'amount_total': float_round(invoice.amount_total, 2),
+            'amount_residual': float_round(invoice.amount_residual, 2),
+            'state': invoice.state,
+            'payment_state': invoice.payment_state,
+            'currency': {
+                'id': invoice.currency_id.id,
+                'name': invoice.currency_id.name,
+                'symbol': invoice.currency_id.symbol
+            } if invoice.currency_id else None,
+            'ref': invoice.ref,
+            'invoice_origin': invoice.invoice_origin,
+            'narration': invoice.narration,
+            'lines': lines_data,
+            'payments': payments_data,
+            'company': {
+                'id': invoice.company_id.id,
+                'name': invoice.company_id.name,
+                'vat': invoice.company_id.vat
+            } if invoice.company_id else None
+        }
+        
+        return invoice_detail
+    
+    @http.route('/api/v1/finance/payments', type='json', auth='jwt', methods=['GET'], csrf=False)
     @rate_limit(limit=50, window=300)
     @log_api_call
     def get_payments(self):
@@ -288,8 +362,7 @@ class FinanceController(MakiAPIController):
                 str(e)
             )
     
-    @http.route('/api/v1/finance/accounts', type='json', auth='user', methods=['GET'], csrf=False)
-    @jwt_required
+    @http.route('/api/v1/finance/accounts', type='json', auth='jwt', methods=['GET'], csrf=False)
     @rate_limit(limit=30, window=300)
     @log_api_call
     def get_chart_of_accounts(self):
@@ -346,8 +419,7 @@ class FinanceController(MakiAPIController):
                 str(e)
             )
     
-    @http.route('/api/v1/finance/reports/profit-loss', type='json', auth='user', methods=['GET'], csrf=False)
-    @jwt_required
+    @http.route('/api/v1/finance/reports/profit-loss', type='json', auth='jwt', methods=['GET'], csrf=False)
     @rate_limit(limit=10, window=300)
     @log_api_call
     def profit_loss_report(self):
@@ -441,8 +513,7 @@ class FinanceController(MakiAPIController):
                 str(e)
             )
     
-    @http.route('/api/v1/finance/reports/balance-sheet', type='json', auth='user', methods=['GET'], csrf=False)
-    @jwt_required
+    @http.route('/api/v1/finance/reports/balance-sheet', type='json', auth='jwt', methods=['GET'], csrf=False)
     @rate_limit(limit=10, window=300)
     @log_api_call
     def balance_sheet_report(self):
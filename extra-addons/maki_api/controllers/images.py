@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import logging
+import tempfile
+
+from werkzeug.utils import send_file
+
+from odoo import http, SUPERUSER_ID
+from odoo.http import request, Response
+from odoo.tools import config, image_process
+from odoo.tools.mimetypes import guess_mimetype
+
+from ..models.image_cache import IMAGE_CACHE_DIR
+
+_logger = logging.getLogger(__name__)
+
+# Tamaños servidos (lado máximo en píxeles)
+IMAGE_SIZES = (64, 128, 256, 512, 1024)
+
+# Las URLs incluyen el checksum de la imagen, así que nunca cambian de contenido
+IMAGE_MAX_AGE = 365 * 24 * 3600
+
+CHECKSUM_RE = re.compile(r'^[0-9a-f]{40}$')
+
+def product_image_checksums(env, product_ids):
+    """Checksum de la imagen de cada producto, con tres consultas en total
+    
+    Usa la imagen de la variante y, si no tiene, la de la plantilla.
+    
+    Returns:
+        dict: id del producto -> checksum del adjunto de la imagen
+    """
+    if not product_ids:
+        return {}
+    
+    Attachment = env['ir.attachment'].sudo()
+    checksums = {
+        attachment['res_id']: attachment['checksum']
+        for attachment in Attachment.search_read([
+            ('res_model', '=', 'product.product'),
+            ('res_field', '=', 'image_variant_1920'),
+            ('res_id', 'in', list(product_ids)),
+        ], ['res_id', 'checksum'])
+    }
+    
+    missing = [product_id for product_id in product_ids if product_id not in checksums]
+    if missing:
+        templates = {
+            product['id']: product['product_tmpl_id']
+            for product in env['product.product'].sudo().browse(missing).read(['product_tmpl_id'], load=None)
+        }
+        template_checksums = {
+            attachment['res_id']: attachment['checksum']
+            for attachment in Attachment.search_read([
+                ('res_model', '=', 'product.template'),
+                ('res_field', '=', 'image_1920'),
+                ('res_id', 'in', list(set(templates.values()))),
+            ], ['res_id', 'checksum'])
+        }
+        for product_id, template_id in templates.items():
+            if template_id in template_checksums:
+                checksums[product_id] = template_checksums[template_id]
+    
+    return checksums
+
+def product_image_urls(env, product_ids, size=128):
+    """URLs inmutables de las imágenes de los productos
+    
+    Los productos sin imagen mantienen la URL estándar de Odoo, que sirve
+    el placeholder.
+    
+    Returns:
+        dict: id del producto -> URL
+    """
+    checksums = product_image_checksums(env, product_ids)
+    return {
+        product_id: (
+            f"/api/v1/images/product/{product_id}/{size}/{checksums[product_id]}"
+            if product_id in checksums
+            else f"/web/image/product.product/{product_id}/image_{size}"
+        )
+        for product_id in product_ids
+    }
+
+class ImageController(http.Controller):
+    """Imágenes de productos redimensionadas y cacheadas en disco"""
+    
+    def _get_cache_path(self, checksum, size):
+        """Ruta del variante en caché, dentro del filestore de la base de datos
+        
+        El cron de maki_api.image_cache purga las variantes antiguas.
+        """
+        return os.path.join(
+            config.filestore(request.db), IMAGE_CACHE_DIR, checksum[:2], f'{checksum}_{size}'
+        )
+    
+    def _generate_variant(self, checksum, size, path):
+        """Redimensionar la imagen original y guardarla en caché de forma atómica
+        
+        Returns:
+            bool: False si no hay ninguna imagen de producto con ese checksum
+        """
+        env = request.env(user=SUPERUSER_ID)
+        # ir.attachment._search añade res_field=False si el dominio no lo
+        # menciona: los adjuntos de campos imagen hay que pedirlos explícitamente
+        attachment = env['ir.attachment'].search([
+            ('checksum', '=', checksum),
+            ('res_model', 'in', ['product.product', 'product.template']),
+            ('res_field', 'in', ['image_variant_1920', 'image_1920']),
+        ], limit=1)
+        if not attachment:
+            return False
+        data = image_process(attachment.raw, size=(size, size))
+        
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        return True
+    
+    def _send_variant(self, path, etag):
+        """Enviar el fichero con ETag fuerte y caché inmutable
+        
+        Con x_sendfile activo el envío se delega al proxy (X-Accel-Redirect),
+        liberando el worker; si no, werkzeug usa wsgi.file_wrapper cuando el
+        servidor lo ofrece.
+        """
+        with open(path, 'rb') as image_file:
+            mimetype = guess_mimetype(image_file.read(1024))
+        
+        if config.get('x_sendfile'):
+            filestore = config.filestore(request.db)
+            response = Response(status=200, mimetype=mimetype)
+            response.headers['X-Sendfile'] = path
+            response.headers['X-Accel-Redirect'] = '/web/filestore/%s/%s' % (
+                request.db, os.path.relpath(path, filestore).replace(os.sep, '/')
+            )
+            response.headers['Content-Length'] = 0
+            response.set_etag(etag)
+            response.make_conditional(request.httprequest)
+        else:
+            response = send_file(
+                path,
+                request.httprequest.environ,
+                mimetype=mimetype,
+                etag=etag,
+                conditional=True,
+                max_age=IMAGE_MAX_AGE,
+            )
+        
+        # Respuesta autenticada: solo la cachea el cliente, nunca un proxy compartido
+        response.headers['Cache-Control'] = f'private, max-age={IMAGE_MAX_AGE}, immutable'
+        return response
+    
+    @http.route('/api/v1/images/product/<int:product_id>/<int:size>/<string:checksum>',
+                type='http', auth='jwt', methods=['GET'], csrf=False)
+    def product_image(self, product_id, size, checksum):
+        """Imagen de producto redimensionada
+        
+        Solo se sirve si el usuario del token puede leer el producto (reglas
+        de registro, compañías y productos archivados incluidos) y el checksum
+        es el de su imagen actual; si no, 404, sin revelar la URL vigente. Un
+        acierto de caché no lee la imagen de la base de datos.
+        """
+        if size not in IMAGE_SIZES or not CHECKSUM_RE.match(checksum):
+            return request.not_found()
+        
+        try:
+            Product = request.env['product.product']
+            if not Product.check_access_rights('read', raise_exception=False) \
+                    or not Product.search([('id', '=', product_id)], limit=1):
+                return request.not_found()
+            
+            # El caché se indexa por checksum: comprobar que es la imagen de este producto
+            current = product_image_checksums(request.env(user=SUPERUSER_ID), [product_id]).get(product_id)
+            if current != checksum:
+                return request.not_found()
+            
+            etag = f'{checksum}-{size}'
+            path = self._get_cache_path(checksum, size)
+            if not os.path.isfile(path) and not self._generate_variant(checksum, size, path):
+                return request.not_found()
+            
+            return self._send_variant(path, etag)
+        
+        except Exception as e:
+            _logger.error(f"Product image error: {str(e)}")
+            return Response(status=500)
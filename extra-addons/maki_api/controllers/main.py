@@ -1,49 +1,50 @@
 # -*- coding: utf-8 -*-
+import hmac
 import json
 import jwt
 import time
 import logging
 from datetime import datetime, timedelta
 from functools import wraps
-from collections import defaultdict
 
 from odoo import http, fields
 from odoo.http import request, Response
 from odoo.exceptions import AccessError, ValidationError
 from odoo.tools import config
 
+from ..tools.metrics import metrics
+from ..tools.query_tracker import QueryTracker
+from ..tools.rate_limiter import check_rate_limit
+
 _logger = logging.getLogger(__name__)
 
-# Rate limiting storage (en producción usar Redis)
-rate_limit_storage = defaultdict(list)
+# Máximo de ids aceptados por los endpoints de detalle en lote
+MAX_BATCH_IDS = 50
 
-class RateLimiter:
-    """Implementación simple de rate limiting"""
-    
-    @staticmethod
-    def is_allowed(key, limit=100, window=3600):
-        """Verifica si una request está permitida
-        
-        Args:
-            key: Identificador único (IP, user_id, etc.)
-            limit: Número máximo de requests
-            window: Ventana de tiempo en segundos
-        """
-        now = time.time()
-        # Limpiar requests antiguas
-        rate_limit_storage[key] = [
-            timestamp for timestamp in rate_limit_storage[key]
-            if now - timestamp < window
-        ]
-        
-        if len(rate_limit_storage[key]) >= limit:
-            return False
-            
-        rate_limit_storage[key].append(now)
-        return True
+# Gauges de la lista negra (COUNT(*) y tamaño de la tabla) reutilizados
+# durante este número de segundos por cada worker y base de datos
+BLACKLIST_GAUGES_TTL = 60
+_blacklist_gauges = {}
+
+def _request_group_ids():
+    """Grupos del usuario de la petición: del token si los trae, si no del ORM"""
+    payload = getattr(request, 'jwt_payload', None)
+    if payload and 'gids' in payload:
+        return payload['gids']
+    if request.env.user:
+        return request.env.user.groups_id.ids
+    return ()
 
 def rate_limit(limit=100, window=3600):
-    """Decorador para rate limiting"""
+    """Decorador para rate limiting
+    
+    Cada endpoint tiene su propio contador por usuario o IP, en el backend
+    configurado (memoria, Redis o Postgres; ver tools/rate_limiter.py).
+    
+    limit y window son los valores por defecto: una política de
+    maki_api.rate_limit_policy que coincida con la ruta y los grupos del
+    usuario los reemplaza (y puede añadir un límite de ráfaga por segundo).
+    """
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
@@ -53,109 +54,127 @@ def rate_limit(limit=100, window=3600):
             # Si hay usuario autenticado, usar su ID
             if hasattr(request, 'env') and request.env.user:
                 key = f"user_{request.env.user.id}"
+            key = f"{key}:{func.__qualname__}"
+            
+            route_limit, route_window = limit, window
+            policy = request.env['maki_api.rate_limit_policy']._match_policy(
+                request.httprequest.path, _request_group_ids()
+            )
+            if policy:
+                route_limit, route_window = policy.limit, policy.window
+                if policy.burst:
+                    allowed, hits, reset_after = check_rate_limit(request.env, f"{key}:burst", policy.burst, 1)
+                    if not allowed:
+                        _logger.warning(f"Rate limit burst exceeded for {key}")
+                        metrics.inc('maki_api_rate_limit_rejections_total', (
+                            ('endpoint', func.__qualname__), ('limit', 'burst')
+                        ))
+                        return _rate_limited_response(policy.burst, 1, reset_after)
             
-            if not RateLimiter.is_allowed(key, limit, window):
+            allowed, hits, reset_after = check_rate_limit(request.env, key, route_limit, route_window)
+            if not allowed:
                 _logger.warning(f"Rate limit exceeded for {key}")
-                return Response(
-                    json.dumps({
-                        'error': 'Rate limit exceeded',
-                        'message': f'Too many requests. Limit: {limit} per {window} seconds'
-                    }),
-                    status=429,
-                    headers={'Content-Type': 'application/json'}
-                )
+                metrics.inc('maki_api_rate_limit_rejections_total', (
+                    ('endpoint', func.__qualname__), ('limit', 'window')
+                ))
+                return _rate_limited_response(route_limit, route_window, reset_after)
             
             return func(*args, **kwargs)
         return wrapper
     return decorator
 
-def jwt_required(func):
-    @wraps(func)
-    def wrapper(self, *args, **kwargs):
-        auth_header = request.httprequest.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return self._error_response('Missing or invalid Authorization header', 401)
-        
-        token = auth_header.split(' ')[1]
-        
-        try:
-            # First decode without verification to get the jti
-            unverified_payload = jwt.decode(token, options={"verify_signature": False})
-            
-            # Check if token is blacklisted
-            if 'jti' in unverified_payload:
-                blacklist_model = request.env['maki_api.token_blacklist'].sudo()
-                if blacklist_model.is_blacklisted(unverified_payload['jti']):
-                    return self._error_response('Token has been revoked', 401)
-            
-            # Decode and verify the token
-            secret_key = request.env['ir.config_parameter'].sudo().get_param('maki_api.jwt_secret_key')
-            payload = jwt.decode(token, secret_key, algorithms=['HS256'])
-            
-            # Check if user exists
-            user_id = payload.get('sub')
-            user = request.env['res.users'].sudo().browse(int(user_id))
-            if not user.exists():
-                return self._error_response('User not found', 401)
-            
-            # Set the user for this request
-            request.uid = user.id
-            
-            return func(self, *args, **kwargs)
-            
-        except jwt.ExpiredSignatureError:
-            return self._error_response('Token has expired', 401)
-        except jwt.InvalidTokenError:
-            return self._error_response('Invalid token', 401)
-        except Exception as e:
-            _logger.exception('Error validating JWT token: %s', str(e))
-            return self._error_response(f'Server error: {str(e)}', 500)
+def _rate_limited_response(limit, window, reset_after):
+    return Response(
+        json.dumps({
+            'error': 'Rate limit exceeded',
+            'message': f'Too many requests. Limit: {limit} per {window} seconds'
+        }),
+        status=429,
+        headers={
+            'Content-Type': 'application/json',
+            'Retry-After': str(max(1, int(reset_after)))
+        }
+    )
+
+def stateless(func):
+    """Decorador para rutas auth='none' de la API: no guardar sesión ni enviar cookie
     
+    Las rutas auth='jwt' ya son stateless (ver ir.http._auth_method_jwt).
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        request.session.can_save = False
+        return func(*args, **kwargs)
     return wrapper
 
 def log_api_call(func):
-    """Decorador para logging estructurado"""
+    """Decorador de logging: registra la llamada en maki_api.log
+    
+    Solo encola la llamada; la escribe en lote el hilo de logs del worker
+    (ver tools/log_writer.py), fuera del tiempo de respuesta. Los datos de
+    la petición y la respuesta solo se adjuntan si el muestreo de
+    maki_api.log_payload_sampling lo indica para la ruta y el estado.
+    """
     @wraps(func)
     def wrapper(*args, **kwargs):
         start_time = time.time()
-        
-        # Log de inicio
-        _logger.info({
-            'event': 'api_call_start',
-            'endpoint': request.httprequest.endpoint,
-            'method': request.httprequest.method,
-            'path': request.httprequest.path,
-            'user_id': getattr(request.env.user, 'id', None),
-            'ip': request.httprequest.remote_addr,
-            'timestamp': datetime.now().isoformat()
-        })
+        status_code, error, result, cache_hit = 200, None, None, False
+        tracker = QueryTracker()
         
         try:
-            result = func(*args, **kwargs)
-            
-            # Log de éxito
-            _logger.info({
-                'event': 'api_call_success',
-                'endpoint': request.httprequest.endpoint,
-                'duration': time.time() - start_time,
-                'status': 'success',
-                'timestamp': datetime.now().isoformat()
-            })
-            
+            with tracker:
+                result = func(*args, **kwargs)
+            if request.httprequest.headers.get('X-Maki-Debug-Queries'):
+                # Cabecera de depuración bajo petición: solo contadores, nunca el SQL
+                headers = result.headers if isinstance(result, Response) else request.future_response.headers
+                headers['X-Maki-Queries'] = tracker.header()
+            if isinstance(result, Response):
+                status_code = result.status_code
+                cache_hit = status_code == 304
+            elif isinstance(result, dict) and result.get('success') is False:
+                error = (result.get('error') or {}).get('message')
             return result
-            
+        
         except Exception as e:
-            # Log de error
-            _logger.error({
-                'event': 'api_call_error',
-                'endpoint': request.httprequest.endpoint,
-                'duration': time.time() - start_time,
-                'error': str(e),
-                'error_type': type(e).__name__,
-                'timestamp': datetime.now().isoformat()
-            })
+            status_code, error = 500, f"{type(e).__name__}: {e}"
             raise
+        
+        finally:
+            duration = time.time() - start_time
+            httprequest = request.httprequest
+            metrics.observe('maki_api_request_duration_seconds', (
+                ('endpoint', func.__qualname__),
+                ('method', httprequest.method),
+                ('status', str(status_code)),
+                ('cache_hit', 'true' if cache_hit else 'false'),
+            ), duration)
+            metrics.inc('maki_api_db_queries_total', (('endpoint', func.__qualname__),), tracker.count)
             
+            repeated = tracker.repeated
+            Log = request.env['maki_api.log']
+            request_data = response_data = None
+            if Log._should_capture_payload(httprequest.path, status_code):
+                # Se redactan y serializan en el hilo de logs, no aquí
+                request_data = httprequest.get_data(as_text=True) or httprequest.args.to_dict() or None
+                response_data = result if isinstance(result, dict) else None
+            Log.log_api_call(
+                endpoint=httprequest.path,
+                method=httprequest.method,
+                status_code=status_code,
+                execution_time=duration * 1000,
+                user_id=request.env.uid or None,
+                ip_address=httprequest.remote_addr,
+                user_agent=httprequest.user_agent.string or None,
+                request_data=request_data,
+                response_data=response_data,
+                error=error,
+                cache_hit=cache_hit,
+                query_count=tracker.count,
+                query_time=tracker.time * 1000,
+                n_plus_one=bool(repeated),
+                repeated_query=f"{repeated[0][1]}x {repeated[0][0]}" if repeated else None,
+            )
+    
     return wrapper
 
 class MakiAPIController(http.Controller):
@@ -182,7 +201,87 @@ class MakiAPIController(http.Controller):
             'timestamp': datetime.now().isoformat()
         }
     
+    def _get_batch_ids(self, params):
+        """Validar la lista de ids de un endpoint en lote
+        
+        Returns:
+            tuple: (ids sin duplicados, respuesta de error o None)
+        """
+        ids = params.get('ids')
+        if not isinstance(ids, list) or not ids:
+            return None, self._error_response(
+                "A non-empty list of ids is required",
+                "INVALID_IDS"
+            )
+        
+        if len(ids) > MAX_BATCH_IDS:
+            return None, self._error_response(
+                f"At most {MAX_BATCH_IDS} ids are allowed per request",
+                "TOO_MANY_IDS"
+            )
+        
+        try:
+            ids = list(dict.fromkeys(int(record_id) for record_id in ids))
+        except (TypeError, ValueError):
+            return None, self._error_response(
+                "Ids must be integers",
+                "INVALID_IDS"
+            )
+        
+        return ids, None
+    
+    def _batch_response(self, records, prepare, not_found_message, not_found_code, error_code):
+        """Respuesta estándar de un endpoint en lote
+        
+        Args:
+            records: Recordset con los ids pedidos, en orden
+            prepare: Función que recibe los registros legibles y devuelve
+                     {id: detalle o excepción}
+            not_found_message: Mensaje para los ids inexistentes
+            not_found_code: Código para los ids inexistentes
+            error_code: Código para los registros que fallaron al serializar
+        """
+        records.check_access_rights('read')
+        existing = records.exists()
+        readable = existing._filter_access_rules('read')
+        details = prepare(readable) if readable else {}
+        
+        existing_ids = set(existing.ids)
+        results = []
+        for record_id in records.ids:
+            detail = details.get(record_id)
+            if record_id not in existing_ids:
+                error = (not_found_code, not_found_message, None)
+            elif detail is None:
+                error = ('ACCESS_DENIED', "Access denied", None)
+            elif isinstance(detail, Exception):
+                error = (error_code, "Error retrieving record", str(detail))
+            else:
+                results.append({
+                    'id': record_id,
+                    'success': True,
+                    'data': detail
+                })
+                continue
+            
+            results.append({
+                'id': record_id,
+                'success': False,
+                'error': {
+                    'code': error[0],
+                    'message': error[1],
+                    'details': error[2]
+                }
+            })
+        
+        return self._success_response({
+            'results': results,
+            'count': len(results),
+            'found': sum(1 for result in results if result['success'])
+        })
+    
     @http.route('/api/v1/health', type='json', auth='none', methods=['GET'], csrf=False)
+    @stateless
     @rate_limit(limit=50, window=60)
     @log_api_call
     def health_check(self):
@@ -193,7 +292,44 @@ class MakiAPIController(http.Controller):
             'timestamp': datetime.now().isoformat()
         })
     
+    @http.route('/api/v1/metrics', type='http', auth='none', methods=['GET'], csrf=False)
+    @stateless
+    def prometheus_metrics(self):
+        """Métricas de todos los workers en formato de texto de Prometheus
+        
+        Exige maki_api.metrics_token como bearer token; sin token configurado
+        el endpoint está desactivado (403). Los gauges de la lista negra se
+        recalculan como mucho cada BLACKLIST_GAUGES_TTL segundos.
+        """
+        metrics_token = request.env['ir.config_parameter'].sudo().get_param('maki_api.metrics_token')
+        if not metrics_token:
+            return Response('Metrics are disabled: set maki_api.metrics_token\n', status=403, content_type='text/plain')
+        authorization = request.httprequest.headers.get('Authorization', '')
+        if not hmac.compare_digest(authorization, f'Bearer {metrics_token}'):
+            return Response('Unauthorized\n', status=401, content_type='text/plain')
+        
+        return Response(
+            metrics.render(extra_gauges=self._get_blacklist_gauges()),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
+    
+    def _get_blacklist_gauges(self):
+        """Gauges de la lista negra de la base de datos de la petición, en caché BLACKLIST_GAUGES_TTL segundos"""
+        cached = _blacklist_gauges.get(request.db)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        
+        blacklist = request.env['maki_api.token_blacklist'].sudo().get_blacklist_metrics()
+        gauges = [
+            ('maki_api_token_blacklist_rows', (), blacklist['rows']),
+            ('maki_api_token_blacklist_expired_rows', (), blacklist['expired_rows']),
+            ('maki_api_token_blacklist_bytes', (), blacklist['table_bytes']),
+        ]
+        _blacklist_gauges[request.db] = (time.monotonic() + BLACKLIST_GAUGES_TTL, gauges)
+        return gauges
+    
     @http.route('/api/v1/info', type='json', auth='none', methods=['GET'], csrf=False)
+    @stateless
     @rate_limit(limit=20, window=60)
     @log_api_call
     def api_info(self):
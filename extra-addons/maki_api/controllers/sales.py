@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 import json
+import base64
 import logging
+from collections import defaultdict
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 
@@ -9,15 +11,29 @@ from odoo.http import request
 from odoo.exceptions import AccessError, ValidationError
 from odoo.tools import float_round
 
-from .main import MakiAPIController, jwt_required, rate_limit, log_api_call
+from .main import MakiAPIController, rate_limit, log_api_call
+from .images import product_image_urls
 
 _logger = logging.getLogger(__name__)
 
+# Campos del partner leídos en una sola consulta para el detalle de cliente
+CUSTOMER_DETAIL_FIELDS = [
+    'name', 'vat', 'email', 'phone', 'mobile', 'street', 'street2', 'city', 'zip',
+    'country_id', 'state_id', 'website', 'customer_rank', 'supplier_rank', 'company_id',
+    'is_company', 'parent_id', 'category_id', 'comment',
+]
+
+# Campos de la cabecera del pedido leídos en una sola consulta
+SALE_ORDER_DETAIL_FIELDS = [
+    'name', 'date_order', 'partner_id', 'amount_untaxed', 'amount_tax', 'amount_total', 'state',
+    'invoice_status', 'currency_id', 'client_order_ref', 'user_id', 'payment_term_id', 'note',
+    'company_id', 'invoice_ids', 'picking_ids',
+]
+
 class SalesController(MakiAPIController):
     """Controlador para APIs de ventas"""
     
-    @http.route('/api/v1/sales/orders', type='json', auth='user', methods=['GET'], csrf=False)
-    @jwt_required
+    @http.route('/api/v1/sales/orders', type='json', auth='jwt', methods=['GET'], csrf=False)
     @rate_limit(limit=50, window=300)
     @log_api_call
     def get_sale_orders(self):
@@ -96,12 +112,15 @@ class SalesController(MakiAPIController):
                 str(e)
             )
     
-    @http.route('/api/v1/sales/orders/<int:order_id>', type='json', auth='user', methods=['GET'], csrf=False)
-    @jwt_required
+    @http.route('/api/v1/sales/orders/<int:order_id>', type='json', auth='jwt', methods=['GET'], csrf=False)
     @rate_limit(limit=100, window=300)
     @log_api_call
     def get_sale_order_detail(self, order_id):
-        """Obtener detalle de un pedido de venta específico"""
+        """Obtener detalle de un pedido de venta específico
+        
+        Parámetros opcionales: include_lines (False para solo la cabecera),
+        lines_limit y lines_cursor para paginar las líneas.
+        """
         try:
             SaleOrder = request.env['sale.order']
             order = SaleOrder.browse(order_id)
@@ -112,97 +131,28 @@ class SalesController(MakiAPIController):
                     "ORDER_NOT_FOUND"
                 )
             
-            # Líneas del pedido
-            lines_data = []
-            for line in order.order_line:
-                lines_data.append({
-                    'id': line.id,
-                    'product': {
-                        'id': line.product_id.id,
-                        'name': line.product_id.name,
-                        'default_code': line.product_id.default_code,
-                        'image_url': f"/web/image/product.product/{line.product_id.id}/image_128"
-                    } if line.product_id else None,
-                    'name': line.name,
-                    'quantity': float_round(line.product_uom_qty, 2),
-                    'delivered_qty': float_round(line.qty_delivered, 2),
-                    'invoiced_qty': float_round(line.qty_invoiced, 2),
-                    'price_unit': float_round(line.price_unit, 2),
-                    'discount': float_round(line.discount, 2),
-                    'price_subtotal': float_round(line.price_subtotal, 2),
-                    'price_total': float_round(line.price_total, 2),
-                    'tax_ids': [{
-                        'id': tax.id,
-                        'name': tax.name,
-                        'amount': tax.amount
-                    } for tax in line.tax_id]
-                })
-            
-            # Facturas relacionadas
-            invoices_data = []
-            for invoice in order.invoice_ids:
-                invoices_data.append({
-                    'id': invoice.id,
-                    'name': invoice.name,
-                    'date': invoice.invoice_date.isoformat() if invoice.invoice_date else None,
-                    'amount_total': float_round(invoice.amount_total, 2),
-                    'state': invoice.state,
-                    'payment_state': invoice.payment_state
-                })
-            
-            # Entregas relacionadas
-            deliveries_data = []
-            for picking in order.picking_ids:
-                deliveries_data.append({
-                    'id': picking.id,
-                    'name': picking.name,
-                    'date': picking.date_done.isoformat() if picking.date_done else None,
-                    'state': picking.state,
-                    'scheduled_date': picking.scheduled_date.isoformat() if picking.scheduled_date else None
-                })
-            
-            order_detail = {
-                'id': order.id,
-                'name': order.name,
-                'date_order': order.date_order.isoformat() if order.date_order else None,
-                'partner': {
-                    'id': order.partner_id.id,
-                    'name': order.partner_id.name,
-                    'vat': order.partner_id.vat,
-                    'email': order.partner_id.email,
-                    'phone': order.partner_id.phone,
-                    'street': order.partner_id.street,
-                    'city': order.partner_id.city,
-                    'country': order.partner_id.country_id.name if order.partner_id.country_id else None
-                } if order.partner_id else None,
-                'amount_untaxed': float_round(order.amount_untaxed, 2),
-                'amount_tax': float_round(order.amount_tax, 2),
-                'amount_total': float_round(order.amount_total, 2),
-                'state': order.state,
-                'invoice_status': order.invoice_status,
-                'delivery_status': order.delivery_status if hasattr(order, 'delivery_status') else None,
-                'currency': {
-                    'id': order.currency_id.id,
-                    'name': order.currency_id.name,
-                    'symbol': order.currency_id.symbol
-                } if order.currency_id else None,
-                'client_order_ref': order.client_order_ref,
-                'user': {
-                    'id': order.user_id.id,
-                    'name': order.user_id.name
-                } if order.user_id else None,
-                'payment_term': order.payment_term_id.name if order.payment_term_id else None,
-                'note': order.note,
-                'lines': lines_data,
-                'invoices': invoices_data,
-                'deliveries': deliveries_data,
-                'company': {
-                    'id': order.company_id.id,
-                    'name': order.company_id.name
-                } if order.company_id else None
-            }
-            
-            return self._success_response(order_detail)
+            params = request.jsonrequest or {}
+            lines_limit = params.get('lines_limit')
+            if lines_limit:
+                lines_limit = max(1, min(int(lines_limit), 500))
+            
+            lines_after = None
+            if params.get('lines_cursor'):
+                try:
+                    lines_after = self._decode_lines_cursor(params['lines_cursor'])
+                except (ValueError, TypeError):
+                    return self._error_response("Invalid lines cursor", "INVALID_CURSOR")
+            
+            detail = self._prepare_sale_order_details(
+                order,
+                include_lines=params.get('include_lines', True),
+                lines_limit=lines_limit,
+                lines_after=lines_after
+            )[order.id]
+            if isinstance(detail, Exception):
+                raise detail
+            
+            return self._success_response(detail)
             
         except Exception as e:
             _logger.error(f"Get sale order detail error: {str(e)}")
@@ -212,8 +162,258 @@ class SalesController(MakiAPIController):
                 str(e)
             )
     
-    @http.route('/api/v1/sales/customers', type='json', auth='user', methods=['GET'], csrf=False)
-    @jwt_required
+    @http.route('/api/v1/sales/orders/batch', type='json', auth='jwt', methods=['POST'], csrf=False)
+    @rate_limit(limit=50, window=300)
+    @log_api_call
+    def get_sale_orders_batch(self):
+        """Obtener el detalle de varios pedidos de venta en una sola llamada"""
+        try:
+            ids, error = self._get_batch_ids(request.jsonrequest or {})
+            if error:
+                return error
+            
+            return self._batch_response(
+                request.env['sale.order'].browse(ids),
+                self._prepare_sale_order_details,
+                "Sale order not found",
+                "ORDER_NOT_FOUND",
+                "ORDER_DETAIL_ERROR"
+            )
+            
+        except Exception as e:
+            _logger.error(f"Get sale orders batch error: {str(e)}")
+            return self._error_response(
+                "Error retrieving sale orders", 
+                "ORDERS_BATCH_ERROR",
+                str(e)
+            )
+    
+    def _read_by_id(self, model, ids, fields):
+        """Leer en una sola consulta los registros de `ids` (sin duplicados ni vacíos)
+        
+        Returns:
+            dict: id -> valores de read()
+        """
+        ids = list({record_id for record_id in ids if record_id})
+        if not ids:
+            return {}
+        return {
+            values['id']: values
+            for values in request.env[model].browse(ids).read(fields, load=None)
+        }
+    
+    def _encode_lines_cursor(self, sequence, line_id):
+        """Codificar el cursor opaco de las líneas (sequence, id)"""
+        return base64.urlsafe_b64encode(json.dumps([sequence, line_id]).encode('utf-8')).decode('ascii')
+    
+    def _decode_lines_cursor(self, cursor):
+        """Decodificar el cursor opaco de las líneas
+        
+        Returns:
+            tuple: (sequence, id) de la última línea devuelta
+        
+        Raises:
+            ValueError: Si el cursor no es uno devuelto por la API
+        """
+        try:
+            sequence, line_id = json.loads(base64.urlsafe_b64decode(str(cursor).encode('ascii')))
+        except (ValueError, TypeError, UnicodeError) as e:
+            raise ValueError(f"Invalid lines cursor: {cursor}") from e
+        if not all(isinstance(value, int) and not isinstance(value, bool) for value in (sequence, line_id)):
+            raise ValueError(f"Invalid lines cursor: {cursor}")
+        return sequence, line_id
+    
+    def _prepare_sale_order_details(self, orders, include_lines=True, lines_limit=None, lines_after=None):
+        """Construir el detalle de varios pedidos con un número fijo de lecturas en bloque
+        
+        Args:
+            orders: Pedidos a serializar
+            include_lines: Si es False solo se devuelve la cabecera
+            lines_limit: Máximo de líneas a devolver (paginación, un solo pedido)
+            lines_after: (sequence, id) de la última línea de la página anterior,
+                         del cursor `lines_next_cursor` ya decodificado
+        
+        Returns:
+            dict: id del pedido -> detalle, o la excepción si falló su serialización
+        """
+        header_fields = list(SALE_ORDER_DETAIL_FIELDS)
+        if 'delivery_status' in orders._fields:
+            header_fields.append('delivery_status')
+        orders_values = orders.read(header_fields, load=None)
+        
+        # Relaciones de la cabecera, una lectura por modelo
+        partners = self._read_by_id(
+            'res.partner', [v['partner_id'] for v in orders_values],
+            ['name', 'vat', 'email', 'phone', 'street', 'city', 'country_id']
+        )
+        countries = self._read_by_id('res.country', [v['country_id'] for v in partners.values()], ['name'])
+        currencies = self._read_by_id('res.currency', [v['currency_id'] for v in orders_values], ['name', 'symbol'])
+        users = self._read_by_id('res.users', [v['user_id'] for v in orders_values], ['name'])
+        payment_terms = self._read_by_id(
+            'account.payment.term', [v['payment_term_id'] for v in orders_values], ['name']
+        )
+        companies = self._read_by_id('res.company', [v['company_id'] for v in orders_values], ['name'])
+        invoices = self._read_by_id(
+            'account.move', [i for v in orders_values for i in v['invoice_ids']],
+            ['name', 'invoice_date', 'amount_total', 'state', 'payment_state']
+        )
+        pickings = self._read_by_id(
+            'stock.picking', [p for v in orders_values for p in v['picking_ids']],
+            ['name', 'date_done', 'state', 'scheduled_date']
+        )
+        
+        # Líneas de todos los pedidos en una sola consulta, paginables por (sequence, id)
+        lines_by_order = defaultdict(list)
+        lines_next_cursor = None
+        if include_lines and orders_values:
+            domain = [('order_id', 'in', [v['id'] for v in orders_values])]
+            if lines_after:
+                sequence, line_id = lines_after
+                domain += ['|', ('sequence', '>', sequence),
+                           '&', ('sequence', '=', sequence), ('id', '>', line_id)]
+            lines = request.env['sale.order.line'].search_read(
+                domain,
+                ['order_id', 'sequence', 'product_id', 'name', 'product_uom_qty', 'qty_delivered',
+                 'qty_invoiced', 'price_unit', 'discount', 'price_subtotal', 'price_total', 'tax_id'],
+                limit=lines_limit + 1 if lines_limit else None,
+                order='order_id, sequence, id',
+                load=None
+            )
+            if lines_limit and len(lines) > lines_limit:
+                lines = lines[:lines_limit]
+                lines_next_cursor = self._encode_lines_cursor(lines[-1]['sequence'], lines[-1]['id'])
+            
+            products = self._read_by_id(
+                'product.product', [line['product_id'] for line in lines], ['name', 'default_code']
+            )
+            image_urls = product_image_urls(request.env, list(products))
+            taxes = self._read_by_id(
+                'account.tax', [t for line in lines for t in line['tax_id']], ['name', 'amount']
+            )
+            for line in lines:
+                product = products.get(line['product_id'])
+                lines_by_order[line['order_id']].append({
+                    'id': line['id'],
+                    'product': {
+                        'id': product['id'],
+                        'name': product['name'],
+                        'default_code': product['default_code'],
+                        'image_url': image_urls[product['id']]
+                    } if product else None,
+                    'name': line['name'],
+                    'quantity': float_round(line['product_uom_qty'], 2),
+                    'delivered_qty': float_round(line['qty_delivered'], 2),
+                    'invoiced_qty': float_round(line['qty_invoiced'], 2),
+                    'price_unit': float_round(line['price_unit'], 2),
+                    'discount': float_round(line['discount'], 2),
+                    'price_subtotal': float_round(line['price_subtotal'], 2),
+                    'price_total': float_round(line['price_total'], 2),
+                    'tax_ids': [{
+                        'id': taxes[tax_id]['id'],
+                        'name': taxes[tax_id]['name'],
+                        'amount': taxes[tax_id]['amount']
+                    } for tax_id in line['tax_id'] if tax_id in taxes]
+                })
+        
+        details = {}
+        for values in orders_values:
+            try:
+                detail = self._prepare_sale_order_detail(
+                    values,
+                    partners=partners,
+                    countries=countries,
+                    currencies=currencies,
+                    users=users,
+                    payment_terms=payment_terms,
+                    companies=companies,
+                    invoices=invoices,
+                    pickings=pickings,
+                    lines=lines_by_order[values['id']] if include_lines else None
+                )
+                if lines_limit:
+                    detail['lines_next_cursor'] = lines_next_cursor
+                    detail['lines_has_more'] = bool(lines_next_cursor)
+                details[values['id']] = detail
+            except Exception as e:
+                _logger.error(f"Sale order {values['id']} detail error: {str(e)}")
+                details[values['id']] = e
+        return details
+    
+    def _prepare_sale_order_detail(self, values, partners, countries, currencies, users, payment_terms,
+                                   companies, invoices, pickings, lines):
+        """Construir el detalle de un pedido de venta a partir de datos ya cargados"""
+        partner = partners.get(values['partner_id'])
+        country = countries.get(partner['country_id']) if partner else None
+        currency = currencies.get(values['currency_id'])
+        user = users.get(values['user_id'])
+        payment_term = payment_terms.get(values['payment_term_id'])
+        company = companies.get(values['company_id'])
+        
+        # Facturas relacionadas
+        invoices_data = []
+        for invoice in (invoices[i] for i in values['invoice_ids'] if i in invoices):
+            invoices_data.append({
+                'id': invoice['id'],
+                'name': invoice['name'],
+                'date': invoice['invoice_date'].isoformat() if invoice['invoice_date'] else None,
+                'amount_total': float_round(invoice['amount_total'], 2),
+                'state': invoice['state'],
+                'payment_state': invoice['payment_state']
+            })
+        
+        # Entregas relacionadas
+        deliveries_data = []
+        for picking in (pickings[p] for p in values['picking_ids'] if p in pickings):
+            deliveries_data.append({
+                'id': picking['id'],
+                'name': picking['name'],
+                'date': picking['date_done'].isoformat() if picking['date_done'] else None,
+                'state': picking['state'],
+                'scheduled_date': picking['scheduled_date'].isoformat() if picking['scheduled_date'] else None
+            })
+        
+        return {
+            'id': values['id'],
+            'name': values['name'],
+            'date_order': values['date_order'].isoformat() if values['date_order'] else None,
+            'partner': {
+                'id': partner['id'],
+                'name': partner['name'],
+                'vat': partner['vat'],
+                'email': partner['email'],
+                'phone': partner['phone'],
+                'street': partner['street'],
+                'city': partner['city'],
+                'country': country['name'] if country else None
+            } if partner else None,
+            'amount_untaxed': float_round(values['amount_untaxed'], 2),
+            'amount_tax': float_round(values['amount_tax'], 2),
+            'amount_total': float_round(values['amount_total'], 2),
+            'state': values['state'],
+            'invoice_status': values['invoice_status'],
+            'delivery_status': values.get('delivery_status'),
+            'currency': {
+                'id': currency['id'],
+                'name': currency['name'],
+                'symbol': currency['symbol']
+            } if currency else None,
+            'client_order_ref': values['client_order_ref'],
+            'user': {
+                'id': user['id'],
+                'name': user['name']
+            } if user else None,
+            'payment_term': payment_term['name'] if payment_term else None,
+            'note': values['note'],
+            'lines': lines,
+            'invoices': invoices_data,
+            'deliveries': deliveries_data,
+            'company': {
+                'id': company['id'],
+                'name': company['name']
+            } if company else None
+        }
+    
+    @http.route('/api/v1/sales/customers', type='json', auth='jwt', methods=['GET'], csrf=False)
     @rate_limit(limit=30, window=300)
     @log_api_call
     def get_customers(self):
@@ -294,8 +494,7 @@ class SalesController(MakiAPIController):
                 str(e)
             )
     
-    @http.route('/api/v1/sales/customers/<int:customer_id>', type='json', auth='user', methods=['GET'], csrf=False)
-    @jwt_required
+    @http.route('/api/v1/sales/customers/<int:customer_id>', type='json', auth='jwt', methods=['GET'], csrf=False)
     @rate_limit(limit=100, window=300)
     @log_api_call
     def get_customer_detail(self, customer_id):
@@ -310,105 +509,11 @@ class SalesController(MakiAPIController):
                     "CUSTOMER_NOT_FOUND"
                 )
             
-            # Pedidos del cliente
-            SaleOrder = request.env['sale.order']
-            orders = SaleOrder.search([
-                ('partner_id', '=', customer.id)
-            ], limit=10, order='date_order desc')
+            detail = self._prepare_customer_details(customer)[customer.id]
+            if isinstance(detail, Exception):
+                raise detail
             
-            orders_data = []
-            for order in orders:
-                orders_data.append({
-                    'id': order.id,
-                    'name': order.name,
-                    'date_order': order.date_order.isoformat() if order.date_order else None,
-                    'amount_total': float_round(order.amount_total, 2),
-                    'state': order.state
-                })
-            
-            # Facturas del cliente
-            AccountMove = request.env['account.move']
-            invoices = AccountMove.search([
-                ('partner_id', '=', customer.id),
-                ('move_type', 'in', ['out_invoice', 'out_refund'])
-            ], limit=10, order='invoice_date desc')
-            
-            invoices_data = []
-            for invoice in invoices:
-                invoices_data.append({
-                    'id': invoice.id,
-                    'name': invoice.name,
-                    'date': invoice.invoice_date.isoformat() if invoice.invoice_date else None,
-                    'amount_total': float_round(invoice.amount_total, 2),
-                    'state': invoice.state,
-                    'payment_state': invoice.payment_state
-                })
-            
-            # Contactos relacionados (si es una empresa)
-            contacts_data = []
-            if customer.is_company:
-                contacts = Partner.search([
-                    ('parent_id', '=', customer.id)
-                ])
-                
-                for contact in contacts:
-                    contacts_data.append({
-                        'id': contact.id,
-                        'name': contact.name,
-                        'function': contact.function,
-                        'email': contact.email,
-                        'phone': contact.phone,
-                        'mobile': contact.mobile
-                    })
-            
-            customer_detail = {
-                'id': customer.id,
-                'name': customer.name,
-                'vat': customer.vat,
-                'email': customer.email,
-                'phone': customer.phone,
-                'mobile': customer.mobile,
-                'street': customer.street,
-                'street2': customer.street2,
-                'city': customer.city,
-                'zip': customer.zip,
-                'country': {
-                    'id': customer.country_id.id,
-                    'name': customer.country_id.name,
-                    'code': customer.country_id.code
-                } if customer.country_id else None,
-                'state': {
-                    'id': customer.state_id.id,
-                    'name': customer.state_id.name
-                } if customer.state_id else None,
-                'website': customer.website,
-                'customer_rank': customer.customer_rank,
-                'supplier_rank': customer.supplier_rank,
-                'company': {
-                    'id': customer.company_id.id,
-                    'name': customer.company_id.name
-                } if customer.company_id else None,
-                'is_company': customer.is_company,
-                'parent': {
-                    'id': customer.parent_id.id,
-                    'name': customer.parent_id.name
-                } if customer.parent_id else None,
-                'category_id': [{
-                    'id': category.id,
-                    'name': category.name
-                } for category in customer.category_id],
-                'comment': customer.comment,
-                'orders': orders_data,
-                'invoices': invoices_data,
-                'contacts': contacts_data,
-                'total_orders': SaleOrder.search_count([('partner_id', '=', customer.id)]),
-                'total_invoices': AccountMove.search_count([
-                    ('partner_id', '=', customer.id),
-                    ('move_type', 'in', ['out_invoice', 'out_refund'])
-                ])
-            }
-            
-            return self._success_response(customer_detail)
+            return self._success_response(detail)
             
         except Exception as e:
             _logger.error(f"Get customer detail error: {str(e)}")
@@ -418,8 +523,209 @@ class SalesController(MakiAPIController):
                 str(e)
             )
     
-    @http.route('/api/v1/sales/products', type='json', auth='user', methods=['GET'], csrf=False)
-    @jwt_required
+    @http.route('/api/v1/sales/customers/batch', type='json', auth='jwt', methods=['POST'], csrf=False)
+    @rate_limit(limit=30, window=300)
+    @log_api_call
+    def get_customers_batch(self):
+        """Obtener el detalle de varios clientes en una sola llamada"""
+        try:
+            ids, error = self._get_batch_ids(request.jsonrequest or {})
+            if error:
+                return error
+            
+            return self._batch_response(
+                request.env['res.partner'].browse(ids),
+                self._prepare_customer_details,
+                "Customer not found",
+                "CUSTOMER_NOT_FOUND",
+                "CUSTOMER_DETAIL_ERROR"
+            )
+            
+        except Exception as e:
+            _logger.error(f"Get customers batch error: {str(e)}")
+            return self._error_response(
+                "Error retrieving customers", 
+                "CUSTOMERS_BATCH_ERROR",
+                str(e)
+            )
+    
+    def _search_latest_per_partner(self, model, domain, partner_ids, order_column, limit=10):
+        """Buscar los últimos `limit` registros de cada partner en una sola consulta
+        
+        Usa el Query del ORM, por lo que se aplican las reglas de registro.
+        
+        Returns:
+            list: ids ordenados por partner y `order_column` descendente
+        """
+        Model = request.env[model]
+        query = Model._search(domain + [('partner_id', 'in', partner_ids)])
+        table = Model._table
+        query_str, params = query.select(
+            f'"{table}"."id"',
+            f'"{table}"."partner_id"',
+            f'"{table}"."{order_column}" AS order_value',
+            f'ROW_NUMBER() OVER (PARTITION BY "{table}"."partner_id" '
+            f'ORDER BY "{table}"."{order_column}" DESC, "{table}"."id" DESC) AS row_number'
+        )
+        # El orden de la ventana no se conserva fuera de la subconsulta
+        request.env.cr.execute(
+            f'SELECT id FROM ({query_str}) AS ranked WHERE row_number <= %s '
+            f'ORDER BY partner_id, order_value DESC, id DESC',
+            params + [limit]
+        )
+        return [row[0] for row in request.env.cr.fetchall()]
+    
+    def _prepare_customer_details(self, customers):
+        """Construir el detalle de varios clientes con un número fijo de consultas
+        
+        Las relaciones se leen en bloque para todos los clientes y los totales
+        salen de las estadísticas precalculadas por compañía, sin search_count
+        por cliente. Todo se lee como el usuario de la API: sus reglas de
+        registro y compañías permitidas se aplican también a los totales (ver
+        res.partner._get_maki_customer_totals).
+        
+        Returns:
+            dict: id del cliente -> detalle, o la excepción si falló su serialización
+        """
+        env = request.env
+        customer_ids = customers.ids
+        customers_values = customers.read(CUSTOMER_DETAIL_FIELDS, load=None)
+        totals = customers._get_maki_customer_totals()
+        
+        # Relaciones leídas de una vez para todos los clientes
+        countries = self._read_by_id('res.country', [v['country_id'] for v in customers_values], ['name', 'code'])
+        states = self._read_by_id('res.country.state', [v['state_id'] for v in customers_values], ['name'])
+        companies = self._read_by_id('res.company', [v['company_id'] for v in customers_values], ['name'])
+        parents = self._read_by_id('res.partner', [v['parent_id'] for v in customers_values], ['name'])
+        categories = self._read_by_id(
+            'res.partner.category',
+            [category_id for v in customers_values for category_id in v['category_id']],
+            ['name']
+        )
+        
+        # Últimos pedidos de cada cliente
+        orders_by_partner = defaultdict(list)
+        order_ids = self._search_latest_per_partner('sale.order', [], customer_ids, 'date_order')
+        for order in env['sale.order'].browse(order_ids).read(
+            ['partner_id', 'name', 'date_order', 'amount_total', 'state'], load=None
+        ):
+            orders_by_partner[order['partner_id']].append({
+                'id': order['id'],
+                'name': order['name'],
+                'date_order': order['date_order'].isoformat() if order['date_order'] else None,
+                'amount_total': float_round(order['amount_total'], 2),
+                'state': order['state']
+            })
+        
+        # Últimas facturas de cada cliente
+        invoices_by_partner = defaultdict(list)
+        invoice_ids = self._search_latest_per_partner(
+            'account.move',
+            [('move_type', 'in', ['out_invoice', 'out_refund'])],
+            customer_ids,
+            'invoice_date'
+        )
+        for invoice in env['account.move'].browse(invoice_ids).read(
+            ['partner_id', 'name', 'invoice_date', 'amount_total', 'state', 'payment_state'], load=None
+        ):
+            invoices_by_partner[invoice['partner_id']].append({
+                'id': invoice['id'],
+                'name': invoice['name'],
+                'date': invoice['invoice_date'].isoformat() if invoice['invoice_date'] else None,
+                'amount_total': float_round(invoice['amount_total'], 2),
+                'state': invoice['state'],
+                'payment_state': invoice['payment_state']
+            })
+        
+        # Contactos relacionados (solo para empresas)
+        contacts_by_partner = defaultdict(list)
+        company_ids = [v['id'] for v in customers_values if v['is_company']]
+        if company_ids:
+            for contact in env['res.partner'].search_read(
+                [('parent_id', 'in', company_ids)],
+                ['parent_id', 'name', 'function', 'email', 'phone', 'mobile'],
+                load=None
+            ):
+                contacts_by_partner[contact['parent_id']].append({
+                    'id': contact['id'],
+                    'name': contact['name'],
+                    'function': contact['function'],
+                    'email': contact['email'],
+                    'phone': contact['phone'],
+                    'mobile': contact['mobile']
+                })
+        
+        details = {}
+        for values in customers_values:
+            try:
+                details[values['id']] = self._prepare_customer_detail(
+                    values,
+                    country=countries.get(values['country_id']),
+                    state=states.get(values['state_id']),
+                    company=companies.get(values['company_id']),
+                    parent=parents.get(values['parent_id']),
+                    categories=[categories[category_id] for category_id in values['category_id']
+                                if category_id in categories],
+                    orders=orders_by_partner[values['id']],
+                    invoices=invoices_by_partner[values['id']],
+                    contacts=contacts_by_partner[values['id']],
+                    totals=totals[values['id']]
+                )
+            except Exception as e:
+                _logger.error(f"Customer {values['id']} detail error: {str(e)}")
+                details[values['id']] = e
+        return details
+    
+    def _prepare_customer_detail(self, values, country, state, company, parent, categories,
+                                 orders, invoices, contacts, totals):
+        """Construir el detalle de un cliente a partir de datos ya cargados"""
+        return {
+            'id': values['id'],
+            'name': values['name'],
+            'vat': values['vat'],
+            'email': values['email'],
+            'phone': values['phone'],
+            'mobile': values['mobile'],
+            'street': values['street'],
+            'street2': values['street2'],
+            'city': values['city'],
+            'zip': values['zip'],
+            'country': {
+                'id': country['id'],
+                'name': country['name'],
+                'code': country['code']
+            } if country else None,
+            'state': {
+                'id': state['id'],
+                'name': state['name']
+            } if state else None,
+            'website': values['website'],
+            'customer_rank': values['customer_rank'],
+            'supplier_rank': values['supplier_rank'],
+            'company': {
+                'id': company['id'],
+                'name': company['name']
+            } if company else None,
+            'is_company': values['is_company'],
+            'parent': {
+                'id': parent['id'],
+                'name': parent['name']
+            } if parent else None,
+            'category_id': [{
+                'id': category['id'],
+                'name': category['name']
+            } for category in categories],
+            'comment': values['comment'],
+            'orders': orders,
+            'invoices': invoices,
+            'contacts': contacts,
+            'total_orders': totals['total_orders'],
+            'total_invoices': totals['total_invoices'],
+            'lifetime_revenue': float_round(totals['lifetime_revenue'], 2),
+            'last_order_date': totals['last_order_date'].isoformat() if totals['last_order_date'] else None
+        }
+    
+    @http.route('/api/v1/sales/products', type='json', auth='jwt', methods=['GET'], csrf=False)
     @rate_limit(limit=50, window=300)
     @log_api_call
     def get_products(self):
@@ -455,6 +761,8 @@ class SalesController(MakiAPIController):
             products = Product.search(domain, limit=limit, offset=offset, order='name')
             total_count = Product.search_count(domain)
             
+            image_urls = product_image_urls(request.env, products.ids)
+            
             # Formatear datos
             product_data = []
             for product in products:
@@ -476,7 +784,7 @@ class SalesController(MakiAPIController):
                     'sale_ok': product.sale_ok,
                     'purchase_ok': product.purchase_ok,
                     'active': product.active,
-                    'image_url': f"/web/image/product.product/{product.id}/image_128",
+                    'image_url': image_urls[product.id],
                     'qty_available': float_round(product.qty_available, 2) if product.type == 'product' else None,
                     'virtual_available': float_round(product.virtual_available, 2) if product.type == 'product' else None
                 })
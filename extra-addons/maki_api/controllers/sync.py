@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+import json
+import base64
+import logging
+from datetime import date, datetime, timedelta
+
+from odoo import http, fields
+from odoo.http import request
+
+from .main import MakiAPIController, rate_limit, log_api_call
+
+_logger = logging.getLogger(__name__)
+
+# Modelos expuestos por el feed de sincronización
+SYNC_MODELS = {
+    'orders': {
+        'model': 'sale.order',
+        'domain': [],
+        'fields': [
+            'name', 'date_order', 'partner_id', 'amount_untaxed', 'amount_tax', 'amount_total',
+            'state', 'invoice_status', 'currency_id', 'client_order_ref', 'user_id', 'company_id',
+        ],
+    },
+    'invoices': {
+        'model': 'account.move',
+        'domain': [('move_type', 'in', ['out_invoice', 'out_refund', 'in_invoice', 'in_refund'])],
+        'fields': [
+            'name', 'move_type', 'invoice_date', 'invoice_date_due', 'partner_id', 'amount_untaxed',
+            'amount_tax', 'amount_total', 'amount_residual', 'state', 'payment_state', 'currency_id',
+            'ref', 'invoice_origin', 'company_id',
+        ],
+    },
+    'partners': {
+        'model': 'res.partner',
+        'domain': [],
+        'active_test': False,
+        'fields': [
+            'name', 'vat', 'email', 'phone', 'mobile', 'street', 'city', 'zip', 'country_id',
+            'state_id', 'website', 'customer_rank', 'supplier_rank', 'company_id', 'is_company',
+            'parent_id', 'active',
+        ],
+    },
+    'products': {
+        'model': 'product.product',
+        'domain': [],
+        'active_test': False,
+        'fields': [
+            'name', 'default_code', 'barcode', 'list_price', 'standard_price', 'type', 'categ_id',
+            'uom_id', 'sale_ok', 'purchase_ok', 'active',
+        ],
+    },
+}
+
+# Tamaño máximo de página del feed
+SYNC_MAX_LIMIT = 500
+
+class SyncController(MakiAPIController):
+    """Controlador para la sincronización incremental de réplicas del frontend"""
+    
+    def _encode_sync_cursor(self, write_date, record_id, tombstone_id):
+        """Codificar el cursor opaco (write_date, id, último tombstone)"""
+        payload = json.dumps({
+            'wd': write_date.isoformat() if write_date else None,
+            'id': record_id,
+            't': tombstone_id
+        })
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+    
+    def _decode_sync_cursor(self, cursor):
+        """Decodificar el cursor opaco
+        
+        Returns:
+            tuple: (write_date, id, último tombstone)
+        """
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        write_date = datetime.fromisoformat(payload['wd']) if payload.get('wd') else None
+        return write_date, int(payload.get('id') or 0), int(payload.get('t') or 0)
+    
+    def _serialize_sync_values(self, values):
+        """Convertir fechas a ISO y many2one a {'id', 'name'}"""
+        data = {}
+        for name, value in values.items():
+            if isinstance(value, (date, datetime)):
+                value = value.isoformat()
+            elif isinstance(value, tuple) and len(value) == 2:
+                value = {
+                    'id': value[0],
+                    'name': value[1]
+                }
+            elif value is False and name not in ('active', 'is_company', 'sale_ok', 'purchase_ok'):
+                value = None
+            data[name] = value
+        return data
+    
+    @http.route('/api/v1/sync/<string:model_key>', type='json', auth='jwt', methods=['GET', 'POST'], csrf=False)
+    @rate_limit(limit=60, window=300)
+    @log_api_call
+    def sync_model(self, model_key):
+        """Feed incremental: registros creados, modificados o borrados desde el cursor
+        
+        Sin cursor se recorre el modelo completo desde el principio; los
+        borrados anteriores al primer cursor no se devuelven. El cursor de
+        la respuesta se envía en la siguiente llamada mientras has_more sea
+        verdadero, y se guarda para el siguiente refresco.
+        """
+        try:
+            sync_model = SYNC_MODELS.get(model_key)
+            if not sync_model:
+                return self._error_response(
+                    f"Unknown sync model: {model_key}",
+                    "SYNC_MODEL_NOT_FOUND"
+                )
+            
+            params = request.jsonrequest or {}
+            limit = max(1, min(int(params.get('limit', 100)), SYNC_MAX_LIMIT))
+            cursor = params.get('cursor')
+            
+            env = request.env
+            ICP = env['ir.config_parameter'].sudo()
+            Tombstone = env['maki_api.sync_tombstone'].sudo()
+            
+            # Los cambios más recientes que este margen se entregan en la
+            # siguiente llamada, para no saltar transacciones aún sin confirmar
+            safety_lag = int(ICP.get_param('maki_api.sync_safety_lag', 10))
+            upper_bound = fields.Datetime.now() - timedelta(seconds=safety_lag)
+            
+            if cursor:
+                try:
+                    last_write_date, last_id, last_tombstone_id = self._decode_sync_cursor(cursor)
+                except (ValueError, TypeError, KeyError):
+                    return self._error_response("Invalid sync cursor", "INVALID_CURSOR")
+                
+                # Si se purgaron tombstones posteriores al cursor, el cliente
+                # puede haber perdido borrados y tiene que volver a descargar
+                # el modelo completo (la antigüedad de los registros no importa)
+                if last_tombstone_id < Tombstone.get_purged_id(sync_model['model']):
+                    return self._success_response({
+                        'model': model_key,
+                        'records': [],
+                        'deleted': [],
+                        'next_cursor': None,
+                        'has_more': False,
+                        'reset_required': True
+                    })
+            else:
+                last_write_date, last_id = None, 0
+                env.cr.execute("""
+                    SELECT COALESCE(MAX(id), 0) FROM maki_api_sync_tombstone
+                    WHERE res_model = %s AND deleted_at < %s
+                """, (sync_model['model'], upper_bound))
+                # La carga completa ya refleja los borrados purgados
+                last_tombstone_id = max(env.cr.fetchone()[0], Tombstone.get_purged_id(sync_model['model']))
+            
+            # Registros modificados, ordenados por (write_date, id)
+            Model = env[sync_model['model']].with_context(active_test=sync_model.get('active_test', True))
+            query = Model._search(sync_model['domain'], order='write_date, id', limit=limit + 1)
+            table = Model._table
+            query.add_where(f'"{table}"."write_date" < %s', [upper_bound])
+            if last_write_date:
+                query.add_where(
+                    f'("{table}"."write_date", "{table}"."id") > (%s, %s)',
+                    [last_write_date, last_id]
+                )
+            query_str, query_params = query.select(f'"{table}"."id"', f'"{table}"."write_date"')
+            env.cr.execute(query_str, query_params)
+            rows = env.cr.fetchall()
+            
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            
+            records_data = []
+            if rows:
+                values_by_id = {
+                    values['id']: values
+                    for values in Model.browse([row[0] for row in rows]).read(sync_model['fields'])
+                }
+                for record_id, write_date in rows:
+                    if record_id in values_by_id:
+                        data = self._serialize_sync_values(values_by_id[record_id])
+                        data['write_date'] = write_date.isoformat()
+                        records_data.append(data)
+                last_id, last_write_date = rows[-1]
+            
+            # Tombstones de los registros borrados
+            env.cr.execute("""
+                SELECT id, res_id FROM maki_api_sync_tombstone
+                WHERE res_model = %s AND id > %s AND deleted_at < %s
+                ORDER BY id
+                LIMIT %s
+            """, (sync_model['model'], last_tombstone_id, upper_bound, limit + 1))
+            tombstones = env.cr.fetchall()
+            
+            has_more = has_more or len(tombstones) > limit
+            tombstones = tombstones[:limit]
+            if tombstones:
+                last_tombstone_id = tombstones[-1][0]
+            
+            return self._success_response({
+                'model': model_key,
+                'records': records_data,
+                'deleted': [tombstone[1] for tombstone in tombstones],
+                'next_cursor': self._encode_sync_cursor(last_write_date, last_id, last_tombstone_id),
+                'has_more': has_more,
+                'reset_required': False
+            })
+        
+        except Exception as e:
+            _logger.error(f"Sync {model_key} error: {str(e)}")
+            return self._error_response(
+                "Error retrieving sync feed",
+                "SYNC_ERROR",
+                str(e)
+            )
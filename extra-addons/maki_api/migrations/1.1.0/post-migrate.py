@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+
+from odoo import api, fields, SUPERUSER_ID
+
+def migrate(cr, version):
+    """Partition the existing API logs by month
+    
+    init() has already created the partitions from the current month on;
+    create those of the retention period too and move the logs into them.
+    Older logs stay in the parent table until the next cleanup deletes them.
+    """
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    Log = env['maki_api.log']
+    days = int(env['ir.config_parameter'].get_param('maki_api.log_retention_days', 30))
+    Log._create_log_partitions(since=fields.Datetime.now() - timedelta(days=days))
+    Log._move_logs_into_partitions()
@@ -1,5 +1,16 @@
 # -*- coding: utf-8 -*-
 from . import rate_limit
+from . import rate_limit_policy
 from . import api_log
 from . import backup
-from . import token_blacklist
\ No newline at end of file
+from . import token_blacklist
+from . import res_partner
+from . import sync_tombstone
+from . import sale_order
+from . import account_move
+from . import product_product
+from . import image_cache
+from . import res_users
+from . import jwt_keys
+from . import ir_http
+from . import res_groups
\ No newline at end of file
@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+from odoo import models
+
+class AccountMove(models.Model):
+    _inherit = 'account.move'
+    
+    def unlink(self):
+        invoices = self.filtered(lambda move: move.is_invoice(include_receipts=True))
+        self.env['maki_api.sync_tombstone'].record_deletion(invoices)
+        return super().unlink()
@@ -1,16 +1,63 @@
 # -*- coding: utf-8 -*-
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
+from odoo.tools import config
+import odoo.modules.module
+import os
+import re
+import random
+import fnmatch
+import gzip
 import logging
 import json
+import bisect
 from datetime import datetime, timedelta
+from dateutil.relativedelta import relativedelta
+
+from ..tools.log_sanitizer import payload_redactor
+from ..tools.log_writer import log_writer
 
 _logger = logging.getLogger(__name__)
 
+# Particiones mensuales de maki_api_log por create_date (ver _create_log_partition)
+PARTITION_NAME = re.compile(r'^maki_api_log_p(\d{6})$')
+# Particiones creadas por adelantado, para que las inserciones nunca caigan en la tabla padre
+PARTITIONS_AHEAD = 3
+# Logs sin partición borrados por sentencia al aplicar la retención, para no bloquear la tabla
+CLEANUP_CHUNK_SIZE = 10000
+ARCHIVE_DIR = 'maki_api_log_archive'
+
+# Sin maki_api.log_payload_sampling: solo se guardan los datos de las llamadas con error
+DEFAULT_PAYLOAD_SAMPLING = {'*': {'4xx': 1.0, '5xx': 1.0}}
+
+# Límites superiores (ms) de los buckets del histograma de latencia de los rollups
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float('inf'))
+
+def histogram_percentile(buckets, quantile):
+    """Estimate a latency percentile (ms) from LATENCY_BUCKETS counts
+    
+    Interpolates linearly inside the bucket holding the percentile; the
+    open last bucket reports its lower bound.
+    """
+    total = sum(buckets)
+    if not total:
+        return None
+    rank = quantile * total
+    seen = 0
+    for index, count in enumerate(buckets):
+        if count and seen + count >= rank:
+            lower = LATENCY_BUCKETS[index - 1] if index else 0
+            upper = LATENCY_BUCKETS[index]
+            if upper == float('inf'):
+                return lower
+            return round(lower + (upper - lower) * (rank - seen) / count, 2)
+        seen += count
+    return LATENCY_BUCKETS[-2]
+
 class APILog(models.Model):
     _name = 'maki_api.log'
     _description = 'API Call Logs'
     _order = 'create_date DESC'
-
+    
     endpoint = fields.Char(string='API Endpoint', required=True, index=True,
                          help='The API endpoint that was called')
     method = fields.Selection([
@@ -38,13 +85,25 @@ class APILog(models.Model):
                        help='Error message if the call failed')
     cache_hit = fields.Boolean(string='Cache Hit', default=False,
                              help='Whether the response was served from cache')
+    query_count = fields.Integer(string='SQL Queries',
+                                 help='Number of SQL statements run by the API call')
+    query_time = fields.Float(string='SQL Time (ms)',
+                              help='Time spent in SQL statements in milliseconds')
+    n_plus_one = fields.Boolean(string='N+1 Queries', index=True,
+                                help='Whether the same query was repeated many times (likely N+1 pattern)')
+    repeated_query = fields.Text(string='Most Repeated Query',
+                                 help='Most repeated SQL statement and its count, when flagged as N+1')
     
     @api.model
     def log_api_call(self, endpoint, method, status_code, execution_time, user_id=None, 
                     ip_address=None, user_agent=None, request_data=None, response_data=None, 
-                    error=None, cache_hit=False):
+                    error=None, cache_hit=False, query_count=None, query_time=None,
+                    n_plus_one=False, repeated_query=None):
         """Log an API call
         
+        The call is queued and written in a batch by the worker's log
+        writer thread (see tools/log_writer.py), outside the request.
+        
         Args:
             endpoint: API endpoint that was called
             method: HTTP method used
@@ -57,140 +116,515 @@ class APILog(models.Model):
             response_data: JSON data returned in the response
             error: Error message if the call failed
             cache_hit: Whether the response was served from cache
+            query_count: Number of SQL statements run
+            query_time: Time spent in SQL in milliseconds
+            n_plus_one: Whether a query was repeated many times
+            repeated_query: Most repeated query, when n_plus_one
         """
-        try:
-            # Sanitize request and response data to prevent storing sensitive information
-            safe_request_data = self._sanitize_data(request_data) if request_data else None
-            safe_response_data = self._sanitize_data(response_data) if response_data else None
-            
-            # Create log entry
-            self.create({
-                'endpoint': endpoint,
-                'method': method,
-                'status_code': status_code,
-                'execution_time': execution_time,
-                'user_id': user_id,
-                'ip_address': ip_address,
-                'user_agent': user_agent,
-                'request_data': safe_request_data,
-                'response_data': safe_response_data,
-                'error': error,
-                'cache_hit': cache_hit
-            })
-            
-            # Log to console for debugging
-            if status_code >= 400 or error:
-                _logger.warning(f"API Error: {endpoint} - {status_code} - {error}")
-            elif execution_time > 1000:  # More than 1 second
-                _logger.info(f"Slow API: {endpoint} - {execution_time}ms")
-                
-        except Exception as e:
-            _logger.error(f"Failed to log API call: {e}")
+        entry = {
+            'endpoint': endpoint,
+            'method': method,
+            'status_code': status_code,
+            'execution_time': execution_time,
+            'user_id': user_id,
+            'ip_address': ip_address,
+            'user_agent': user_agent,
+            'request_data': request_data,
+            'response_data': response_data,
+            'error': error,
+            'cache_hit': cache_hit,
+            'query_count': query_count,
+            'query_time': query_time,
+            'n_plus_one': n_plus_one,
+            'repeated_query': repeated_query,
+            'create_date': datetime.utcnow(),
+        }
+        
+        # Las transacciones de los tests nunca hacen commit: escritura directa
+        if odoo.modules.module.current_test:
+            self._write_log_batch([entry])
+        else:
+            log_writer.enqueue(self.env.cr.dbname, entry)
+        
+        # Log to console for debugging
+        if status_code >= 400 or error:
+            _logger.warning(f"API Error: {endpoint} - {status_code} - {error}")
+        elif execution_time > 1000:  # More than 1 second
+            _logger.info(f"Slow API: {endpoint} - {execution_time}ms")
+        if n_plus_one:
+            _logger.warning(f"Repeated queries (likely N+1) in {endpoint}: {(repeated_query or '')[:200]}")
+    
+    @api.model
+    def _write_log_batch(self, entries):
+        """Insert queued API calls with one multi-row INSERT per monthly partition
+        
+        Request and response data are sanitized here, in the writer
+        thread, rather than in the request that made the call. A call whose
+        month has no partition yet goes to the parent table, which acts as
+        the default partition.
+        """
+        from psycopg2.extras import execute_values
+        
+        partitions = {name for name, _start, _end in self._get_log_partitions()}
+        rows_by_table = {}
+        for entry in entries:
+            table = f"maki_api_log_p{entry['create_date'].strftime('%Y%m')}"
+            rows = rows_by_table.setdefault(table if table in partitions else self._table, [])
+            rows.append((
+                entry['endpoint'],
+                entry['method'],
+                entry['status_code'],
+                entry['execution_time'],
+                entry['user_id'],
+                entry['ip_address'],
+                entry['user_agent'],
+                self._sanitize_data(entry['request_data']) if entry['request_data'] else None,
+                self._sanitize_data(entry['response_data']) if entry['response_data'] else None,
+                entry['error'],
+                entry['cache_hit'],
+                entry.get('query_count'),
+                entry.get('query_time'),
+                entry.get('n_plus_one') or False,
+                entry.get('repeated_query'),
+                entry['user_id'],
+                entry['create_date'],
+                entry['user_id'],
+                entry['create_date'],
+            ))
+        
+        for table, rows in rows_by_table.items():
+            execute_values(self.env.cr._obj, f"""
+                INSERT INTO {table} (
+                    endpoint, method, status_code, execution_time, user_id, ip_address, user_agent,
+                    request_data, response_data, error, cache_hit, query_count, query_time, n_plus_one, repeated_query,
+                    create_uid, create_date, write_uid, write_date
+                )
+                VALUES %s
+            """, rows, page_size=len(rows))
+        
+        self._update_rollups(entries)
+    
+    @api.model
+    def _update_rollups(self, entries):
+        """Add API calls to their per-minute, per-endpoint rollups
+        
+        Rows are upserted in key order, so concurrent writers never
+        deadlock on the same rollups.
+        """
+        from psycopg2.extras import execute_values
+        
+        rollups = {}
+        for entry in entries:
+            key = (entry['create_date'].replace(second=0, microsecond=0), entry['endpoint'])
+            rollup = rollups.get(key)
+            if rollup is None:
+                rollup = rollups[key] = [0, 0, 0, 0.0, [0] * len(LATENCY_BUCKETS)]
+            execution_time = entry['execution_time'] or 0.0
+            rollup[0] += 1
+            rollup[1] += 1 if (entry['status_code'] or 0) >= 400 or entry['error'] else 0
+            rollup[2] += 1 if entry['cache_hit'] else 0
+            rollup[3] += execution_time
+            rollup[4][bisect.bisect_left(LATENCY_BUCKETS, execution_time)] += 1
+        
+        execute_values(self.env.cr._obj, """
+            INSERT INTO maki_api_log_rollup AS rollup
+                (minute, endpoint, calls, errors, cache_hits, total_time, buckets)
+            VALUES %s
+            ON CONFLICT (minute, endpoint) DO UPDATE SET
+                calls = rollup.calls + EXCLUDED.calls,
+                errors = rollup.errors + EXCLUDED.errors,
+                cache_hits = rollup.cache_hits + EXCLUDED.cache_hits,
+                total_time = rollup.total_time + EXCLUDED.total_time,
+                buckets = ARRAY(
+                    SELECT current + added
+                    FROM unnest(rollup.buckets, EXCLUDED.buckets) WITH ORDINALITY AS bucket(current, added, position)
+                    ORDER BY position
+                )
+        """, [key + tuple(rollups[key]) for key in sorted(rollups)], page_size=len(rollups))
     
     def _sanitize_data(self, data):
-        """Sanitize data to remove sensitive information"""
-        if not data:
-            return None
-            
+        """Sanitize data to remove sensitive information (see tools/log_sanitizer.py)"""
         try:
-            # Parse JSON if it's a string
-            if isinstance(data, str):
-                data_dict = json.loads(data)
-            else:
-                data_dict = data.copy()
-                
-            # Remove sensitive fields
-            sensitive_fields = ['password', 'token', 'secret', 'key', 'auth', 'credit_card']
-            self._recursive_sanitize(data_dict, sensitive_fields)
-            
-            return json.dumps(data_dict)
+            return payload_redactor.redact(data)
         except Exception as e:
             _logger.warning(f"Failed to sanitize data: {e}")
             return None
     
-    def _recursive_sanitize(self, data, sensitive_fields):
-        """Recursively sanitize nested dictionaries"""
-        if isinstance(data, dict):
-            for key in list(data.keys()):
-                if any(sensitive in key.lower() for sensitive in sensitive_fields):
-                    data[key] = '***REDACTED***'
-                elif isinstance(data[key], (dict, list)):
-                    self._recursive_sanitize(data[key], sensitive_fields)
-        elif isinstance(data, list):
-            for item in data:
-                if isinstance(item, (dict, list)):
-                    self._recursive_sanitize(item, sensitive_fields)
+    @api.model
+    @tools.ormcache()
+    def _get_payload_sampling(self):
+        """Payload capture rules of maki_api.log_payload_sampling, compiled once per worker
+        
+        The parameter is a JSON object mapping request path patterns (with
+        * and ? wildcards) to capture rates per status class, e.g.
+        {"/api/v1/auth/*": {"2xx": 0}, "*": {"2xx": 0.01, "4xx": 1, "5xx": 1}}.
+        
+        Returns:
+            tuple: (compiled pattern, dict status class -> rate) pairs, in order
+        """
+        sampling = self.env['ir.config_parameter'].sudo().get_param('maki_api.log_payload_sampling')
+        try:
+            rules = json.loads(sampling) if sampling else DEFAULT_PAYLOAD_SAMPLING
+        except ValueError:
+            _logger.warning("Invalid maki_api.log_payload_sampling, using the default payload sampling")
+            rules = DEFAULT_PAYLOAD_SAMPLING
+        return tuple(
+            (re.compile(fnmatch.translate(pattern)), {
+                status_class: float(rate) for status_class, rate in rates.items()
+            })
+            for pattern, rates in rules.items()
+        )
+    
+    @api.model
+    def _should_capture_payload(self, path, status_code):
+        """Whether to log the request and response data of a call
+        
+        The first pattern matching the path with a rate for the status
+        class (2xx, 4xx, 5xx...) decides, sampling at that rate.
+        """
+        status_class = f'{status_code // 100}xx'
+        for pattern, rates in self._get_payload_sampling():
+            if status_class in rates and pattern.match(path):
+                rate = rates[status_class]
+                return rate >= 1 or (rate > 0 and random.random() < rate)
+        return False
+    
+    def init(self):
+        # La retención borra por create_date, que el ORM no indexa; antes de
+        # crear particiones, que copian los índices de la tabla padre
+        tools.create_index(self.env.cr, 'maki_api_log_create_date_index', self._table, ['create_date'])
+        self._create_rollup_table()
+        self._create_log_partitions()
+    
+    @api.model
+    def _create_log_partitions(self, since=None, ahead=PARTITIONS_AHEAD):
+        """Create the missing monthly partitions from the month of ``since`` (default: now) to ``ahead`` months later"""
+        now = fields.Datetime.now()
+        start = (since or now).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        last = now + relativedelta(months=ahead)
+        while start <= last:
+            self._create_log_partition(start)
+            start += relativedelta(months=1)
+    
+    @api.model
+    def _create_log_partition(self, start):
+        """Create the partition of the month starting at ``start``, unless it exists
+        
+        maki_api_log is partitioned through table inheritance rather than
+        declaratively: Odoo 16 only recognizes relkind r, v and m as
+        tables, so it would try to create a declaratively partitioned table
+        (relkind p) again on every update. The parent stays the ordinary
+        ORM table. Each partition inherits it, copies its defaults and
+        indexes, and declares its range as a CHECK constraint, which lets
+        the planner skip it when filtering by create_date. Columns added by
+        the ORM to the parent are added to the partitions too.
+        """
+        name = f"maki_api_log_p{start.strftime('%Y%m')}"
+        self.env.cr.execute("SELECT to_regclass(%s)", (name,))
+        if self.env.cr.fetchone()[0]:
+            return
+        
+        self.env.cr.execute(f"""
+            CREATE TABLE {name} (
+                LIKE maki_api_log INCLUDING DEFAULTS INCLUDING INDEXES,
+                CONSTRAINT {name}_create_date_check CHECK (create_date >= %s AND create_date < %s)
+            ) INHERITS (maki_api_log)
+        """, (start, start + relativedelta(months=1)))
+        _logger.info(f"Created API log partition {name}")
+    
+    @api.model
+    def _get_log_partitions(self):
+        """Monthly partitions of maki_api_log
+        
+        Returns:
+            list: (name, start, end) tuples, oldest first
+        """
+        self.env.cr.execute("""
+            SELECT child.relname FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = 'maki_api_log'
+        """)
+        partitions = []
+        for name, in self.env.cr.fetchall():
+            match = PARTITION_NAME.match(name)
+            if match:
+                start = datetime.strptime(match.group(1), '%Y%m')
+                partitions.append((name, start, start + relativedelta(months=1)))
+        return sorted(partitions, key=lambda partition: partition[1])
+    
+    @api.model
+    def _move_logs_into_partitions(self):
+        """Move the logs kept in the parent table into the partitions of their month
+        
+        Used by the migration to partitioned logs, and safe to run again:
+        the logs of months without a partition stay in the parent, where
+        cleanup_old_logs deletes them in chunks once expired.
+        
+        Returns:
+            int: Logs moved
+        """
+        columns = ', '.join(f'"{column}"' for column in tools.table_columns(self.env.cr, self._table))
+        moved = 0
+        for name, start, end in self._get_log_partitions():
+            self.env.cr.execute(f"""
+                WITH moved AS (
+                    DELETE FROM ONLY maki_api_log
+                    WHERE create_date >= %s AND create_date < %s
+                    RETURNING {columns}
+                )
+                INSERT INTO {name} ({columns}) SELECT {columns} FROM moved
+            """, (start, end))
+            moved += self.env.cr.rowcount
+        _logger.info(f"Moved {moved} API logs into their partitions")
+        return moved
+    
+    def _create_rollup_table(self):
+        """Per-minute rollups of the API calls, filled from the existing logs when created"""
+        cr = self.env.cr
+        cr.execute("SELECT to_regclass('maki_api_log_rollup')")
+        if cr.fetchone()[0]:
+            return
+        
+        cr.execute("""
+            CREATE TABLE maki_api_log_rollup (
+                minute timestamp NOT NULL,
+                endpoint varchar NOT NULL,
+                calls integer NOT NULL,
+                errors integer NOT NULL,
+                cache_hits integer NOT NULL,
+                total_time double precision NOT NULL,
+                buckets integer[] NOT NULL,
+                PRIMARY KEY (minute, endpoint)
+            )
+        """)
+        
+        bucket_filters = []
+        lower = None
+        for upper in LATENCY_BUCKETS:
+            conditions = []
+            if lower is not None:
+                conditions.append(f"COALESCE(execution_time, 0) > {lower}")
+            if upper != float('inf'):
+                conditions.append(f"COALESCE(execution_time, 0) <= {upper}")
+            bucket_filters.append(f"COUNT(*) FILTER (WHERE {' AND '.join(conditions)})::integer")
+            lower = upper
+        cr.execute(f"""
+            INSERT INTO maki_api_log_rollup (minute, endpoint, calls, errors, cache_hits, total_time, buckets)
+            SELECT date_trunc('minute', create_date), endpoint, COUNT(*),
+                   COUNT(*) FILTER (WHERE status_code >= 400 OR error IS NOT NULL),
+                   COUNT(*) FILTER (WHERE cache_hit),
+                   COALESCE(SUM(execution_time), 0),
+                   ARRAY[{', '.join(bucket_filters)}]
+            FROM maki_api_log
+            GROUP BY 1, 2
+        """)
     
     @api.model
-    def cleanup_old_logs(self, days=30):
-        """Remove logs older than the specified number of days"""
+    def cleanup_old_logs(self, days=None, archive=None, chunk_size=CLEANUP_CHUNK_SIZE):
+        """Remove logs older than the specified number of days
+        
+        Whole monthly partitions are dropped once all their logs are older
+        than the cutoff, so logs are kept until their partition expires and
+        no dead rows are left behind. Before dropping, a partition can be
+        archived to a gzipped JSON Lines file in the filestore
+        (maki_api.log_archive). Also creates the upcoming partitions.
+        
+        Expired logs left in the parent table (written before partitioning,
+        or in a month without partition) are deleted in chunks of
+        ``chunk_size`` rows through the create_date index, archived the
+        same way. Work is committed after each partition and chunk outside
+        tests. Finally removes the rollups older than
+        maki_api.log_rollup_retention_days (90).
+        
+        Args:
+            days: Retention, by default maki_api.log_retention_days (30)
+            archive: Archive the logs before deleting them, by default
+                     maki_api.log_archive
+            chunk_size: Logs of the parent table deleted per statement
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        if days is None:
+            days = int(ICP.get_param('maki_api.log_retention_days', 30))
+        if archive is None:
+            archive = ICP.get_param('maki_api.log_archive', 'False').lower() in ('1', 'true')
         cutoff_date = fields.Datetime.now() - timedelta(days=days)
-        old_logs = self.search([('create_date', '<', cutoff_date)])
-        if old_logs:
-            count = len(old_logs)
-            old_logs.unlink()
-            _logger.info(f"Cleaned up {count} API logs older than {days} days")
+        
+        self._create_log_partitions()
+        
+        dropped = 0
+        for name, _start, end in self._get_log_partitions():
+            if end > cutoff_date:
+                break
+            if archive:
+                self._archive_log_partition(name)
+            self.env.cr.execute(f"DROP TABLE {name}")
+            dropped += 1
+            if not odoo.modules.module.current_test:
+                self.env.cr.commit()
+        
+        archive_path = self._get_log_archive_path(cutoff_date) if archive else None
+        deleted = 0
+        while True:
+            self.env.cr.execute("""
+                DELETE FROM ONLY maki_api_log
+                WHERE id IN (
+                    SELECT id FROM ONLY maki_api_log
+                    WHERE create_date < %s
+                    LIMIT %s
+                )
+                RETURNING row_to_json(maki_api_log)::text
+            """, (cutoff_date, chunk_size))
+            rows = self.env.cr.fetchall()
+            if not rows:
+                break
+            if archive_path:
+                # Un miembro gzip más por lote; el fichero sigue siendo un único .gz
+                with gzip.open(archive_path, 'at', encoding='utf-8') as archive_file:
+                    for line, in rows:
+                        archive_file.write(line)
+                        archive_file.write('\n')
+            deleted += len(rows)
+            if not odoo.modules.module.current_test:
+                self.env.cr.commit()
+            if len(rows) < chunk_size:
+                break
+        
+        rollup_days = int(ICP.get_param('maki_api.log_rollup_retention_days', 90))
+        self.env.cr.execute(
+            "DELETE FROM maki_api_log_rollup WHERE minute < %s",
+            (fields.Datetime.now() - timedelta(days=max(rollup_days, days)),)
+        )
+        
+        _logger.info(f"Dropped {dropped} API log partitions and deleted {deleted} API logs older than {days} days")
         return True
     
     @api.model
-    def get_performance_metrics(self, days=7):
-        """Get API performance metrics for the dashboard"""
-        cutoff_date = fields.Datetime.now() - timedelta(days=days)
+    def _archive_log_partition(self, name):
+        """Write every log of a partition to <filestore>/maki_api_log_archive/<partition>.jsonl.gz
         
-        # Get average execution time by endpoint
+        The rows are streamed with a server-side cursor, so a partition of
+        any size is archived in constant memory.
+        
+        Returns:
+            str: Path of the archive
+        """
+        directory = os.path.join(config.filestore(self.env.cr.dbname), ARCHIVE_DIR)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{name}.jsonl.gz')
+        
+        cursor = self.env.cr._cnx.cursor(name=f'{name}_archive')
+        cursor.itersize = 5000
+        try:
+            cursor.execute(f"SELECT row_to_json(log)::text FROM {name} log ORDER BY id")
+            with gzip.open(f'{path}.tmp', 'wt', encoding='utf-8') as archive_file:
+                for line, in cursor:
+                    archive_file.write(line)
+                    archive_file.write('\n')
+        finally:
+            cursor.close()
+        os.replace(f'{path}.tmp', path)
+        
+        _logger.info(f"Archived API log partition {name} to {path}")
+        return path
+    
+    @api.model
+    def _get_log_archive_path(self, cutoff_date):
+        """Path of the archive of the parent table logs deleted by a cleanup:
+        <filestore>/maki_api_log_archive/maki_api_log_<cutoff date>.jsonl.gz
+        """
+        directory = os.path.join(config.filestore(self.env.cr.dbname), ARCHIVE_DIR)
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f"maki_api_log_{cutoff_date.strftime('%Y%m%d')}.jsonl.gz")
+    
+    @api.model
+    def _get_rollup_stats(self, cutoff_date):
+        """Totals and latency histogram per endpoint since cutoff_date, from the rollups only
+        
+        Returns:
+            dict: endpoint -> {'calls', 'errors', 'cache_hits', 'total_time', 'buckets'}
+        """
         self.env.cr.execute("""
-            SELECT endpoint, AVG(execution_time) as avg_time, COUNT(*) as call_count
-            FROM maki_api_log
-            WHERE create_date >= %s
+            SELECT endpoint, SUM(calls), SUM(errors), SUM(cache_hits), SUM(total_time)
+            FROM maki_api_log_rollup
+            WHERE minute >= %s
             GROUP BY endpoint
-            ORDER BY avg_time DESC
-            LIMIT 10
         """, (cutoff_date,))
+        stats = {
+            endpoint: {
+                'calls': calls,
+                'errors': errors,
+                'cache_hits': cache_hits,
+                'total_time': total_time,
+                'buckets': [0] * len(LATENCY_BUCKETS),
+            }
+            for endpoint, calls, errors, cache_hits, total_time in self.env.cr.fetchall()
+        }
         
-        slow_endpoints = [{
-            'endpoint': row[0],
-            'avg_time': round(row[1], 2),
-            'call_count': row[2]
-        } for row in self.env.cr.fetchall()]
-        
-        # Get error rate by endpoint
         self.env.cr.execute("""
-            SELECT endpoint, 
-                   COUNT(*) as total_calls,
-                   SUM(CASE WHEN status_code >= 400 THEN 1 ELSE 0 END) as error_count
-            FROM maki_api_log
-            WHERE create_date >= %s
-            GROUP BY endpoint
-            HAVING COUNT(*) > 10
-            ORDER BY (SUM(CASE WHEN status_code >= 400 THEN 1 ELSE 0 END)::float / COUNT(*)) DESC
-            LIMIT 10
+            SELECT endpoint, bucket.position, SUM(bucket.count)
+            FROM maki_api_log_rollup, unnest(buckets) WITH ORDINALITY AS bucket(count, position)
+            WHERE minute >= %s
+            GROUP BY endpoint, bucket.position
         """, (cutoff_date,))
+        for endpoint, position, count in self.env.cr.fetchall():
+            stats[endpoint]['buckets'][position - 1] = count
+        return stats
+    
+    @api.model
+    def get_performance_metrics(self, days=7):
+        """Get API performance metrics for the dashboard
         
+        Read from the per-minute rollups only, so any period within their
+        retention (maki_api.log_rollup_retention_days) costs the same
+        whatever the call volume. Latency percentiles are estimated from
+        the rollup histograms.
+        """
+        cutoff_date = fields.Datetime.now() - timedelta(days=days)
+        stats = self._get_rollup_stats(cutoff_date)
+        
+        def latency(buckets):
+            return {
+                'p50': histogram_percentile(buckets, 0.50),
+                'p95': histogram_percentile(buckets, 0.95),
+                'p99': histogram_percentile(buckets, 0.99),
+            }
+        
+        # Get average execution time by endpoint
+        slow_endpoints = [{
+            'endpoint': endpoint,
+            'avg_time': round(stat['total_time'] / stat['calls'], 2),
+            'call_count': stat['calls'],
+            **latency(stat['buckets'])
+        } for endpoint, stat in sorted(
+            stats.items(), key=lambda item: item[1]['total_time'] / item[1]['calls'], reverse=True
+        )[:10]]
+        
+        # Get error rate by endpoint
         error_endpoints = [{
-            'endpoint': row[0],
-            'total_calls': row[1],
-            'error_count': row[2],
-            'error_rate': round((row[2] / row[1]) * 100, 2) if row[1] > 0 else 0
-        } for row in self.env.cr.fetchall()]
+            'endpoint': endpoint,
+            'total_calls': stat['calls'],
+            'error_count': stat['errors'],
+            'error_rate': round((stat['errors'] / stat['calls']) * 100, 2)
+        } for endpoint, stat in sorted(
+            ((endpoint, stat) for endpoint, stat in stats.items() if stat['calls'] > 10),
+            key=lambda item: item[1]['errors'] / item[1]['calls'], reverse=True
+        )[:10]]
         
         # Get cache hit rate
-        self.env.cr.execute("""
-            SELECT 
-                COUNT(*) as total_calls,
-                SUM(CASE WHEN cache_hit THEN 1 ELSE 0 END) as cache_hits
-            FROM maki_api_log
-            WHERE create_date >= %s
-        """, (cutoff_date,))
-        
-        row = self.env.cr.fetchone()
+        total_calls = sum(stat['calls'] for stat in stats.values())
+        cache_hits = sum(stat['cache_hits'] for stat in stats.values())
         cache_metrics = {
-            'total_calls': row[0] if row else 0,
-            'cache_hits': row[1] if row else 0,
-            'cache_hit_rate': round((row[1] / row[0]) * 100, 2) if row and row[0] > 0 else 0
+            'total_calls': total_calls,
+            'cache_hits': cache_hits,
+            'cache_hit_rate': round((cache_hits / total_calls) * 100, 2) if total_calls > 0 else 0
         }
         
+        buckets = [sum(counts) for counts in zip(*(stat['buckets'] for stat in stats.values()))]
+        
         return {
             'slow_endpoints': slow_endpoints,
             'error_endpoints': error_endpoints,
-            'cache_metrics': cache_metrics
-        }
\ No newline at end of file
+            'cache_metrics': cache_metrics,
+            'latency': latency(buckets)
+        }
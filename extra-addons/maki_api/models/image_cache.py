@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+from odoo import models, api
+from odoo.tools import config
+import os
+import time
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Directorio de las variantes redimensionadas, dentro del filestore de cada base de datos
+IMAGE_CACHE_DIR = 'maki_api_images'
+
+class ImageCache(models.AbstractModel):
+    """On-disk cache of the resized product images served by /api/v1/images
+    
+    Variants are written once and never touched on a hit, so their
+    modification time is the time they were generated.
+    """
+    _name = 'maki_api.image_cache'
+    _description = 'API Image Cache'
+    
+    @api.model
+    def _get_cache_dir(self):
+        return os.path.join(config.filestore(self.env.cr.dbname), IMAGE_CACHE_DIR)
+    
+    @api.model
+    def cleanup_image_cache(self, max_age_days=None, max_size_mb=None):
+        """Remove cached variants older than max_age_days, then the oldest ones over max_size_mb
+        
+        Removed variants are generated again on their next request; the
+        variants of replaced images are never requested again, so they
+        only go away here.
+        
+        Args:
+            max_age_days: By default maki_api.image_cache_max_age_days (30)
+            max_size_mb: By default maki_api.image_cache_max_size_mb (1024)
+        
+        Returns:
+            dict: {'removed': files removed, 'freed_bytes', 'remaining_bytes'}
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        if max_age_days is None:
+            max_age_days = float(ICP.get_param('maki_api.image_cache_max_age_days', 30))
+        if max_size_mb is None:
+            max_size_mb = float(ICP.get_param('maki_api.image_cache_max_size_mb', 1024))
+        
+        files = []
+        for directory, _dirnames, filenames in os.walk(self._get_cache_dir()):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        
+        cutoff = time.time() - max_age_days * 86400
+        total = sum(size for _mtime, size, _path in files)
+        max_size = max_size_mb * 1024 * 1024
+        removed = freed = 0
+        for mtime, size, path in files:
+            if mtime >= cutoff and total <= max_size:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                _logger.warning(f"Could not remove cached image {path}: {e}")
+                continue
+            total -= size
+            freed += size
+            removed += 1
+        
+        _logger.info(f"Removed {removed} cached API images ({freed} bytes), {total} bytes left")
+        return {'removed': removed, 'freed_bytes': freed, 'remaining_bytes': total}
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+from odoo import models
+from odoo.http import request, Response
+import json
+import logging
+from datetime import datetime
+
+import jwt
+from werkzeug.exceptions import Unauthorized
+
+from ..tools.jwt_auth import JWTAuthError, get_bearer_token, verify_access_token
+
+_logger = logging.getLogger(__name__)
+
+class JWTUnauthorized(Unauthorized):
+    """Rejected bearer token, answered with the API error envelope and a 401"""
+    
+    def __init__(self, message):
+        super().__init__(description=message)
+        self.message = message
+    
+    def get_response(self, environ=None, scope=None):
+        error = {
+            'success': False,
+            'error': {
+                'code': 401,
+                'message': self.message,
+                'details': None
+            },
+            'timestamp': datetime.now().isoformat()
+        }
+        if request and request.dispatcher.routing_type == 'json':
+            # Mismo cuerpo JSON-RPC que devolvía el endpoint, con estado 401
+            response = request.dispatcher._response(result=error)
+            response.status_code = 401
+        else:
+            response = Response(json.dumps(error), status=401, content_type='application/json')
+        response.headers['WWW-Authenticate'] = 'Bearer error="invalid_token"'
+        return response
+
+class IrHttp(models.AbstractModel):
+    _inherit = 'ir.http'
+    
+    @classmethod
+    def _auth_method_jwt(cls):
+        """Authenticate the request from its bearer token only (``auth='jwt'``)
+        
+        The session is never saved and no cookie is set, so stateless API
+        calls do not create or touch session files.
+        """
+        request.session.can_save = False
+        
+        token = get_bearer_token(request.httprequest)
+        if not token:
+            raise JWTUnauthorized('Missing or invalid Authorization header')
+        
+        try:
+            payload = verify_access_token(request.env, token)
+        except JWTAuthError as e:
+            raise JWTUnauthorized(str(e))
+        except jwt.ExpiredSignatureError:
+            raise JWTUnauthorized('Token has expired')
+        except jwt.InvalidTokenError:
+            raise JWTUnauthorized('Invalid token')
+        
+        # El idioma, la zona horaria y las compañías vienen del perfil del token
+        context = dict(request.env.context)
+        if payload.get('lang'):
+            context['lang'] = payload['lang']
+        if payload.get('tz'):
+            context['tz'] = payload['tz']
+        if payload.get('cids'):
+            context['allowed_company_ids'] = [payload['cid']] + [
+                company_id for company_id in payload['cids'] if company_id != payload['cid']
+            ]
+        request.update_env(user=int(payload['sub']), context=context)
+        request.jwt_token = token
+        request.jwt_payload = payload
+    
+    @classmethod
+    def _handle_error(cls, exception):
+        if isinstance(exception, JWTUnauthorized):
+            return exception.get_response()
+        return super()._handle_error(exception)
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api, tools, _
+from odoo.exceptions import UserError
+import json
+import uuid
+import secrets
+import logging
+from collections import namedtuple
+from datetime import timedelta
+
+import jwt
+from jwt.algorithms import get_default_algorithms
+
+_logger = logging.getLogger(__name__)
+
+# JSON list of keys: [{kid, alg, key, created, retired}]
+KEYS_PARAM = 'maki_api.jwt_keys'
+
+# Single HS256 secret used before key rotation existed; tokens without kid use it
+LEGACY_SECRET_PARAM = 'maki_api.jwt_secret_key'
+LEGACY_KID = 'default'
+
+SUPPORTED_ALGORITHMS = ('HS256', 'RS256', 'EdDSA')
+
+# Retired keys still verify tokens until the longest token lifetime has passed
+KEY_RETENTION = timedelta(days=7)
+
+JWTKey = namedtuple('JWTKey', ['kid', 'alg', 'signing_key', 'verifying_key', 'jwk', 'expires'])
+
+class JWTKeyRegistry(models.AbstractModel):
+    """Signing and verification keys of the API tokens
+    
+    Keys are stored in ir.config_parameter and parsed once per worker into
+    an ormcache. Writing a parameter clears the registry caches of every
+    worker, so a rotation is picked up without restart. The newest key
+    signs and every key not yet expired verifies, which lets keys rotate
+    without invalidating tokens already issued.
+    """
+    _name = 'maki_api.jwt_keys'
+    _description = 'JWT Key Registry'
+    
+    def init(self):
+        self._init_keys()
+    
+    @api.model
+    def _init_keys(self):
+        """Store the first key on install or update: the legacy secret as kid 'default', or a new secret"""
+        ICP = self.env['ir.config_parameter'].sudo()
+        if ICP.get_param(KEYS_PARAM):
+            return
+        
+        secret = ICP.get_param(LEGACY_SECRET_PARAM) or secrets.token_urlsafe(64)
+        ICP.set_param(KEYS_PARAM, json.dumps([self._legacy_entry(secret)]))
+        _logger.info("JWT signing keys initialized")
+    
+    @api.model
+    def _legacy_entry(self, secret):
+        return {
+            'kid': LEGACY_KID,
+            'alg': 'HS256',
+            'key': secret,
+            'created': None,
+            'retired': None,
+        }
+    
+    @api.model
+    def _load_key_entries(self):
+        """Stored key entries (read only: the keys are created by _init_keys)"""
+        ICP = self.env['ir.config_parameter'].sudo()
+        stored = ICP.get_param(KEYS_PARAM)
+        if stored:
+            return json.loads(stored)
+        
+        # Base de datos aún sin actualizar: el secreto único anterior sigue valiendo
+        secret = ICP.get_param(LEGACY_SECRET_PARAM)
+        if not secret:
+            raise UserError(_("No JWT signing key is configured, update the maki_api module"))
+        return [self._legacy_entry(secret)]
+    
+    @api.model
+    def _parse_key(self, entry):
+        """Build a JWTKey from a stored entry, or None if its algorithm is unavailable"""
+        alg = entry['alg']
+        expires = fields.Datetime.to_datetime(entry['retired']) + KEY_RETENTION if entry.get('retired') else None
+        if alg == 'HS256':
+            return JWTKey(entry['kid'], alg, entry['key'], entry['key'], None, expires)
+        
+        algorithm = get_default_algorithms().get(alg)
+        if algorithm is None:
+            _logger.warning(f"JWT key {entry['kid']} uses {alg}, which needs the cryptography package")
+            return None
+        private_key = algorithm.prepare_key(entry['key'])
+        public_key = private_key.public_key()
+        jwk = json.loads(algorithm.to_jwk(public_key))
+        jwk.update({'kid': entry['kid'], 'alg': alg, 'use': 'sig'})
+        return JWTKey(entry['kid'], alg, private_key, public_key, jwk, expires)
+    
+    @tools.ormcache()
+    def _get_keys(self):
+        """Parsed keys of this worker
+        
+        Retired keys are kept with their expiry, which is checked on each
+        use since the cache lives until the next parameter change.
+        
+        Returns:
+            tuple: (signing JWTKey, dict kid -> JWTKey of every verification key)
+        """
+        keys = {}
+        signing_key = None
+        for entry in self._load_key_entries():
+            key = self._parse_key(entry)
+            if key is None:
+                continue
+            keys[key.kid] = key
+            if not entry.get('retired'):
+                signing_key = key
+        if signing_key is None:
+            raise UserError(_("No usable JWT signing key is configured"))
+        return signing_key, keys
+    
+    @api.model
+    def get_signing_key(self):
+        return self._get_keys()[0]
+    
+    @api.model
+    def get_verification_key(self, kid=None):
+        """Key able to verify tokens signed with kid, or None if unknown or expired"""
+        key = self._get_keys()[1].get(kid or LEGACY_KID)
+        if key is not None and key.expires and key.expires <= fields.Datetime.now():
+            return None
+        return key
+    
+    @api.model
+    def get_jwks(self):
+        """JSON Web Key Set with the public keys; symmetric keys are never published"""
+        now = fields.Datetime.now()
+        return {
+            'keys': [
+                key.jwk for key in self._get_keys()[1].values()
+                if key.jwk and (not key.expires or key.expires > now)
+            ],
+        }
+    
+    @api.model
+    def _generate_key(self, alg):
+        """New private key (PEM) or secret for alg"""
+        if alg == 'HS256':
+            return secrets.token_urlsafe(64)
+        
+        try:
+            from cryptography.hazmat.primitives import serialization
+            from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+        except ImportError:
+            raise UserError(_("The cryptography package is required for %s keys", alg))
+        
+        if alg == 'RS256':
+            private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        else:
+            private_key = ed25519.Ed25519PrivateKey.generate()
+        return private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        ).decode('ascii')
+    
+    @api.model
+    def rotate_key(self, alg='HS256'):
+        """Start signing with a new key
+        
+        The current key is retired but keeps verifying the tokens it signed;
+        keys retired longer than KEY_RETENTION ago are dropped.
+        
+        Returns:
+            str: kid of the new signing key
+        """
+        if alg not in SUPPORTED_ALGORITHMS:
+            raise UserError(_("Unsupported JWT algorithm: %s", alg))
+        
+        now = fields.Datetime.now()
+        entries = []
+        for entry in self._load_key_entries():
+            if not entry.get('retired'):
+                entry['retired'] = fields.Datetime.to_string(now)
+            elif fields.Datetime.to_datetime(entry['retired']) < now - KEY_RETENTION:
+                continue
+            entries.append(entry)
+        
+        kid = uuid.uuid4().hex[:16]
+        entries.append({
+            'kid': kid,
+            'alg': alg,
+            'key': self._generate_key(alg),
+            'created': fields.Datetime.to_string(now),
+            'retired': None,
+        })
+        self.env['ir.config_parameter'].sudo().set_param(KEYS_PARAM, json.dumps(entries))
+        _logger.info(f"JWT signing key rotated to {kid} ({alg})")
+        return kid
+    
+    @api.model
+    def encode_token(self, payload):
+        """Sign a token with the current key, naming it in the kid header"""
+        key = self.get_signing_key()
+        return jwt.encode(payload, key.signing_key, algorithm=key.alg, headers={'kid': key.kid})
+    
+    @api.model
+    def decode_token(self, token):
+        """Verify a token with the key named by its kid header and return its payload
+        
+        Each key only accepts its own algorithm, so a token cannot pick the
+        algorithm it is verified with.
+        
+        Raises:
+            jwt.InvalidTokenError: Unknown key, bad signature or expired token
+        """
+        key = self.get_verification_key(jwt.get_unverified_header(token).get('kid'))
+        if key is None:
+            raise jwt.InvalidTokenError('Unknown signing key')
+        return jwt.decode(token, key.verifying_key, algorithms=[key.alg])
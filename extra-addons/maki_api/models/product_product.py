@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+from odoo import models
+
+class ProductProduct(models.Model):
+    _inherit = 'product.product'
+    
+    def unlink(self):
+        self.env['maki_api.sync_tombstone'].record_deletion(self)
+        return super().unlink()
@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api
+import odoo.sql_db
+import time
 import logging
 import json
-import redis
-from datetime import datetime, timedelta
+
+from ..tools.rate_limiter import check_rate_limit
 
 _logger = logging.getLogger(__name__)
 
@@ -37,6 +39,8 @@ class RateLimit(models.Model):
     def check_rate_limit(self, key, endpoint=None, limit=100, window=3600, user_id=None, ip_address=None):
         """Check if a request is allowed based on rate limits
         
+        Counts the request in the backend configured in maki_api.rate_limit_backend.
+        
         Args:
             key: Unique identifier for rate limiting
             endpoint: API endpoint being accessed
@@ -48,86 +52,96 @@ class RateLimit(models.Model):
         Returns:
             tuple: (allowed, current_hits, limit)
         """
-        # Try to use Redis if available for better performance
-        try:
-            return self._check_rate_limit_redis(key, endpoint, limit, window, user_id, ip_address)
-        except Exception as e:
-            _logger.warning(f"Redis rate limiting failed, falling back to database: {e}")
-            return self._check_rate_limit_db(key, endpoint, limit, window, user_id, ip_address)
-    
-    def _check_rate_limit_redis(self, key, endpoint=None, limit=100, window=3600, user_id=None, ip_address=None):
-        """Check rate limit using Redis"""
-        redis_url = self.env['ir.config_parameter'].sudo().get_param('maki_api.redis_url')
-        if not redis_url:
-            raise Exception("Redis URL not configured")
-            
-        r = redis.from_url(redis_url)
-        pipe = r.pipeline()
-        
-        # Current timestamp
-        now = datetime.now().timestamp()
-        window_start = now - window
-        
-        # Remove old entries
-        pipe.zremrangebyscore(f"ratelimit:{key}", 0, window_start)
-        
-        # Add current request
-        pipe.zadd(f"ratelimit:{key}", {now: now})
-        
-        # Count requests in window
-        pipe.zcard(f"ratelimit:{key}")
-        
-        # Set expiry on the set
-        pipe.expire(f"ratelimit:{key}", window)
-        
-        # Execute pipeline
-        _, _, hits, _ = pipe.execute()
+        allowed, hits, _reset_after = check_rate_limit(self.env, key, limit, window)
         
         # Log rate limit data if needed
         if endpoint and (hits % 10 == 0 or hits >= limit):
             self._log_rate_limit(key, endpoint, hits, limit, window, user_id, ip_address)
-            
-        return (hits <= limit, hits, limit)
+        
+        return (allowed, hits, limit)
     
-    def _check_rate_limit_db(self, key, endpoint=None, limit=100, window=3600, user_id=None, ip_address=None):
-        """Check rate limit using database"""
-        now = fields.Datetime.now()
-        window_start = now - timedelta(seconds=window)
+    def init(self):
+        # Contadores del rate limiting: UNLOGGED (sin WAL; se pierden tras
+        # una caída, lo que solo reinicia las ventanas en curso)
+        self.env.cr.execute("""
+            CREATE UNLOGGED TABLE IF NOT EXISTS maki_api_rate_limit_counter (
+                key varchar NOT NULL,
+                window_index bigint NOT NULL,
+                hits integer NOT NULL,
+                expires_at timestamp NOT NULL,
+                PRIMARY KEY (key, window_index)
+            )
+        """)
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS maki_api_rate_limit_counter_expires_at_index
+            ON maki_api_rate_limit_counter (expires_at)
+        """)
+    
+    def _check_rate_limit_db(self, key, endpoint=None, limit=100, window=3600, user_id=None, ip_address=None,
+                             count=1):
+        """Check rate limit using database
         
-        # Find existing rate limit record
-        rate_limit = self.search([('key', '=', key)], limit=1)
+        Sliding window counter (same algorithm as the memory and Redis
+        backends) kept in maki_api_rate_limit_counter. A single UPSERT counts
+        the request only if it is allowed, on its own cursor committed at
+        once: the counter row is locked for that statement only, and the
+        count is kept even if the API call rolls back.
         
-        if not rate_limit:
-            # Create new record
-            rate_limit = self.create({
-                'key': key,
-                'hits': 1,
-                'window_start': now,
-                'window_size': window,
-                'limit': limit,
-                'endpoint': endpoint,
-                'user_id': user_id,
-                'ip_address': ip_address
-            })
-            return (True, 1, limit)
+        ``count`` > 1 counts several requests at once (a lease), only if
+        they all fit in the limit.
+        """
+        now = time.time()
+        index = int(now // window)
+        weight = (window - (now - index * window)) / window
+        counter_key = f'{key}:{window}'
+        previous_hits = """(
+            SELECT COALESCE(MAX(hits), 0) * %(weight)s FROM maki_api_rate_limit_counter
+            WHERE key = %(key)s AND window_index = %(previous_index)s
+        )"""
         
-        # Check if window has expired
-        if rate_limit.window_start < window_start:
-            # Reset window
-            rate_limit.write({
-                'hits': 1,
-                'window_start': now
+        with odoo.sql_db.db_connect(self.env.cr.dbname).cursor() as cr:
+            cr.execute(f"""
+                INSERT INTO maki_api_rate_limit_counter AS counter (key, window_index, hits, expires_at)
+                SELECT %(key)s, %(index)s, %(count)s, (now() at time zone 'UTC') + %(ttl)s * interval '1 second'
+                WHERE {previous_hits} + %(count)s <= %(limit)s
+                ON CONFLICT (key, window_index) DO UPDATE SET hits = counter.hits + %(count)s
+                WHERE {previous_hits} + counter.hits + %(count)s <= %(limit)s
+                RETURNING counter.hits + {previous_hits}
+            """, {
+                'key': counter_key,
+                'index': index,
+                'previous_index': index - 1,
+                'weight': weight,
+                'limit': limit,
+                'count': count,
+                'ttl': window * 2,
             })
-            return (True, 1, limit)
+            row = cr.fetchone()
         
-        # Increment hits
-        rate_limit.hits += 1
+        hits = int(row[0]) if row else limit
         
         # Log rate limit data if needed
-        if endpoint and (rate_limit.hits % 10 == 0 or rate_limit.hits >= limit):
-            self._log_rate_limit(key, endpoint, rate_limit.hits, limit, window, user_id, ip_address)
-            
-        return (rate_limit.hits <= limit, rate_limit.hits, limit)
+        if endpoint and (hits % 10 == 0 or hits >= limit):
+            self._log_rate_limit(key, endpoint, hits, limit, window, user_id, ip_address)
+        
+        return (row is not None, hits, limit)
+    
+    def _release_rate_limit_db(self, key, window, index, count):
+        """Give back unused leased requests of a window"""
+        with odoo.sql_db.db_connect(self.env.cr.dbname).cursor() as cr:
+            cr.execute("""
+                UPDATE maki_api_rate_limit_counter SET hits = GREATEST(hits - %s, 0)
+                WHERE key = %s AND window_index = %s
+            """, (count, f'{key}:{window}', index))
+    
+    @api.model
+    def cleanup_expired_counters(self):
+        """Remove the counters of windows that no longer count for any check"""
+        self.env.cr.execute("""
+            DELETE FROM maki_api_rate_limit_counter WHERE expires_at < (now() at time zone 'UTC')
+        """)
+        _logger.info(f"Cleaned up {self.env.cr.rowcount} expired rate limit counters")
+        return True
     
     def _log_rate_limit(self, key, endpoint, hits, limit, window, user_id, ip_address):
         """Log rate limit information"""
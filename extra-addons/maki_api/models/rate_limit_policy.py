@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api, tools
+from collections import namedtuple
+import fnmatch
+import logging
+import re
+
+_logger = logging.getLogger(__name__)
+
+CompiledPolicy = namedtuple('CompiledPolicy', ['id', 'pattern', 'group_id', 'limit', 'window', 'burst'])
+
+class RateLimitPolicyMatcher:
+    """Compiled rate limit policies of a worker, in priority order
+    
+    Matching a request walks the policies once: a group comparison, then
+    a precompiled regex, so a lookup costs a few microseconds.
+    """
+    
+    def __init__(self, policies):
+        self.policies = tuple(policies)
+    
+    def match(self, path, group_ids=()):
+        """First policy whose route pattern matches path and whose group (if any) is in group_ids"""
+        for policy in self.policies:
+            if policy.group_id and policy.group_id not in group_ids:
+                continue
+            if policy.pattern.match(path):
+                return policy
+        return None
+    
+    def __len__(self):
+        return len(self.policies)
+
+class RateLimitPolicy(models.Model):
+    _name = 'maki_api.rate_limit_policy'
+    _description = 'API Rate Limit Policy'
+    _order = 'sequence, id'
+    
+    name = fields.Char(string='Name', required=True)
+    active = fields.Boolean(default=True)
+    sequence = fields.Integer(default=10,
+                              help='Policies are tried in this order; the first matching one applies')
+    route_pattern = fields.Char(string='Route Pattern', required=True, default='/api/v1/*',
+                                help='Request path pattern, with * and ? wildcards (e.g. /api/v1/sales/*)')
+    group_id = fields.Many2one('res.groups', string='Group / Tier', ondelete='cascade',
+                               help='Only applies to members of this group; empty applies to everyone')
+    limit = fields.Integer(string='Request Limit', required=True, default=100,
+                           help='Maximum number of requests allowed in the window')
+    window = fields.Integer(string='Window (seconds)', required=True, default=300,
+                            help='Duration of the rate limit window in seconds')
+    burst = fields.Integer(string='Burst (per second)', default=0,
+                           help='Maximum number of requests per second; 0 for no burst limit')
+    
+    _sql_constraints = [
+        ('limit_positive', 'CHECK("limit" > 0)', 'The request limit must be positive!'),
+        ('window_positive', 'CHECK("window" > 0)', 'The window must be positive!'),
+        ('burst_not_negative', 'CHECK(burst >= 0)', 'The burst limit cannot be negative!'),
+    ]
+    
+    @api.model
+    @tools.ormcache()
+    def _get_policy_matcher(self):
+        """Active policies compiled once per worker
+        
+        Cleared with the registry caches on every write to a policy, so
+        new limits apply to all workers without a restart.
+        """
+        policies = []
+        for policy in self.sudo().search([]):
+            policies.append(CompiledPolicy(
+                policy.id,
+                re.compile(fnmatch.translate(policy.route_pattern.strip())),
+                policy.group_id.id,
+                policy.limit,
+                policy.window,
+                policy.burst,
+            ))
+        return RateLimitPolicyMatcher(policies)
+    
+    @api.model
+    def _match_policy(self, path, group_ids=()):
+        """Policy applying to a request path and the caller's groups, or None
+        
+        Returns:
+            CompiledPolicy or None
+        """
+        return self._get_policy_matcher().match(path, group_ids)
+    
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.clear_caches()
+        return records
+    
+    def write(self, vals):
+        res = super().write(vals)
+        self.clear_caches()
+        return res
+    
+    def unlink(self):
+        res = super().unlink()
+        self.clear_caches()
+        return res
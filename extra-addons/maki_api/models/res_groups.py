@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from odoo import models
+import logging
+
+_logger = logging.getLogger(__name__)
+
+class ResGroups(models.Model):
+    _inherit = 'res.groups'
+    
+    def _get_token_profile_users(self):
+        """Users whose token profile includes these groups, directly or through implied groups"""
+        groups = self | self.search([('trans_implied_ids', 'in', self.ids)])
+        return groups.with_context(active_test=False).users
+    
+    def write(self, vals):
+        if 'users' not in vals and 'implied_ids' not in vals:
+            return super().write(vals)
+        
+        users = self._get_token_profile_users()
+        res = super().write(vals)
+        (users | self._get_token_profile_users())._invalidate_token_profile()
+        return res
+    
+    def unlink(self):
+        users = self._get_token_profile_users()
+        res = super().unlink()
+        users._invalidate_token_profile()
+        return res
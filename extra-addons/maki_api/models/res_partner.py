@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+from odoo.osv.expression import TRUE_LEAF
+from odoo.tools.safe_eval import safe_eval
+import logging
+
+_logger = logging.getLogger(__name__)
+
+class ResPartner(models.Model):
+    _inherit = 'res.partner'
+    
+    maki_customer_stats = fields.Json(string='API Customer Stats', compute='_compute_maki_customer_stats',
+                                      store=True, compute_sudo=True,
+                                      help='Lifetime order and invoice totals of this partner, per company')
+    
+    @api.depends('sale_order_ids.date_order', 'sale_order_ids.company_id',
+                 'invoice_ids.move_type', 'invoice_ids.state', 'invoice_ids.amount_total_signed',
+                 'invoice_ids.company_id')
+    def _compute_maki_customer_stats(self):
+        """Compute the lifetime totals of all partners in self, per company, with a fixed number of grouped queries
+        
+        The ORM only recomputes the partners touched by a change on their
+        orders or invoices, so the totals are maintained incrementally and
+        never counted when a customer is viewed. They are kept per company
+        (company id -> totals, revenue in that company's currency) so that
+        _get_maki_customer_totals can restrict them to the allowed companies
+        of the caller.
+        """
+        stats = {partner_id: {} for partner_id in self.ids}
+        
+        def company_stats(group):
+            return stats[group['partner_id'][0]].setdefault(str(group['company_id'][0]), {
+                'total_orders': 0,
+                'total_invoices': 0,
+                'lifetime_revenue': 0.0,
+                'last_order_date': False,
+            })
+        
+        if self.ids:
+            for group in self.env['sale.order']._read_group(
+                [('partner_id', 'in', self.ids)],
+                ['partner_id', 'company_id', 'date_order:max'],
+                ['partner_id', 'company_id'],
+                lazy=False,
+            ):
+                entry = company_stats(group)
+                entry['total_orders'] = group['__count']
+                entry['last_order_date'] = fields.Datetime.to_string(group['date_order'])
+            
+            AccountMove = self.env['account.move']
+            customer_moves = [('partner_id', 'in', self.ids), ('move_type', 'in', ['out_invoice', 'out_refund'])]
+            for group in AccountMove._read_group(
+                customer_moves, ['partner_id', 'company_id'], ['partner_id', 'company_id'], lazy=False
+            ):
+                company_stats(group)['total_invoices'] = group['__count']
+            
+            for group in AccountMove._read_group(
+                customer_moves + [('state', '=', 'posted')],
+                ['partner_id', 'company_id', 'amount_total_signed:sum'],
+                ['partner_id', 'company_id'],
+                lazy=False,
+            ):
+                company_stats(group)['lifetime_revenue'] = group['amount_total_signed'] or 0.0
+        
+        for partner in self:
+            partner.maki_customer_stats = stats.get(partner.id, {})
+    
+    @api.model
+    def _maki_stats_visible_to_user(self):
+        """Whether the user sees every order and invoice of the allowed companies
+        
+        True when the user can read sale orders and invoices, their global
+        record rules only filter by company (as the default multi-company
+        rules do) and, if group rules apply, one of them grants every
+        record (group rules are combined with OR). The stored per-company
+        totals are then exactly what the user would count.
+        """
+        Rule = self.env['ir.rule']
+        eval_context = Rule._eval_context()
+        for model_name in ('sale.order', 'account.move'):
+            if not self.env[model_name].check_access_rights('read', raise_exception=False):
+                return False
+            group_rules_leaves = []
+            for rule in Rule._get_rules(model_name).sudo():
+                domain = safe_eval(rule.domain_force, eval_context) if rule.domain_force else []
+                leaves = [tuple(leaf) for leaf in domain if isinstance(leaf, (list, tuple))]
+                if not rule['global']:
+                    group_rules_leaves.append(leaves)
+                elif any(leaf != TRUE_LEAF and leaf[0] != 'company_id' for leaf in leaves):
+                    return False
+            if group_rules_leaves and not any(
+                all(leaf == TRUE_LEAF for leaf in leaves) for leaves in group_rules_leaves
+            ):
+                return False
+        return True
+    
+    def _get_maki_customer_totals(self):
+        """Lifetime totals of the partners in self, as seen by the user of the environment
+        
+        Record rules and allowed companies of that user apply, so orders
+        and invoices the caller cannot see are never counted. Revenue is
+        the signed total of the posted customer invoices minus refunds
+        (amount_total_signed, in the currency of each invoice's company),
+        converted to the currency of the current company.
+        
+        The stored per-company totals (maki_customer_stats) of the allowed
+        companies are used when the record rules of the user only filter by
+        company; otherwise, e.g. for salesmen restricted to their own
+        documents, the totals are computed with grouped queries.
+        
+        Returns:
+            dict: partner id -> {'total_orders', 'total_invoices', 'lifetime_revenue', 'last_order_date'}
+        """
+        if not self:
+            return {}
+        if not self._maki_stats_visible_to_user():
+            return self._compute_maki_customer_totals()
+        
+        totals = {partner_id: self._maki_empty_totals() for partner_id in self.ids}
+        allowed_companies = {company.id: company for company in self.env.companies}
+        company = self.env.company
+        today = fields.Date.context_today(self)
+        for partner in self:
+            partner_totals = totals[partner.id]
+            for company_id, stats in (partner.maki_customer_stats or {}).items():
+                stats_company = allowed_companies.get(int(company_id))
+                if not stats_company:
+                    continue
+                partner_totals['total_orders'] += stats['total_orders']
+                partner_totals['total_invoices'] += stats['total_invoices']
+                partner_totals['lifetime_revenue'] += stats_company.currency_id._convert(
+                    stats['lifetime_revenue'], company.currency_id, company, today
+                )
+                last_order_date = fields.Datetime.to_datetime(stats['last_order_date'])
+                if last_order_date and (not partner_totals['last_order_date']
+                                        or last_order_date > partner_totals['last_order_date']):
+                    partner_totals['last_order_date'] = last_order_date
+        return totals
+    
+    @api.model
+    def _maki_empty_totals(self):
+        return {
+            'total_orders': 0,
+            'total_invoices': 0,
+            'lifetime_revenue': 0.0,
+            'last_order_date': False,
+        }
+    
+    def _compute_maki_customer_totals(self):
+        """Lifetime totals of the partners in self with grouped queries run as the user of the environment"""
+        totals = {partner_id: self._maki_empty_totals() for partner_id in self.ids}
+        
+        for group in self.env['sale.order']._read_group(
+            [('partner_id', 'in', self.ids)],
+            ['partner_id', 'date_order:max'],
+            ['partner_id'],
+        ):
+            partner_totals = totals[group['partner_id'][0]]
+            partner_totals['total_orders'] = group['partner_id_count']
+            partner_totals['last_order_date'] = group['date_order']
+        
+        AccountMove = self.env['account.move']
+        customer_moves = [('partner_id', 'in', self.ids), ('move_type', 'in', ['out_invoice', 'out_refund'])]
+        for group in AccountMove._read_group(customer_moves, ['partner_id'], ['partner_id']):
+            totals[group['partner_id'][0]]['total_invoices'] = group['partner_id_count']
+        
+        company = self.env.company
+        today = fields.Date.context_today(self)
+        for group in AccountMove._read_group(
+            customer_moves + [('state', '=', 'posted')],
+            ['partner_id', 'company_id', 'amount_total_signed:sum'],
+            ['partner_id', 'company_id'],
+            lazy=False,
+        ):
+            move_company = self.env['res.company'].browse(group['company_id'][0])
+            totals[group['partner_id'][0]]['lifetime_revenue'] += move_company.currency_id._convert(
+                group['amount_total_signed'] or 0.0, company.currency_id, company, today
+            )
+        return totals
+    
+    def unlink(self):
+        self.env['maki_api.sync_tombstone'].record_deletion(self)
+        return super().unlink()
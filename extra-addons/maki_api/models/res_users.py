@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api, tools
+import odoo.modules.module
+import contextvars
+import logging
+
+from ..tools.login_tracker import login_tracker
+from ..tools.revocation import get_revocation_set, notify_revocation
+
+_logger = logging.getLogger(__name__)
+
+# Activo mientras se autentica un login de /api/v1/auth/login
+_api_login = contextvars.ContextVar('maki_api_login', default=False)
+
+# Campos de res.users incluidos en el perfil de los tokens de acceso
+TOKEN_PROFILE_FIELDS = {'name', 'login', 'email', 'tz', 'lang', 'company_id', 'company_ids', 'groups_id'}
+
+class ResUsers(models.Model):
+    _inherit = 'res.users'
+    
+    tokens_valid_after = fields.Datetime(string='Tokens Valid After', readonly=True, copy=False,
+                                         help='API tokens issued before this date are rejected')
+    
+    token_profile_valid_after = fields.Datetime(string='Token Profile Valid After', readonly=True, copy=False,
+                                                help='API access tokens issued before this date carry an '
+                                                     'outdated profile and are rejected')
+    
+    def write(self, vals):
+        res = super().write(vals)
+        if 'password' in vals or vals.get('active') is False:
+            self.revoke_all_tokens()
+        elif 'active' in vals:
+            self._notify_token_epoch()
+        if TOKEN_PROFILE_FIELDS.intersection(vals) or any(
+            name.startswith(('in_group_', 'sel_groups_')) for name in vals
+        ):
+            self._invalidate_token_profile()
+        return res
+    
+    @classmethod
+    def _login(cls, db, login, password, user_agent_env):
+        # Odoo autentica con su propio entorno: el contexto no llega a
+        # _update_last_login, así que el login de la API se marca aquí
+        if not (user_agent_env or {}).get('maki_api_login'):
+            return super()._login(db, login, password, user_agent_env=user_agent_env)
+        token = _api_login.set(True)
+        try:
+            return super()._login(db, login, password, user_agent_env=user_agent_env)
+        finally:
+            _api_login.reset(token)
+    
+    def _update_last_login(self):
+        """Buffer API logins instead of inserting the res.users.log row now
+        
+        Only logins of /api/v1/auth/login (or with maki_api_login in the
+        context) are buffered: the login tracker writes them in batches
+        from a background thread, so authentication does not wait on it,
+        at the cost of losing the pending ones if the worker dies. Every
+        other login, and all of them in tests (their transaction never
+        commits), keeps Odoo's synchronous insert.
+        """
+        if odoo.modules.module.current_test or not (self.env.context.get('maki_api_login') or _api_login.get()):
+            return super()._update_last_login()
+        for user in self:
+            login_tracker.track(self.env.cr.dbname, user.id)
+    
+    def _invalidate_token_profile(self):
+        """Reject the access tokens of these users so they are reissued with their current profile
+        
+        Refresh tokens stay valid: the client refreshes and gets an access
+        token with the new groups, companies, language or time zone.
+        """
+        if not self:
+            return
+        self.env.cr.execute(
+            "UPDATE res_users SET token_profile_valid_after = %s WHERE id IN %s",
+            (fields.Datetime.now(), tuple(self.ids))
+        )
+        self.invalidate_recordset(['token_profile_valid_after'])
+        self._notify_token_epoch()
+    
+    def _get_token_profile(self):
+        """Compact profile embedded in the access tokens of this user
+        
+        Serves /auth/me and the permission checks of API requests without
+        reading the user or its groups.
+        """
+        self.ensure_one()
+        return {
+            'name': self.name,
+            'login': self.login,
+            'email': self.email or None,
+            'cid': self.company_id.id,
+            'cids': self.company_ids.ids,
+            'gids': self.groups_id.ids,
+            'adm': self.has_group('base.group_system'),
+            'tz': self.tz or 'UTC',
+            'lang': self.lang or 'en_US',
+            'll': self.login_date.isoformat() if self.login_date else None,
+        }
+    
+    @api.model
+    @tools.ormcache()
+    def _get_token_profile_catalog(self):
+        """Names of groups and companies referenced by token profiles
+        
+        Shared by all users and cleared with the registry caches, which
+        Odoo does on every write to groups and companies.
+        
+        Returns:
+            tuple: (dict group id -> (name, category name), dict company id -> name)
+        """
+        groups = {
+            group.id: (group.name, group.category_id.name or None)
+            for group in self.env['res.groups'].sudo().search([])
+        }
+        companies = {
+            company['id']: company['name']
+            for company in self.env['res.company'].sudo().search_read([], ['name'])
+        }
+        return groups, companies
+    
+    def revoke_all_tokens(self):
+        """Reject every API token issued so far to these users
+        
+        Moves the per-user epoch forward instead of blacklisting each token,
+        and notifies all workers so their cached epochs are replaced.
+        """
+        if not self:
+            return True
+        self.env.cr.execute(
+            "UPDATE res_users SET tokens_valid_after = %s WHERE id IN %s",
+            (fields.Datetime.now(), tuple(self.ids))
+        )
+        self.invalidate_recordset(['tokens_valid_after'])
+        self._notify_token_epoch()
+        _logger.info(f"Revoked all API tokens of users {self.ids}")
+        return True
+    
+    def _notify_token_epoch(self):
+        """Send the current token epochs of these users to all workers"""
+        if not self:
+            return
+        self.env.cr.execute("""
+            SELECT id, active, EXTRACT(EPOCH FROM tokens_valid_after),
+                   EXTRACT(EPOCH FROM token_profile_valid_after)
+            FROM res_users WHERE id IN %s
+        """, (tuple(self.ids),))
+        for user_id, active, epoch, profile_epoch in self.env.cr.fetchall():
+            notify_revocation(self.env.cr, {
+                'type': 'epoch',
+                'uid': user_id,
+                'active': active,
+                'epoch': float(epoch) if epoch is not None else None,
+                'profile': float(profile_epoch) if profile_epoch is not None else None,
+            })
+    
+    @api.model
+    def _get_token_epoch(self, user_id):
+        """Return (active, tokens_valid_after, token_profile_valid_after) of a user, or None if it does not exist
+        
+        Both dates are returned as timestamps.
+        
+        Served from this worker's memory while the revocation listener is
+        up; otherwise, and in tests, read from the database.
+        """
+        revocation_set = None
+        if not odoo.modules.module.current_test:
+            revocation_set = get_revocation_set(self.env.cr.dbname)
+            if revocation_set.ready:
+                epoch = revocation_set.get_epoch(user_id)
+                if epoch is not None:
+                    return epoch
+            else:
+                revocation_set = None
+        
+        version = revocation_set.epochs_version if revocation_set else None
+        self.env.cr.execute("""
+            SELECT active, EXTRACT(EPOCH FROM tokens_valid_after),
+                   EXTRACT(EPOCH FROM token_profile_valid_after)
+            FROM res_users WHERE id = %s
+        """, (user_id,))
+        row = self.env.cr.fetchone()
+        if not row:
+            return None
+        
+        epoch = (row[0],) + tuple(float(value) if value is not None else None for value in row[1:])
+        if revocation_set:
+            revocation_set.set_epoch(user_id, *epoch, version=version)
+        return epoch
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+from odoo import models
+
+class SaleOrder(models.Model):
+    _inherit = 'sale.order'
+    
+    def unlink(self):
+        self.env['maki_api.sync_tombstone'].record_deletion(self)
+        return super().unlink()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+import json
+import logging
+from datetime import timedelta
+
+_logger = logging.getLogger(__name__)
+
+class SyncTombstone(models.Model):
+    _name = 'maki_api.sync_tombstone'
+    _description = 'Sync Deletion Tombstone'
+    _order = 'id'
+    
+    res_model = fields.Char(string='Model', required=True, index=True,
+                            help='Technical name of the model of the deleted record')
+    res_id = fields.Integer(string='Record ID', required=True,
+                            help='ID of the deleted record')
+    deleted_at = fields.Datetime(string='Deletion Date', required=True, index=True,
+                                 default=fields.Datetime.now,
+                                 help='When the record was deleted')
+    
+    @api.model
+    def record_deletion(self, records):
+        """Record a tombstone for each record about to be deleted"""
+        if not records:
+            return self.browse()
+        return self.sudo().create([{
+            'res_model': records._name,
+            'res_id': record_id,
+        } for record_id in records.ids])
+    
+    @api.model
+    def get_retention_days(self):
+        """Number of days tombstones are kept; older sync cursors need a full resync"""
+        return int(self.env['ir.config_parameter'].sudo().get_param('maki_api.sync_tombstone_days', 30))
+    
+    @api.model
+    def get_purged_id(self, res_model):
+        """Highest tombstone id of res_model removed by the cleanup (0 if none)
+        
+        A sync cursor whose last tombstone is below it may have missed
+        deletions, so the client needs a full resync.
+        """
+        purged = self.env['ir.config_parameter'].sudo().get_param('maki_api.sync_tombstone_purged', '{}')
+        return int(json.loads(purged).get(res_model, 0))
+    
+    @api.model
+    def cleanup_old_tombstones(self, days=None):
+        """Remove tombstones older than the retention period
+        
+        The highest removed id of each model is kept as its purge
+        watermark (see get_purged_id).
+        """
+        days = days or self.get_retention_days()
+        cutoff_date = fields.Datetime.now() - timedelta(days=days)
+        self.env.cr.execute("""
+            SELECT res_model, MAX(id) FROM maki_api_sync_tombstone
+            WHERE deleted_at < %s
+            GROUP BY res_model
+        """, (cutoff_date,))
+        removed = dict(self.env.cr.fetchall())
+        if removed:
+            ICP = self.env['ir.config_parameter'].sudo()
+            purged = json.loads(ICP.get_param('maki_api.sync_tombstone_purged', '{}'))
+            for res_model, max_id in removed.items():
+                purged[res_model] = max(purged.get(res_model, 0), max_id)
+            ICP.set_param('maki_api.sync_tombstone_purged', json.dumps(purged))
+        self.env.cr.execute("DELETE FROM maki_api_sync_tombstone WHERE deleted_at < %s", (cutoff_date,))
+        _logger.info(f"Cleaned up {self.env.cr.rowcount} sync tombstones older than {days} days")
+        return True
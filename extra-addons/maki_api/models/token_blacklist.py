@@ -1,10 +1,17 @@
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api
+import odoo.modules.module
+import time
 import datetime
 import logging
 
+from ..tools.revocation import get_revocation_set, notify_revocation
+
 _logger = logging.getLogger(__name__)
 
+# Resultado de la última limpieza ejecutada en este proceso
+LAST_CLEANUP = {}
+
 class TokenBlacklist(models.Model):
     _name = 'maki_api.token_blacklist'
     _description = 'JWT Token Blacklist'
@@ -30,6 +37,7 @@ class TokenBlacklist(models.Model):
         ('password_change', 'Password Changed'),
         ('security', 'Security Concern'),
         ('admin', 'Administrator Action'),
+        ('rotated', 'Refresh Token Rotated'),
         ('other', 'Other Reason')
     ], string='Revocation Reason', required=True, default='logout')
     notes = fields.Text(string='Notes')
@@ -43,6 +51,21 @@ class TokenBlacklist(models.Model):
         """Check if a token is blacklisted"""
         return bool(self.search_count([('jti', '=', jti)]))
     
+    @api.model
+    def is_blacklisted(self, jti):
+        """Check if a token is blacklisted, without a query when possible
+        
+        Uses this worker's in-memory revocation set, kept in sync through
+        LISTEN/NOTIFY. Falls back to the database while the set is not
+        known to be complete, and in tests, where revocations are never
+        committed and thus never notified.
+        """
+        if not odoo.modules.module.current_test:
+            revocation_set = get_revocation_set(self.env.cr.dbname)
+            if revocation_set.ready:
+                return revocation_set.is_revoked(jti)
+        return self.is_token_blacklisted(jti)
+    
     @api.model
     def add_token_to_blacklist(self, jti, user_id, token_type, expires_at, reason='logout', revoked_by_id=None, notes=None):
         """Add a token to the blacklist"""
@@ -60,17 +83,79 @@ class TokenBlacklist(models.Model):
                 'revoked_by_id': revoked_by_id or user_id,
                 'notes': notes,
             }
-            return self.create(values)
+            token = self.create(values)
+            notify_revocation(self.env.cr, {
+                'jti': jti,
+                'exp': expires_at.timestamp() if isinstance(expires_at, datetime.datetime) else None,
+            })
+            return token
         except Exception as e:
             _logger.error(f"Failed to blacklist token: {e}")
             return False
     
     @api.model
-    def cleanup_expired_tokens(self):
-        """Remove expired tokens from the blacklist"""
-        expired_tokens = self.search([('expires_at', '<', fields.Datetime.now())])
-        if expired_tokens:
-            count = len(expired_tokens)
-            expired_tokens.unlink()
-            _logger.info(f"Cleaned up {count} expired tokens from blacklist")
-        return True
\ No newline at end of file
+    def cleanup_expired_tokens(self, batch_size=5000, time_limit=60, autocommit=False):
+        """Remove expired tokens from the blacklist in chunks
+        
+        Run by a cron, never by user requests. Each chunk is a single DELETE
+        of at most batch_size rows that skips rows locked by concurrent
+        transactions; with autocommit each chunk is committed on its own so
+        locks are held briefly. Stops after time_limit seconds and resumes
+        on the next run.
+        
+        Returns:
+            dict: Deleted rows, chunks, duration and whether expired rows remain
+        """
+        start = time.monotonic()
+        now = fields.Datetime.now()
+        deleted = 0
+        batches = 0
+        more = True
+        
+        while more and time.monotonic() - start < time_limit:
+            self.env.cr.execute("""
+                DELETE FROM maki_api_token_blacklist
+                WHERE id IN (
+                    SELECT id FROM maki_api_token_blacklist
+                    WHERE expires_at < %s
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+            """, (now, batch_size))
+            count = self.env.cr.rowcount
+            deleted += count
+            batches += 1
+            more = count == batch_size
+            if autocommit:
+                self.env.cr.commit()
+        
+        self.invalidate_model()
+        stats = {
+            'deleted': deleted,
+            'batches': batches,
+            'duration': time.monotonic() - start,
+            'finished': not more,
+            'at': now.isoformat(),
+        }
+        LAST_CLEANUP.update(stats)
+        _logger.info(
+            f"Cleaned up {deleted} expired tokens from blacklist in {batches} chunks "
+            f"({stats['duration']:.2f}s{'' if not more else ', more pending'})"
+        )
+        return stats
+    
+    @api.model
+    def get_blacklist_metrics(self):
+        """Size of the blacklist table and result of the last cleanup run in this process"""
+        self.env.cr.execute("""
+            SELECT pg_total_relation_size('maki_api_token_blacklist'),
+                   (SELECT COUNT(*) FROM maki_api_token_blacklist),
+                   (SELECT COUNT(*) FROM maki_api_token_blacklist WHERE expires_at < %s)
+        """, (fields.Datetime.now(),))
+        size, rows, expired = self.env.cr.fetchone()
+        return {
+            'table_bytes': size,
+            'rows': rows,
+            'expired_rows': expired,
+            'last_cleanup': dict(LAST_CLEANUP),
+        }
@@ -1,3 +1,16 @@
 from . import test_auth
 from . import test_rate_limit
-from . import test_token_blacklist
\ No newline at end of file
+from . import test_token_blacklist
+from . import test_customer_stats
+from . import test_token_cache
+from . import test_revocation
+from . import test_jwt_keys
+from . import test_auth_jwt
+from . import test_login_tracker
+from . import test_api_log
+from . import test_metrics
+from . import test_query_tracker
+from . import test_sync
+from . import test_batch
+from . import test_sale_order_lines
+from . import test_images
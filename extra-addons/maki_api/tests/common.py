@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+import json
+import time
+import uuid
+
+class QueryBudgetMixin:
+    """SQL query budgets of API endpoints, for HttpCase tests
+    
+    Calls the endpoint with the X-Maki-Debug-Queries header and checks the
+    query count it reports (see tools/query_tracker.py)::
+    
+        self.assertQueryBudget('GET', '/api/v1/sync/products', 20, params={'limit': 80})
+    """
+    
+    def call_json_endpoint(self, method, path, params=None, headers=None):
+        return self.opener.request(
+            method,
+            self.base_url() + path,
+            data=json.dumps({'jsonrpc': '2.0', 'method': 'call', 'params': params or {}}),
+            headers=dict({'Content-Type': 'application/json', 'X-Maki-Debug-Queries': '1'}, **(headers or {})),
+            timeout=12,
+        )
+    
+    def assertQueryBudget(self, method, path, max_queries, params=None, headers=None, allow_n_plus_one=False):
+        """Assert a JSON endpoint runs at most max_queries SQL statements and no repeated query
+        
+        Returns:
+            tuple: (response, dict of the X-Maki-Queries values)
+        """
+        response = self.call_json_endpoint(method, path, params, headers)
+        self.assertIn('X-Maki-Queries', response.headers, f"{path} did not report its queries")
+        stats = dict(item.split('=') for item in response.headers['X-Maki-Queries'].split('; '))
+        
+        self.assertLessEqual(
+            int(stats['count']), max_queries,
+            f"{method} {path} ran {stats['count']} queries, over its budget of {max_queries}"
+        )
+        if not allow_n_plus_one:
+            self.assertEqual(
+                stats['n_plus_one'], '0',
+                f"{method} {path} repeated a query {stats['max_repeat']} times (likely N+1)"
+            )
+        return response, stats
+
+class JWTClientMixin:
+    """Calls to the JSON endpoints of the API as a user with a JWT access token, for HttpCase tests
+    
+    ::
+    
+        self.api_user = self.create_api_user('apiuser', ['sales_team.group_sale_manager'])
+        data = self.call_api('/api/v1/sales/orders/batch', {'ids': [1, 2]})
+    """
+    
+    def create_api_user(self, login, groups=('base.group_user',)):
+        user = self.env['res.users'].create({
+            'name': login,
+            'login': login,
+            'groups_id': [(6, 0, [self.env.ref(group).id for group in groups])],
+        })
+        self.api_token = self.env['maki_api.jwt_keys'].encode_token({
+            'sub': str(user.id),
+            'iat': int(time.time()),
+            'exp': int(time.time()) + 3600,
+            'type': 'access',
+            'jti': str(uuid.uuid4()),
+        })
+        return user
+    
+    def call_api(self, path, params=None, method='POST'):
+        """Result of a JSON endpoint (the {'success', 'data' / 'error'} envelope)"""
+        response = self.opener.request(
+            method,
+            self.base_url() + path,
+            data=json.dumps({'jsonrpc': '2.0', 'method': 'call', 'params': params or {}}),
+            headers={'Content-Type': 'application/json', 'Authorization': f'Bearer {self.api_token}'},
+            timeout=12,
+        )
+        self.assertEqual(response.status_code, 200, response.text)
+        return response.json()['result']
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+
+import os
+import gzip
+import json
+from datetime import datetime, timedelta
+
+from odoo import fields
+from odoo.tools import config
+from odoo.tests.common import TransactionCase, tagged
+
+from odoo.addons.maki_api.models.api_log import histogram_percentile
+from odoo.addons.maki_api.tools.log_sanitizer import PayloadRedactor
+from odoo.addons.maki_api.tools.log_writer import APILogWriter
+
+class _RecordingWriter(APILogWriter):
+    """Log writer that keeps the batches instead of writing them"""
+    
+    def __init__(self, *args, fail=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fail = fail
+        self.written_batches = []
+    
+    def _ensure_started(self):
+        pass
+    
+    def _write(self, dbname, entries):
+        # fail: True, or the names of the databases that are down
+        if self.fail is True or (self.fail and dbname in self.fail):
+            raise ConnectionError('database is down')
+        self.written_batches.append((dbname, list(entries)))
+
+@tagged('post_install', '-at_install')
+class TestAPILogWriter(TransactionCase):
+    
+    def test_entries_are_written_in_batches(self):
+        """Test queued entries are written batch_size rows at a time"""
+        writer = _RecordingWriter(batch_size=100)
+        for i in range(250):
+            writer.enqueue('test_db', {'endpoint': f'/api/v1/test/{i}'})
+        writer.flush()
+        
+        self.assertEqual([len(entries) for _db, entries in writer.written_batches], [100, 100, 50])
+        self.assertEqual(writer.get_metrics()['written'], 250)
+        self.assertEqual(len(writer), 0)
+    
+    def test_overflow_policies(self):
+        """Test a full queue drops the oldest or the newest entries, and counts them"""
+        writer = _RecordingWriter(max_size=10, batch_size=100, overflow='drop_oldest')
+        for i in range(15):
+            writer.enqueue('test_db', {'endpoint': i})
+        writer.flush()
+        self.assertEqual([entry['endpoint'] for entry in writer.written_batches[0][1]], list(range(5, 15)))
+        self.assertEqual(writer.get_metrics()['dropped'], 5)
+        
+        writer = _RecordingWriter(max_size=10, batch_size=100, overflow='drop_newest')
+        results = [writer.enqueue('test_db', {'endpoint': i}) for i in range(15)]
+        writer.flush()
+        self.assertEqual(results, [True] * 10 + [False] * 5)
+        self.assertEqual([entry['endpoint'] for entry in writer.written_batches[0][1]], list(range(10)))
+    
+    def test_failed_batch_is_kept(self):
+        """Test entries of a failed batch go back to the queue for the next flush"""
+        writer = _RecordingWriter(batch_size=100, fail=True)
+        for i in range(5):
+            writer.enqueue('test_db', {'endpoint': i})
+        writer.flush()
+        self.assertEqual(len(writer), 5)
+        self.assertEqual(writer.get_metrics()['failed_batches'], 1)
+        
+        writer.fail = False
+        writer.flush()
+        self.assertEqual([entry['endpoint'] for entry in writer.written_batches[0][1]], list(range(5)))
+    
+    def test_failed_database_does_not_lose_others(self):
+        """Test a failing database keeps its entries and the other databases of the batch are written"""
+        writer = _RecordingWriter(batch_size=100, fail={'down_db'})
+        for i in range(6):
+            writer.enqueue('down_db' if i % 2 else 'up_db', {'endpoint': i})
+        writer.flush()
+        
+        self.assertEqual(writer.written_batches, [('up_db', [{'endpoint': 0}, {'endpoint': 2}, {'endpoint': 4}])])
+        self.assertEqual(len(writer), 3)
+        self.assertEqual(writer.get_metrics()['dropped'], 0)
+    
+    def test_failing_batch_is_dropped_after_max_attempts(self):
+        """Test entries that keep failing are dropped and counted, unblocking the queue"""
+        writer = _RecordingWriter(batch_size=100, max_attempts=3, fail={'bad_db'})
+        writer.enqueue('bad_db', {'endpoint': 'bad'})
+        for _attempt in range(3):
+            writer.flush()
+        self.assertEqual(len(writer), 0)
+        self.assertEqual(writer.get_metrics()['dropped'], 1)
+        self.assertEqual(writer.get_metrics()['failed_batches'], 3)
+        
+        writer.enqueue('good_db', {'endpoint': 'good'})
+        writer.flush()
+        self.assertEqual(writer.written_batches, [('good_db', [{'endpoint': 'good'}])])
+    
+    def test_log_api_call_is_sanitized(self):
+        """Test API calls are written (synchronously while testing) without sensitive data"""
+        self.env['maki_api.log'].log_api_call(
+            endpoint='/api/v1/test/log-writer',
+            method='POST',
+            status_code=200,
+            execution_time=12.5,
+            user_id=self.env.uid,
+            request_data={'login': 'admin', 'password': 'secret', 'nested': {'api_key': 'abc'}},
+        )
+        
+        log = self.env['maki_api.log'].search([('endpoint', '=', '/api/v1/test/log-writer')])
+        self.assertEqual(len(log), 1)
+        self.assertEqual(log.execution_time, 12.5)
+        self.assertNotIn('secret', log.request_data)
+        self.assertNotIn('abc', log.request_data)
+        self.assertIn('admin', log.request_data)
+
+@tagged('post_install', '-at_install')
+class TestAPILogRetention(TransactionCase):
+    
+    def setUp(self):
+        super(TestAPILogRetention, self).setUp()
+        self.Log = self.env['maki_api.log']
+    
+    def _log_at(self, create_date, endpoint):
+        self.Log._write_log_batch([{
+            'endpoint': endpoint,
+            'method': 'GET',
+            'status_code': 200,
+            'execution_time': 1.0,
+            'user_id': self.env.uid,
+            'ip_address': '127.0.0.1',
+            'user_agent': None,
+            'request_data': None,
+            'response_data': None,
+            'error': None,
+            'cache_hit': False,
+            'create_date': create_date,
+        }])
+    
+    def _count(self, table, endpoint):
+        self.env.cr.execute(f"SELECT COUNT(*) FROM ONLY {table} WHERE endpoint = %s", (endpoint,))
+        return self.env.cr.fetchone()[0]
+    
+    def test_logs_are_written_to_their_monthly_partition(self):
+        """Test the upcoming partitions exist and logs are written to the partition of their month"""
+        now = datetime.utcnow()
+        names = [name for name, _start, _end in self.Log._get_log_partitions()]
+        self.assertIn(f"maki_api_log_p{now.strftime('%Y%m')}", names)
+        
+        self._log_at(now, '/api/v1/test/partitioned')
+        
+        self.assertEqual(self._count(f"maki_api_log_p{now.strftime('%Y%m')}", '/api/v1/test/partitioned'), 1)
+        self.assertEqual(self._count('maki_api_log', '/api/v1/test/partitioned'), 0)
+        self.assertEqual(self.Log.search_count([('endpoint', '=', '/api/v1/test/partitioned')]), 1)
+    
+    def test_expired_partitions_are_archived_and_dropped(self):
+        """Test retention drops whole expired partitions, archiving them first"""
+        self.Log._create_log_partition(datetime(2020, 1, 1))
+        self._log_at(datetime(2020, 1, 15), '/api/v1/test/expired')
+        self._log_at(datetime.utcnow(), '/api/v1/test/current')
+        self.assertEqual(self._count('maki_api_log_p202001', '/api/v1/test/expired'), 1)
+        
+        self.Log.cleanup_old_logs(days=30, archive=True)
+        
+        path = os.path.join(config.filestore(self.env.cr.dbname), 'maki_api_log_archive', 'maki_api_log_p202001.jsonl.gz')
+        self.addCleanup(os.remove, path)
+        with gzip.open(path, 'rt') as archive:
+            rows = [json.loads(line) for line in archive]
+        self.assertEqual([row['endpoint'] for row in rows], ['/api/v1/test/expired'])
+        
+        self.env.cr.execute("SELECT to_regclass('maki_api_log_p202001')")
+        self.assertIsNone(self.env.cr.fetchone()[0])
+        self.assertEqual(self.Log.search_count([('endpoint', '=', '/api/v1/test/current')]), 1)
+    
+    def test_parent_logs_are_moved_into_partitions(self):
+        """Test the migration moves the logs of the parent table into the partition of their month"""
+        self._log_at(datetime(2020, 2, 10), '/api/v1/test/unpartitioned')
+        self.assertEqual(self._count('maki_api_log', '/api/v1/test/unpartitioned'), 1)
+        
+        self.Log._create_log_partition(datetime(2020, 2, 1))
+        self.Log._move_logs_into_partitions()
+        
+        self.assertEqual(self._count('maki_api_log', '/api/v1/test/unpartitioned'), 0)
+        self.assertEqual(self._count('maki_api_log_p202002', '/api/v1/test/unpartitioned'), 1)
+        self.assertEqual(self.Log.search_count([('endpoint', '=', '/api/v1/test/unpartitioned')]), 1)
+    
+    def test_expired_logs_are_archived_and_deleted_in_chunks(self):
+        """Test retention deletes the expired logs of the parent table chunk by chunk, archiving them first"""
+        for day in range(1, 6):
+            self._log_at(datetime(2020, 1, day), '/api/v1/test/expired')
+        self._log_at(datetime.utcnow(), '/api/v1/test/current')
+        
+        self.Log.cleanup_old_logs(days=30, archive=True, chunk_size=2)
+        
+        path = self.Log._get_log_archive_path(fields.Datetime.now() - timedelta(days=30))
+        self.addCleanup(os.remove, path)
+        with gzip.open(path, 'rt') as archive:
+            rows = [json.loads(line) for line in archive]
+        self.assertEqual([row['endpoint'] for row in rows], ['/api/v1/test/expired'] * 5)
+        
+        self.assertEqual(self.Log.search_count([('endpoint', '=', '/api/v1/test/expired')]), 0)
+        self.assertEqual(self.Log.search_count([('endpoint', '=', '/api/v1/test/current')]), 1)
+    
+    def test_rollups_and_percentiles(self):
+        """Test writes maintain per-minute rollups and metrics report percentiles from them"""
+        minute = datetime.utcnow().replace(second=0, microsecond=0)
+        entries = []
+        for execution_time in range(1, 101):
+            entries.append({
+                'endpoint': '/api/v1/test/rollup',
+                'method': 'GET',
+                'status_code': 500 if execution_time > 90 else 200,
+                'execution_time': float(execution_time),
+                'user_id': self.env.uid,
+                'ip_address': None,
+                'user_agent': None,
+                'request_data': None,
+                'response_data': None,
+                'error': None,
+                'cache_hit': execution_time <= 20,
+                'create_date': minute,
+            })
+        # Dos lotes: el segundo se suma al mismo rollup
+        self.Log._write_log_batch(entries[:40])
+        self.Log._write_log_batch(entries[40:])
+        
+        self.env.cr.execute("""
+            SELECT calls, errors, cache_hits FROM maki_api_log_rollup
+            WHERE minute = %s AND endpoint = '/api/v1/test/rollup'
+        """, (minute,))
+        self.assertEqual(self.env.cr.fetchall(), [(100, 10, 20)])
+        
+        stat = self.Log._get_rollup_stats(minute)['/api/v1/test/rollup']
+        self.assertEqual(histogram_percentile(stat['buckets'], 0.50), 50)
+        self.assertEqual(histogram_percentile(stat['buckets'], 0.95), 95)
+        self.assertEqual(histogram_percentile(stat['buckets'], 0.99), 99)
+        
+        metrics = self.Log.get_performance_metrics(days=1)
+        self.assertIn('p95', metrics['latency'])
+        self.assertGreaterEqual(metrics['cache_metrics']['total_calls'], 100)
+
+@tagged('post_install', '-at_install')
+class TestPayloadLogging(TransactionCase):
+    
+    def test_redaction_does_not_modify_payload(self):
+        """Test sensitive keys are redacted at any depth in a copy, leaving the payload intact"""
+        payload = {
+            'login': 'admin',
+            'password': 'secret',
+            'lines': [{'product': 'Maki', 'Auth_Header': 'Bearer abc'}],
+        }
+        redacted = json.loads(PayloadRedactor().redact(payload))
+        
+        self.assertEqual(redacted['password'], '***REDACTED***')
+        self.assertEqual(redacted['lines'][0], {'product': 'Maki', 'Auth_Header': '***REDACTED***'})
+        self.assertEqual(payload['password'], 'secret')
+    
+    def test_large_payloads_are_truncated(self):
+        """Test large payloads are cut to about max_size and remain valid JSON"""
+        redactor = PayloadRedactor(max_size=1000, max_string=100)
+        payload = {'records': [{'id': i, 'name': 'x' * 500} for i in range(1000)]}
+        
+        result = redactor.redact(payload)
+        self.assertLess(len(result), 1500)
+        records = json.loads(result)['records']
+        self.assertEqual(len(records[0]['name']), 103)
+        self.assertTrue(records[-1].endswith('more items'))
+        
+        self.assertEqual(json.loads(redactor.redact('x' * 100000))['__truncated__'], True)
+    
+    def test_payload_sampling(self):
+        """Test payload capture follows the first rule with a rate for the route and status class"""
+        Log = self.env['maki_api.log']
+        self.assertFalse(Log._should_capture_payload('/api/v1/sales/orders', 200))
+        self.assertTrue(Log._should_capture_payload('/api/v1/sales/orders', 500))
+        
+        self.env['ir.config_parameter'].sudo().set_param('maki_api.log_payload_sampling', json.dumps({
+            '/api/v1/auth/*': {'2xx': 0, '4xx': 0},
+            '/api/v1/sales/*': {'2xx': 1},
+            '*': {'4xx': 1, '5xx': 1},
+        }))
+        self.assertTrue(Log._should_capture_payload('/api/v1/sales/orders', 200))
+        self.assertFalse(Log._should_capture_payload('/api/v1/auth/login', 401))
+        self.assertTrue(Log._should_capture_payload('/api/v1/auth/login', 500))
+        self.assertFalse(Log._should_capture_payload('/api/v1/finance/invoices', 200))
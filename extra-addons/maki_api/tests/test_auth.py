@@ -50,8 +50,7 @@ class TestAuth(TransactionCase):
         self.assertTrue(access_token)
         
         # Decode and verify token
-        secret_key = config.get('jwt_secret_key', 'your-secret-key')
-        payload = jwt.decode(access_token, secret_key, algorithms=['HS256'])
+        payload = self.env['maki_api.jwt_keys'].decode_token(access_token)
         
         self.assertEqual(payload['sub'], str(self.test_user.id))
         self.assertEqual(payload['type'], 'access')
@@ -64,8 +63,7 @@ class TestAuth(TransactionCase):
         self.assertTrue(refresh_token)
         
         # Decode and verify refresh token
-        refresh_secret_key = config.get('jwt_refresh_secret_key', 'your-refresh-secret-key')
-        refresh_payload = jwt.decode(refresh_token, refresh_secret_key, algorithms=['HS256'])
+        refresh_payload = self.env['maki_api.jwt_keys'].decode_token(refresh_token)
         
         self.assertEqual(refresh_payload['sub'], str(self.test_user.id))
         self.assertEqual(refresh_payload['type'], 'refresh')
@@ -73,7 +71,7 @@ class TestAuth(TransactionCase):
         self.assertTrue('exp' in refresh_payload)
         self.assertTrue('iat' in refresh_payload)
     
-    @patch('odoo.http.request.session.authenticate')
+    @patch('odoo.addons.base.models.res_users.Users.authenticate')
     def test_login_success(self, mock_authenticate):
         """Test successful login"""
         # Setup mock
@@ -99,7 +97,7 @@ class TestAuth(TransactionCase):
         self.assertTrue('user' in response_data)
         self.assertEqual(response_data['user']['id'], self.test_user.id)
     
-    @patch('odoo.http.request.session.authenticate')
+    @patch('odoo.addons.base.models.res_users.Users.authenticate')
     def test_login_invalid_credentials(self, mock_authenticate):
         """Test login with invalid credentials"""
         # Setup mock
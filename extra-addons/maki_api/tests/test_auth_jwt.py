@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+import json
+import time
+import uuid
+
+from odoo.tests.common import HttpCase, tagged
+
+@tagged('post_install', '-at_install')
+class TestAuthJWT(HttpCase):
+    
+    def setUp(self):
+        super(TestAuthJWT, self).setUp()
+        self.test_user = self.env['res.users'].create({
+            'name': 'JWT User',
+            'login': 'jwtuser',
+            'groups_id': [(6, 0, [self.env.ref('base.group_user').id])],
+        })
+    
+    def _make_token(self, **claims):
+        payload = {
+            'sub': str(self.test_user.id),
+            'iat': int(time.time()),
+            'exp': int(time.time()) + 3600,
+            'type': 'access',
+            'jti': str(uuid.uuid4()),
+        }
+        payload.update(claims)
+        return self.env['maki_api.jwt_keys'].encode_token(payload)
+    
+    def _sync_products(self, headers=None):
+        return self.url_open(
+            '/api/v1/sync/products',
+            data=json.dumps({'jsonrpc': '2.0', 'method': 'call', 'params': {'limit': 1}}),
+            headers=dict({'Content-Type': 'application/json'}, **(headers or {})),
+        )
+    
+    def test_missing_token(self):
+        """Test a request without token is rejected with a 401 and no session"""
+        response = self._sync_products()
+        
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('Bearer', response.headers.get('WWW-Authenticate', ''))
+        self.assertFalse(response.json()['result']['success'])
+        self.assertNotIn('Set-Cookie', response.headers)
+    
+    def test_expired_token(self):
+        """Test an expired token is rejected"""
+        token = self._make_token(exp=int(time.time()) - 10)
+        response = self._sync_products({'Authorization': f'Bearer {token}'})
+        
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['result']['error']['message'], 'Token has expired')
+    
+    def test_valid_token(self):
+        """Test a valid token authenticates the request without creating a session"""
+        token = self._make_token()
+        response = self._sync_products({'Authorization': f'Bearer {token}'})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('result', response.json())
+        self.assertNotIn('Set-Cookie', response.headers)
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests.common import HttpCase, tagged
+
+from .common import JWTClientMixin
+
+@tagged('post_install', '-at_install')
+class TestBatchEndpoints(JWTClientMixin, HttpCase):
+    
+    def setUp(self):
+        super(TestBatchEndpoints, self).setUp()
+        self.create_api_user('batchuser', ['sales_team.group_sale_manager', 'account.group_account_invoice'])
+        self.customers = self.env['res.partner'].create([
+            {'name': 'Batch Customer A'},
+            {'name': 'Batch Customer B'},
+        ])
+        product = self.env['product.product'].create({'name': 'Batch Product', 'list_price': 10.0})
+        self.orders = self.env['sale.order'].create([{
+            'partner_id': customer.id,
+            'order_line': [(0, 0, {'product_id': product.id, 'product_uom_qty': 1})],
+        } for customer in self.customers])
+        self.invoices = self.env['account.move'].create([{
+            'move_type': 'out_invoice',
+            'partner_id': customer.id,
+        } for customer in self.customers])
+    
+    def _missing_id(self, model):
+        self.env.cr.execute(f"SELECT COALESCE(MAX(id), 0) + 1000 FROM {self.env[model]._table}")
+        return self.env.cr.fetchone()[0]
+    
+    def _assert_batch(self, path, records, not_found_code):
+        """Results follow the requested order, without duplicates, and report the missing ids"""
+        missing_id = self._missing_id(records._name)
+        result = self.call_api(path, {'ids': [records[1].id, missing_id, records[0].id, records[1].id]})
+        self.assertTrue(result['success'], result)
+        
+        results = result['data']['results']
+        self.assertEqual([item['id'] for item in results], [records[1].id, missing_id, records[0].id])
+        self.assertEqual([item['success'] for item in results], [True, False, True])
+        self.assertEqual(results[1]['error']['code'], not_found_code)
+        self.assertEqual(results[0]['data']['id'], records[1].id)
+        self.assertEqual(result['data']['count'], 3)
+        self.assertEqual(result['data']['found'], 2)
+    
+    def test_sale_orders_batch(self):
+        """Test the sale order batch keeps the requested order and reports missing orders"""
+        self._assert_batch('/api/v1/sales/orders/batch', self.orders, 'ORDER_NOT_FOUND')
+    
+    def test_invoices_batch(self):
+        """Test the invoice batch keeps the requested order and reports missing invoices"""
+        self._assert_batch('/api/v1/finance/invoices/batch', self.invoices, 'INVOICE_NOT_FOUND')
+    
+    def test_customers_batch(self):
+        """Test the customer batch keeps the requested order and reports missing customers"""
+        self._assert_batch('/api/v1/sales/customers/batch', self.customers, 'CUSTOMER_NOT_FOUND')
+    
+    def test_customer_detail_lists_latest_documents_first(self):
+        """Test the orders and invoices of a customer detail come newest first, whatever their creation order"""
+        customer = self.customers[0]
+        product = self.orders.order_line.product_id[0]
+        newer, older = self.env['sale.order'].create([{
+            'partner_id': customer.id,
+            'date_order': date_order,
+            'order_line': [(0, 0, {'product_id': product.id, 'product_uom_qty': 1})],
+        } for date_order in ('2021-06-01 10:00:00', '2021-01-01 10:00:00')])
+        self.orders[0].date_order = '2020-01-01 10:00:00'
+        invoices = self.env['account.move'].create([{
+            'move_type': 'out_invoice',
+            'partner_id': customer.id,
+            'invoice_date': invoice_date,
+        } for invoice_date in ('2021-03-01', '2021-09-01', '2021-01-01')])
+        self.invoices[0].invoice_date = '2020-01-01'
+        
+        result = self.call_api('/api/v1/sales/customers/batch', {'ids': [customer.id]})
+        self.assertTrue(result['success'], result)
+        detail = result['data']['results'][0]['data']
+        
+        self.assertEqual([order['id'] for order in detail['orders']], [newer.id, older.id, self.orders[0].id])
+        self.assertEqual(
+            [invoice['id'] for invoice in detail['invoices']],
+            [invoices[1].id, invoices[0].id, invoices[2].id, self.invoices[0].id]
+        )
+    
+    def test_invalid_ids(self):
+        """Test empty, oversized and non-integer id lists are rejected"""
+        for ids, code in (([], 'INVALID_IDS'), (list(range(1, 52)), 'TOO_MANY_IDS'), (['abc'], 'INVALID_IDS')):
+            result = self.call_api('/api/v1/sales/orders/batch', {'ids': ids})
+            self.assertFalse(result['success'])
+            self.assertEqual(result['error']['code'], code)
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests.common import TransactionCase, tagged
+
+@tagged('post_install', '-at_install')
+class TestCustomerStats(TransactionCase):
+    
+    def setUp(self):
+        super(TestCustomerStats, self).setUp()
+        
+        self.customer = self.env['res.partner'].create({
+            'name': 'Test Customer',
+            'is_company': True,
+        })
+        self.product = self.env['product.product'].create({
+            'name': 'Test Product',
+            'list_price': 100.0,
+        })
+    
+    def _create_order(self, price_unit=100.0):
+        return self.env['sale.order'].create({
+            'partner_id': self.customer.id,
+            'order_line': [(0, 0, {
+                'product_id': self.product.id,
+                'product_uom_qty': 1,
+                'price_unit': price_unit,
+                'tax_id': [(5, 0, 0)],
+            })],
+        })
+    
+    def _create_invoice(self, move_type='out_invoice', price_unit=100.0, post=True):
+        invoice = self.env['account.move'].create({
+            'move_type': move_type,
+            'partner_id': self.customer.id,
+            'invoice_line_ids': [(0, 0, {
+                'name': 'Test line',
+                'quantity': 1,
+                'price_unit': price_unit,
+                'tax_ids': [(5, 0, 0)],
+            })],
+        })
+        if post:
+            invoice.action_post()
+        return invoice
+    
+    def _create_order_in(self, company):
+        return self.env['sale.order'].with_company(company).create({
+            'partner_id': self.customer.id,
+            'company_id': company.id,
+            'order_line': [(0, 0, {
+                'product_id': self.product.id,
+                'product_uom_qty': 1,
+                'tax_id': [(5, 0, 0)],
+            })],
+        })
+    
+    def _totals(self, env=None):
+        return self.customer.with_env(env or self.env)._get_maki_customer_totals()[self.customer.id]
+    
+    def test_totals_start_empty(self):
+        """Test a new partner has zeroed lifetime totals"""
+        self.assertEqual(self._totals(), {
+            'total_orders': 0,
+            'total_invoices': 0,
+            'lifetime_revenue': 0.0,
+            'last_order_date': False,
+        })
+    
+    def test_totals_follow_orders(self):
+        """Test order count and last order date follow the orders"""
+        self._create_order(100.0)
+        self._create_order(50.0)
+        
+        totals = self._totals()
+        self.assertEqual(totals['total_orders'], 2)
+        self.assertEqual(totals['last_order_date'], max(self.customer.sale_order_ids.mapped('date_order')))
+    
+    def test_revenue_is_signed_and_posted(self):
+        """Test revenue sums posted invoices minus refunds, ignoring drafts and vendor bills"""
+        self._create_invoice('out_invoice', 100.0)
+        self._create_invoice('out_refund', 30.0)
+        self._create_invoice('out_invoice', 500.0, post=False)
+        self._create_invoice('in_invoice', 200.0)
+        
+        totals = self._totals()
+        self.assertEqual(totals['total_invoices'], 3)
+        self.assertAlmostEqual(totals['lifetime_revenue'], 70.0)
+    
+    def test_totals_apply_record_rules(self):
+        """Test totals only count the orders the API user can read"""
+        salesman = self.env['res.users'].create({
+            'name': 'Own Documents Salesman',
+            'login': 'own_documents_salesman',
+            'groups_id': [(6, 0, [self.env.ref('sales_team.group_sale_salesman').id])],
+        })
+        own_order = self._create_order(100.0)
+        own_order.user_id = salesman
+        other_order = self._create_order(50.0)
+        other_order.user_id = self.env.ref('base.user_admin')
+        
+        self.assertEqual(self._totals()['total_orders'], 2)
+        self.assertEqual(self._totals(self.env(user=salesman))['total_orders'], 1)
+    
+    def test_stats_are_stored_and_follow_changes(self):
+        """Test the stored per-company stats are updated when orders change"""
+        order = self._create_order(100.0)
+        self._create_order(50.0)
+        company_key = str(self.env.company.id)
+        self.assertEqual(self.customer.maki_customer_stats[company_key]['total_orders'], 2)
+        
+        order.unlink()
+        self.assertEqual(self.customer.maki_customer_stats[company_key]['total_orders'], 1)
+    
+    def test_stored_totals_match_computed_totals(self):
+        """Test the totals read from the stored stats are the ones computed with grouped queries"""
+        self._create_order(100.0)
+        self._create_invoice('out_invoice', 100.0)
+        self._create_invoice('out_refund', 30.0)
+        
+        self.assertTrue(self.customer._maki_stats_visible_to_user())
+        stored = self._totals()
+        computed = self.customer._compute_maki_customer_totals()[self.customer.id]
+        self.assertEqual(stored['total_orders'], computed['total_orders'])
+        self.assertEqual(stored['total_invoices'], computed['total_invoices'])
+        self.assertEqual(stored['last_order_date'], computed['last_order_date'])
+        self.assertAlmostEqual(stored['lifetime_revenue'], computed['lifetime_revenue'])
+    
+    def test_stored_totals_apply_allowed_companies(self):
+        """Test the stored stats only count the orders of the allowed companies"""
+        main_company = self.env.company
+        other_company = self.env['res.company'].create({'name': 'Other Stats Company'})
+        self._create_order_in(main_company)
+        self._create_order_in(other_company)
+        
+        both = self.customer.with_context(allowed_company_ids=[main_company.id, other_company.id])
+        self.assertEqual(both._get_maki_customer_totals()[self.customer.id]['total_orders'], 2)
+        main_only = self.customer.with_context(allowed_company_ids=[main_company.id])
+        self.assertEqual(main_only._get_maki_customer_totals()[self.customer.id]['total_orders'], 1)
+    
+    def test_own_documents_rules_use_computed_totals(self):
+        """Test users restricted to their own documents do not read the stored stats"""
+        salesman = self.env['res.users'].create({
+            'name': 'Stats Salesman',
+            'login': 'stats_salesman',
+            'groups_id': [(6, 0, [self.env.ref('sales_team.group_sale_salesman').id])],
+        })
+        manager = self.env['res.users'].create({
+            'name': 'Stats Manager',
+            'login': 'stats_manager',
+            'groups_id': [(6, 0, [
+                self.env.ref('sales_team.group_sale_manager').id,
+                self.env.ref('account.group_account_invoice').id,
+            ])],
+        })
+        
+        self.assertFalse(self.customer.with_user(salesman)._maki_stats_visible_to_user())
+        self.assertTrue(self.customer.with_user(manager)._maki_stats_visible_to_user())
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import base64
+import shutil
+import time
+
+from PIL import Image
+
+from odoo.tests.common import TransactionCase, HttpCase, tagged
+
+from odoo.addons.maki_api.controllers.images import product_image_urls
+from .common import JWTClientMixin
+
+def _png(color='red', size=(300, 200)):
+    data = io.BytesIO()
+    Image.new('RGB', size, color).save(data, 'PNG')
+    return base64.b64encode(data.getvalue())
+
+@tagged('post_install', '-at_install')
+class TestImageCache(TransactionCase):
+    
+    def setUp(self):
+        super(TestImageCache, self).setUp()
+        self.ImageCache = self.env['maki_api.image_cache']
+        self.cache_dir = self.ImageCache._get_cache_dir()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+    
+    def _cached_file(self, name, age_days, size=1024):
+        path = os.path.join(self.cache_dir, name[:2], name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as cached_file:
+            cached_file.write(b'\0' * size)
+        mtime = time.time() - age_days * 86400
+        os.utime(path, (mtime, mtime))
+        return path
+    
+    def test_old_variants_are_removed(self):
+        """Test variants older than the maximum age are removed and recent ones kept"""
+        old = self._cached_file('aa' + '0' * 38 + '_128', age_days=40)
+        recent = self._cached_file('bb' + '0' * 38 + '_128', age_days=1)
+        
+        result = self.ImageCache.cleanup_image_cache(max_age_days=30, max_size_mb=1024)
+        
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(recent))
+        self.assertEqual(result['removed'], 1)
+    
+    def test_oldest_variants_are_removed_over_the_size_cap(self):
+        """Test the oldest variants are removed until the cache fits in its maximum size"""
+        paths = [
+            self._cached_file(f'{index:02d}' + '0' * 38 + '_512', age_days=5 - index, size=300 * 1024)
+            for index in range(5)
+        ]
+        
+        result = self.ImageCache.cleanup_image_cache(max_age_days=30, max_size_mb=1)
+        
+        self.assertEqual([os.path.exists(path) for path in paths], [False, False, True, True, True])
+        self.assertLessEqual(result['remaining_bytes'], 1024 * 1024)
+
+@tagged('post_install', '-at_install')
+class TestProductImage(JWTClientMixin, HttpCase):
+    
+    def setUp(self):
+        super(TestProductImage, self).setUp()
+        self.product = self.env['product.product'].create({
+            'name': 'Image Product',
+            'image_1920': _png(),
+        })
+        self.url = product_image_urls(self.env, [self.product.id], 128)[self.product.id]
+        self.cache_dir = self.env['maki_api.image_cache']._get_cache_dir()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        self.create_api_user('imageuser')
+    
+    def _get_image(self, url, headers=None, token=True):
+        headers = dict(headers or {})
+        if token:
+            headers['Authorization'] = f'Bearer {self.api_token}'
+        return self.url_open(url, headers=headers, allow_redirects=False)
+    
+    def test_etag_and_not_modified(self):
+        """Test variants are served with a strong ETag and private immutable caching, and revalidate with a 304"""
+        self.assertIn('/api/v1/images/product/', self.url)
+        checksum = self.url.rsplit('/', 1)[1]
+        
+        response = self._get_image(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['ETag'], f'"{checksum}-128"')
+        self.assertIn('private', response.headers['Cache-Control'])
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        image = Image.open(io.BytesIO(response.content))
+        self.assertLessEqual(max(image.size), 128)
+        
+        response = self._get_image(self.url, headers={'If-None-Match': f'"{checksum}-128"'})
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(response.content)
+    
+    def test_uncached_variant_is_generated(self):
+        """Test a variant missing from the cache is generated from the image attachment and stored"""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        checksum = self.url.rsplit('/', 1)[1]
+        
+        response = self._get_image(self.url.replace('/128/', '/512/'))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(max(Image.open(io.BytesIO(response.content)).size), 512)
+        self.assertTrue(os.path.isfile(os.path.join(self.cache_dir, checksum[:2], f'{checksum}_512')))
+    
+    def test_outdated_checksum_is_not_found(self):
+        """Test a URL with the checksum of a replaced image is not found and does not reveal the current one"""
+        old_url = self.url
+        self.product.image_1920 = _png('blue')
+        new_url = product_image_urls(self.env, [self.product.id], 128)[self.product.id]
+        self.assertNotEqual(old_url, new_url)
+        
+        response = self._get_image(old_url)
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('Location', response.headers)
+    
+    def test_checksum_of_another_product_is_not_found(self):
+        """Test a product URL does not serve the image of another product"""
+        other = self.env['product.product'].create({'name': 'Other Product', 'image_1920': _png('green')})
+        other_checksum = product_image_urls(self.env, [other.id], 128)[other.id].rsplit('/', 1)[1]
+        
+        response = self._get_image(self.url.rsplit('/', 1)[0] + '/' + other_checksum)
+        self.assertEqual(response.status_code, 404)
+    
+    def test_token_is_required(self):
+        """Test images are not served without an access token"""
+        self.assertEqual(self._get_image(self.url, token=False).status_code, 401)
+    
+    def test_archived_product_is_not_found(self):
+        """Test the images of products the user cannot read are not served"""
+        self.product.active = False
+        self.assertEqual(self._get_image(self.url).status_code, 404)
+    
+    def test_unknown_size_is_not_found(self):
+        """Test only the configured sizes are served"""
+        self.assertEqual(self._get_image(self.url.replace('/128/', '/100/')).status_code, 404)
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+import json
+import time
+from datetime import timedelta
+
+import jwt
+
+from odoo import fields
+from odoo.exceptions import UserError
+from odoo.tests.common import TransactionCase, tagged
+
+@tagged('post_install', '-at_install')
+class TestJWTKeys(TransactionCase):
+    
+    def setUp(self):
+        super(TestJWTKeys, self).setUp()
+        self.JWTKeys = self.env['maki_api.jwt_keys']
+        self.payload = {
+            'sub': '1',
+            'exp': int(time.time()) + 3600,
+        }
+    
+    def test_encode_decode(self):
+        """Test tokens carry the kid of the signing key and verify"""
+        token = self.JWTKeys.encode_token(self.payload)
+        
+        self.assertEqual(jwt.get_unverified_header(token)['kid'], self.JWTKeys.get_signing_key().kid)
+        self.assertEqual(self.JWTKeys.decode_token(token)['sub'], '1')
+    
+    def test_rotation_keeps_old_tokens_valid(self):
+        """Test tokens signed before a rotation still verify after it"""
+        old_token = self.JWTKeys.encode_token(self.payload)
+        old_kid = self.JWTKeys.get_signing_key().kid
+        
+        new_kid = self.JWTKeys.rotate_key()
+        
+        # The parameter change invalidates the cached keys
+        self.assertEqual(self.JWTKeys.get_signing_key().kid, new_kid)
+        self.assertNotEqual(new_kid, old_kid)
+        self.assertEqual(self.JWTKeys.decode_token(old_token)['sub'], '1')
+        
+        new_token = self.JWTKeys.encode_token(self.payload)
+        self.assertEqual(jwt.get_unverified_header(new_token)['kid'], new_kid)
+    
+    def test_unknown_kid_rejected(self):
+        """Test a token naming an unknown key is rejected"""
+        token = jwt.encode(self.payload, 'forged', algorithm='HS256', headers={'kid': 'unknown'})
+        
+        with self.assertRaises(jwt.InvalidTokenError):
+            self.JWTKeys.decode_token(token)
+    
+    def test_jwks_only_publishes_public_keys(self):
+        """Test symmetric keys are never published in the JWKS"""
+        self.JWTKeys.rotate_key('HS256')
+        self.assertEqual(self.JWTKeys.get_jwks(), {'keys': []})
+        
+        try:
+            kid = self.JWTKeys.rotate_key('EdDSA')
+        except Exception:
+            self.skipTest('cryptography is not available')
+        
+        jwks = self.JWTKeys.get_jwks()
+        self.assertEqual([key['kid'] for key in jwks['keys']], [kid])
+        self.assertNotIn('d', jwks['keys'][0])
+        
+        token = self.JWTKeys.encode_token(self.payload)
+        public_key = jwt.PyJWK(jwks['keys'][0]).key
+        self.assertEqual(jwt.decode(token, public_key, algorithms=['EdDSA'])['sub'], '1')
+    
+    def test_retired_keys_expire(self):
+        """Test a retired key stops verifying once KEY_RETENTION has passed"""
+        old_token = self.JWTKeys.encode_token(self.payload)
+        self.JWTKeys.rotate_key()
+        self.assertEqual(self.JWTKeys.decode_token(old_token)['sub'], '1')
+        
+        # Retirada hace más de KEY_RETENTION
+        ICP = self.env['ir.config_parameter'].sudo()
+        entries = json.loads(ICP.get_param('maki_api.jwt_keys'))
+        for entry in entries:
+            if entry['retired']:
+                entry['retired'] = fields.Datetime.to_string(fields.Datetime.now() - timedelta(days=8))
+        ICP.set_param('maki_api.jwt_keys', json.dumps(entries))
+        
+        with self.assertRaises(jwt.InvalidTokenError):
+            self.JWTKeys.decode_token(old_token)
+        self.assertEqual(self.JWTKeys.decode_token(self.JWTKeys.encode_token(self.payload))['sub'], '1')
+    
+    def test_keys_are_not_created_on_read(self):
+        """Test reading the keys never writes parameters"""
+        ICP = self.env['ir.config_parameter'].sudo()
+        self.assertTrue(ICP.get_param('maki_api.jwt_keys'))
+        
+        ICP.search([('key', 'in', ['maki_api.jwt_keys', 'maki_api.jwt_secret_key'])]).unlink()
+        self.JWTKeys.clear_caches()
+        with self.assertRaises(UserError):
+            self.JWTKeys.get_signing_key()
+        self.assertFalse(ICP.get_param('maki_api.jwt_secret_key'))
+        
+        self.JWTKeys._init_keys()
+        self.assertEqual(self.JWTKeys.get_signing_key().kid, 'default')
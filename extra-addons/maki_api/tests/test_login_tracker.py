@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+
+from datetime import datetime
+
+from odoo.tests.common import TransactionCase, tagged
+
+from odoo.addons.maki_api.tools.login_tracker import LoginTracker
+
+@tagged('post_install', '-at_install')
+class TestLoginTracker(TransactionCase):
+    
+    def test_logins_are_deduplicated(self):
+        """Test several logins of a user in an interval are buffered once, with the latest date"""
+        tracker = LoginTracker(interval=3600)
+        tracker.track('test_db', 1, datetime(2024, 1, 1, 8, 0))
+        tracker.track('test_db', 1, datetime(2024, 1, 1, 8, 5))
+        tracker.track('test_db', 2, datetime(2024, 1, 1, 8, 1))
+        tracker.track('other_db', 1, datetime(2024, 1, 1, 8, 2))
+        
+        self.assertEqual(len(tracker), 3)
+        self.assertEqual(tracker._pending['test_db'][1], datetime(2024, 1, 1, 8, 5))
+    
+    def test_login_is_tracked_in_tests(self):
+        """Test logins are still recorded synchronously while testing"""
+        user = self.env['res.users'].create({
+            'name': 'Tracked User',
+            'login': 'trackeduser',
+        })
+        user._update_last_login()
+        
+        self.assertTrue(self.env['res.users.log'].search_count([('create_uid', '=', user.id)]))
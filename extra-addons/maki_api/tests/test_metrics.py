@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import shutil
+import tempfile
+
+from odoo.tests.common import TransactionCase, HttpCase, tagged
+
+from odoo.addons.maki_api.tools.metrics import MetricsRegistry
+
+@tagged('post_install', '-at_install')
+class TestMetricsRegistry(TransactionCase):
+    
+    def setUp(self):
+        super(TestMetricsRegistry, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.registry = MetricsRegistry(self.directory, interval=3600)
+    
+    def _write_worker(self, pid, queries):
+        with open(os.path.join(self.directory, f'worker_{pid}.json'), 'w') as worker_file:
+            json.dump({
+                'counters': [['maki_api_db_queries_total', [['endpoint', 'Sales.orders']], queries]],
+                'histograms': [],
+                'gauges': [['maki_api_log_queue_entries', [], 3]],
+            }, worker_file)
+    
+    def test_workers_are_aggregated(self):
+        """Test counters of live and dead workers are summed, and dead workers are archived"""
+        self.registry.inc('maki_api_db_queries_total', (('endpoint', 'Sales.orders'),), 2)
+        self._write_worker(os.getppid(), 5)
+        # Un pid por encima de pid_max no puede estar vivo
+        self._write_worker(2 ** 23, 10)
+        
+        totals = self.registry.collect()
+        self.assertEqual(totals['counters'][('maki_api_db_queries_total', (('endpoint', 'Sales.orders'),))], 17)
+        # El gauge del worker muerto no cuenta
+        self.assertEqual(totals['gauges'][('maki_api_log_queue_entries', ())], 3)
+        self.assertNotIn(f'worker_{2 ** 23}.json', os.listdir(self.directory))
+        
+        # Lo archivado se sigue contando en las siguientes lecturas
+        totals = self.registry.collect()
+        self.assertEqual(totals['counters'][('maki_api_db_queries_total', (('endpoint', 'Sales.orders'),))], 17)
+    
+    def test_render_histogram(self):
+        """Test histograms are rendered with cumulative buckets, sum and count"""
+        labels = (('endpoint', 'Sales.orders'), ('status', '200'))
+        self.registry.observe('maki_api_request_duration_seconds', labels, 0.02)
+        self.registry.observe('maki_api_request_duration_seconds', labels, 0.3)
+        
+        text = self.registry.render()
+        self.assertIn('# TYPE maki_api_request_duration_seconds histogram', text)
+        self.assertIn('maki_api_request_duration_seconds_bucket{endpoint="Sales.orders",status="200",le="0.025"} 1', text)
+        self.assertIn('maki_api_request_duration_seconds_bucket{endpoint="Sales.orders",status="200",le="+Inf"} 2', text)
+        self.assertIn('maki_api_request_duration_seconds_count{endpoint="Sales.orders",status="200"} 2', text)
+
+@tagged('post_install', '-at_install')
+class TestMetricsEndpoint(HttpCase):
+    
+    def test_metrics_endpoint(self):
+        """Test /api/v1/metrics is disabled without a token and serves the text format behind it"""
+        self.env['ir.config_parameter'].sudo().set_param('maki_api.metrics_token', False)
+        self.assertEqual(self.url_open('/api/v1/metrics').status_code, 403)
+        
+        self.env['ir.config_parameter'].sudo().set_param('maki_api.metrics_token', 'scrape-secret')
+        self.assertEqual(self.url_open('/api/v1/metrics').status_code, 401)
+        self.assertEqual(self.url_open('/api/v1/metrics', headers={'Authorization': 'Bearer wrong'}).status_code, 401)
+        
+        response = self.url_open('/api/v1/metrics', headers={'Authorization': 'Bearer scrape-secret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('text/plain', response.headers['Content-Type'])
+        self.assertIn('maki_api_token_blacklist_rows', response.text)
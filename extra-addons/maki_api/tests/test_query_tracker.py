@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests.common import TransactionCase, HttpCase, tagged
+
+from odoo.addons.maki_api.tools.query_tracker import QueryTracker
+from .common import QueryBudgetMixin
+
+@tagged('post_install', '-at_install')
+class TestQueryTracker(TransactionCase):
+    
+    def test_queries_are_counted(self):
+        """Test the queries run inside the tracker are counted and timed"""
+        with QueryTracker() as tracker:
+            self.env.cr.execute("SELECT 1")
+            self.env.cr.execute("SELECT 2")
+        self.env.cr.execute("SELECT 3")
+        
+        self.assertEqual(tracker.count, 2)
+        self.assertGreater(tracker.time, 0)
+        self.assertFalse(tracker.n_plus_one)
+    
+    def test_repeated_queries_are_flagged(self):
+        """Test the same query shape repeated per record is flagged as N+1"""
+        partners = self.env['res.partner'].create([{'name': f'N+1 Partner {i}'} for i in range(12)])
+        
+        with QueryTracker(threshold=10) as tracker:
+            for partner in partners:
+                self.env.cr.execute("SELECT name FROM res_partner WHERE id = %s", (partner.id,))
+        
+        self.assertTrue(tracker.n_plus_one)
+        self.assertEqual(tracker.repeated, [("SELECT name FROM res_partner WHERE id = %s", 12)])
+        self.assertIn('n_plus_one=1', tracker.header())
+        
+        with QueryTracker(threshold=10) as tracker:
+            self.env.cr.execute("SELECT name FROM res_partner WHERE id IN %s", (tuple(partners.ids),))
+        self.assertFalse(tracker.n_plus_one)
+
+@tagged('post_install', '-at_install')
+class TestEndpointQueryBudget(QueryBudgetMixin, HttpCase):
+    
+    def test_health_query_budget(self):
+        """Test the health check stays within its query budget and logs its queries"""
+        response, stats = self.assertQueryBudget('GET', '/api/v1/health', 2)
+        self.assertEqual(response.status_code, 200)
+        
+        log = self.env['maki_api.log'].search([('endpoint', '=', '/api/v1/health')], limit=1)
+        self.assertEqual(log.query_count, int(stats['count']))
+        self.assertFalse(log.n_plus_one)
+    
+    def test_debug_header_is_opt_in(self):
+        """Test query counts are only returned when asked for"""
+        response = self.call_json_endpoint('GET', '/api/v1/health', headers={'X-Maki-Debug-Queries': ''})
+        self.assertNotIn('X-Maki-Queries', response.headers)
@@ -3,6 +3,7 @@
 import unittest
 from unittest.mock import patch, MagicMock
 import time
+import uuid
 
 from odoo.tests.common import TransactionCase, tagged
 from odoo.http import Response
@@ -124,4 +125,325 @@ class TestRateLimit(TransactionCase):
         self.assertNotEqual(
             mock_redis_instance.incr.call_args_list[0][0][0],
             mock_redis_instance.incr.call_args_list[1][0][0]
-        )
\ No newline at end of file
+        )
+
+@tagged('post_install', '-at_install')
+class TestSlidingWindowLimiter(TransactionCase):
+    
+    def setUp(self):
+        super(TestSlidingWindowLimiter, self).setUp()
+        from odoo.addons.maki_api.tools.rate_limiter import SlidingWindowLimiter
+        self.SlidingWindowLimiter = SlidingWindowLimiter
+        self.now = 1000000.0
+    
+    def test_limit_within_window(self):
+        """Test requests beyond the limit are rejected and not counted"""
+        limiter = self.SlidingWindowLimiter()
+        results = [limiter.hit('key', 5, 60, now=self.now + i)[0] for i in range(8)]
+        
+        self.assertEqual(results, [True] * 5 + [False] * 3)
+    
+    def test_previous_window_is_weighted(self):
+        """Test the previous window counts in proportion to its overlap with the sliding window"""
+        limiter = self.SlidingWindowLimiter()
+        window_start = self.now - self.now % 60
+        for _ in range(10):
+            limiter.hit('key', 10, 60, now=window_start)
+        
+        # A mitad de la ventana siguiente quedan ~5 peticiones de la anterior
+        results = [limiter.hit('key', 10, 60, now=window_start + 90)[0] for _ in range(6)]
+        self.assertEqual(results, [True] * 5 + [False])
+        
+        # Dos ventanas después la clave vuelve a empezar
+        self.assertEqual(limiter.hit('key', 10, 60, now=window_start + 180)[1], 1)
+    
+    def test_keys_are_evicted(self):
+        """Test memory is bounded by LRU and idle keys are dropped"""
+        limiter = self.SlidingWindowLimiter(max_keys=1000)
+        for i in range(5000):
+            limiter.hit(f'key{i}', 10, 60, now=self.now)
+        self.assertEqual(len(limiter), 1000)
+        
+        for i in range(10):
+            limiter.hit(f'new{i}', 10, 60, now=self.now + 600)
+        self.assertLess(len(limiter), 1000)
+    
+    def test_benchmark_constant_time(self):
+        """Micro-benchmark: a check costs the same with 1k and 100k keys, and with many hits per key"""
+        def time_checks(key_count, hits_per_key):
+            limiter = self.SlidingWindowLimiter(max_keys=200000)
+            for i in range(key_count):
+                for _ in range(hits_per_key):
+                    limiter.hit(f'key{i}', 1000000, 3600, now=self.now)
+            start = time.perf_counter()
+            for i in range(20000):
+                limiter.hit(f'key{i % key_count}', 1000000, 3600, now=self.now)
+            return (time.perf_counter() - start) / 20000
+        
+        small = time_checks(1000, 1)
+        large = time_checks(100000, 1)
+        busy = time_checks(1000, 100)
+        
+        # Sin dependencia del número de claves ni de peticiones (margen amplio por ruido)
+        self.assertLess(large, small * 3)
+        self.assertLess(busy, small * 3)
+
+
+@tagged('post_install', '-at_install')
+class TestRateLimitBackends(TransactionCase):
+    
+    def setUp(self):
+        super(TestRateLimitBackends, self).setUp()
+        from odoo.addons.maki_api.tools import rate_limiter
+        self.rate_limiter = rate_limiter
+        self.ICP = self.env['ir.config_parameter'].sudo()
+    
+    def test_backend_selected_by_config(self):
+        """Test the backend is chosen from maki_api.rate_limit_backend"""
+        self.ICP.set_param('maki_api.rate_limit_backend', 'memory')
+        self.assertEqual(self.rate_limiter.get_rate_limit_backend(self.env).name, 'memory')
+        
+        self.ICP.set_param('maki_api.rate_limit_backend', 'postgres')
+        self.assertEqual(self.rate_limiter.get_rate_limit_backend(self.env).name, 'postgres')
+    
+    def test_postgres_backend(self):
+        """Test the Postgres backend counts requests across calls and only counts allowed ones"""
+        self.ICP.set_param('maki_api.rate_limit_backend', 'postgres')
+        # Los contadores se confirman en su propio cursor: clave única por ejecución
+        key = f'test_postgres_backend_{uuid.uuid4()}'
+        results = [self.rate_limiter.check_rate_limit(self.env, key, 3, 60)[0] for _ in range(4)]
+        
+        self.assertEqual(results, [True, True, True, False])
+        
+        self.env.cr.execute("""
+            SELECT SUM(hits) FROM maki_api_rate_limit_counter WHERE key = %s
+        """, (f'{key}:60',))
+        self.assertEqual(self.env.cr.fetchone()[0], 3)
+    
+    def test_failing_backend_falls_back_to_memory(self):
+        """Test a failing backend degrades to the in-memory limiter"""
+        class BrokenBackend:
+            name = 'broken'
+            
+            def hit(self, env, key, limit, window):
+                raise ConnectionError('backend down')
+        
+        with patch.object(self.rate_limiter, 'get_rate_limit_backend', return_value=BrokenBackend()):
+            allowed, hits, _reset_after = self.rate_limiter.check_rate_limit(self.env, 'test_fallback', 5, 60)
+        
+        self.assertTrue(allowed)
+        self.assertEqual(hits, 1)
+    
+    def test_redis_backend(self):
+        """Test the Lua sliding window against a local Redis stand-in"""
+        try:
+            import fakeredis
+            client = fakeredis.FakeRedis()
+            client.eval('return 1', 0)
+        except Exception:
+            self.skipTest('fakeredis with Lua support is not available')
+        
+        backend = self.rate_limiter.RedisBackend(client=client)
+        now = 1000020.0
+        results = [backend.hit(self.env, 'key', 5, 60, now=now)[0] for _ in range(6)]
+        self.assertEqual(results, [True] * 5 + [False])
+        
+        # A mitad de la ventana siguiente cuenta la mitad de la anterior
+        window_start = now - now % 60
+        allowed, hits, _reset_after = backend.hit(self.env, 'key', 5, 60, now=window_start + 90)
+        self.assertTrue(allowed)
+        self.assertEqual(hits, 3)
+        
+        # Cada ventana es una clave que expira sola
+        self.assertTrue(all(client.ttl(key) > 0 for key in client.keys('maki_api:rl:*')))
+    
+    def test_circuit_breaker(self):
+        """Test the circuit opens after repeated failures and lets one trial through after the timeout"""
+        breaker = self.rate_limiter.CircuitBreaker(failure_threshold=3, reset_timeout=0.1)
+        for _ in range(3):
+            self.assertTrue(breaker.allow())
+            breaker.record_failure()
+        
+        self.assertEqual(breaker.state, 'open')
+        self.assertFalse(breaker.allow())
+        
+        time.sleep(0.15)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+    
+    def test_redis_outage_fails_fast(self):
+        """Test an open circuit skips Redis entirely"""
+        calls = []
+        
+        class DownClient:
+            def register_script(self, script):
+                def run(keys, args):
+                    calls.append(keys)
+                    raise ConnectionError('redis down')
+                return run
+        
+        backend = self.rate_limiter.RedisBackend(
+            client=DownClient(),
+            breaker=self.rate_limiter.CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        )
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                backend.hit(self.env, 'key', 5, 60)
+        
+        with self.assertRaises(self.rate_limiter.CircuitOpenError):
+            backend.hit(self.env, 'key', 5, 60)
+        self.assertEqual(len(calls), 2)
+    
+    def test_leased_backend_respects_limit(self):
+        """Test leased quotas never exceed the limit and give back unused tokens"""
+        shared = _CountingBackend(self.rate_limiter.SlidingWindowLimiter())
+        leased = self.rate_limiter.LeasedBackend(shared, tolerance=0.1)
+        
+        results = [leased.hit(self.env, 'key', 105, 3600)[0] for _ in range(150)]
+        self.assertEqual(sum(results), 105)
+        
+        # Un lease caducado devuelve sus tokens al almacén compartido
+        shared = _CountingBackend(self.rate_limiter.SlidingWindowLimiter())
+        leased = self.rate_limiter.LeasedBackend(shared, tolerance=0.1, lease_ttl=0.01)
+        leased.hit(self.env, 'key', 100, 3600)
+        time.sleep(0.02)
+        leased.hit(self.env, 'key', 100, 3600)
+        self.assertEqual(shared.released, 9)
+    
+    def test_leased_backend_releases_idle_keys(self):
+        """Test expired leases of keys never hit again, and leases evicted from the LRU, are given back"""
+        shared = _CountingBackend(self.rate_limiter.SlidingWindowLimiter())
+        leased = self.rate_limiter.LeasedBackend(shared, tolerance=0.1, lease_ttl=5)
+        leased.hit(self.env, 'idle', 100, 3600, now=1000.0)
+        
+        # Otra clave, pasado el TTL: el barrido devuelve el lease de la inactiva
+        leased.hit(self.env, 'other', 100, 3600, now=1010.0)
+        self.assertEqual(shared.released, 9)
+        self.assertNotIn('idle', leased._leases)
+        
+        shared = _CountingBackend(self.rate_limiter.SlidingWindowLimiter())
+        leased = self.rate_limiter.LeasedBackend(shared, tolerance=0.1, lease_ttl=5, max_keys=1)
+        leased.hit(self.env, 'first', 100, 3600, now=1000.0)
+        leased.hit(self.env, 'second', 100, 3600, now=1001.0)
+        self.assertEqual(shared.released, 9)
+        self.assertEqual(list(leased._leases), ['second'])
+    
+    def test_benchmark_leased_vs_per_request(self):
+        """Benchmark: leasing cuts shared-store round trips (and their latency) by the batch factor"""
+        def run(backend, shared, checks=500):
+            start = time.perf_counter()
+            for _ in range(checks):
+                backend.hit(self.env, 'key', 1000, 3600)
+            return time.perf_counter() - start, shared.calls
+        
+        shared = _CountingBackend(self.rate_limiter.SlidingWindowLimiter(), latency=0.0005)
+        per_request_time, per_request_calls = run(shared, shared)
+        
+        shared = _CountingBackend(self.rate_limiter.SlidingWindowLimiter(), latency=0.0005)
+        leased = self.rate_limiter.LeasedBackend(shared, tolerance=0.1)
+        leased_time, leased_calls = run(leased, shared)
+        
+        # Lotes de 100 (10% de 1000): 5 viajes en lugar de 500
+        self.assertEqual(per_request_calls, 500)
+        self.assertEqual(leased_calls, 5)
+        self.assertLess(leased_time, per_request_time / 5)
+
+
+@tagged('post_install', '-at_install')
+class TestRateLimitPolicy(TransactionCase):
+    
+    def setUp(self):
+        super(TestRateLimitPolicy, self).setUp()
+        self.Policy = self.env['maki_api.rate_limit_policy'].sudo()
+        self.Policy.search([]).unlink()
+        self.group = self.env['res.groups'].create({'name': 'API Integrations'})
+        self.default_policy = self.Policy.create({
+            'name': 'Sales',
+            'route_pattern': '/api/v1/sales/*',
+            'limit': 50,
+            'window': 300,
+        })
+        self.integration_policy = self.Policy.create({
+            'name': 'Sales (integrations)',
+            'sequence': 5,
+            'route_pattern': '/api/v1/sales/*',
+            'group_id': self.group.id,
+            'limit': 5000,
+            'window': 300,
+            'burst': 50,
+        })
+    
+    def test_policy_matching(self):
+        """Test the first policy matching the route and the caller's groups applies"""
+        policy = self.Policy._match_policy('/api/v1/sales/orders/42', [self.group.id])
+        self.assertEqual((policy.limit, policy.burst), (5000, 50))
+        
+        policy = self.Policy._match_policy('/api/v1/sales/orders/42', [])
+        self.assertEqual((policy.limit, policy.burst), (50, 0))
+        
+        self.assertIsNone(self.Policy._match_policy('/api/v1/finance/invoices', [self.group.id]))
+    
+    def test_matcher_is_cached_and_invalidated_on_write(self):
+        """Test policies are compiled once and recompiled after every change"""
+        matcher = self.Policy._get_policy_matcher()
+        self.assertIs(self.Policy._get_policy_matcher(), matcher)
+        
+        self.integration_policy.write({'limit': 10000})
+        policy = self.Policy._match_policy('/api/v1/sales/orders', [self.group.id])
+        self.assertEqual(policy.limit, 10000)
+        
+        self.integration_policy.active = False
+        policy = self.Policy._match_policy('/api/v1/sales/orders', [self.group.id])
+        self.assertEqual(policy.limit, 50)
+        
+        self.default_policy.unlink()
+        self.assertIsNone(self.Policy._match_policy('/api/v1/sales/orders', [self.group.id]))
+    
+    def test_benchmark_policy_lookup(self):
+        """Micro-benchmark: checking a request against 50 policies takes microseconds"""
+        self.Policy.create([{
+            'name': f'Policy {i}',
+            'route_pattern': f'/api/v1/module{i}/*',
+            'limit': 100,
+        } for i in range(48)])
+        matcher = self.Policy._get_policy_matcher()
+        self.assertEqual(len(matcher), 50)
+        
+        start = time.perf_counter()
+        for _ in range(10000):
+            matcher.match('/api/v1/unmatched/route', [1, 2, 3])
+        per_lookup = (time.perf_counter() - start) / 10000
+        
+        # Margen amplio por ruido; una consulta SQL por petición costaría ~100 veces más
+        self.assertLess(per_lookup, 0.0001)
+
+
+class _CountingBackend:
+    """Shared backend stand-in over a SlidingWindowLimiter, counting round trips"""
+    
+    name = 'counting'
+    
+    def __init__(self, limiter, latency=0.0):
+        self.limiter = limiter
+        self.latency = latency
+        self.calls = 0
+        self.released = 0
+    
+    def acquire(self, env, key, limit, window, count):
+        self.calls += 1
+        time.sleep(self.latency)
+        allowed, hits, reset_after = self.limiter.hit(key, limit - count + 1, window)
+        if allowed and count > 1:
+            for _ in range(count - 1):
+                self.limiter.hit(key, limit, window)
+            hits += count - 1
+        return allowed, hits, reset_after
+    
+    def hit(self, env, key, limit, window):
+        return self.acquire(env, key, limit, window, 1)
+    
+    def release(self, env, key, window, index, count):
+        self.calls += 1
+        self.released += count
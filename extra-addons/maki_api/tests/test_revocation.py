@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+import uuid
+
+from odoo.tests.common import TransactionCase, tagged
+
+from odoo.addons.maki_api.tools.jwt_auth import JWTAuthError, check_token_epoch
+from odoo.addons.maki_api.tools.revocation import BloomFilter, RevocationSet
+
+@tagged('post_install', '-at_install')
+class TestRevocation(TransactionCase):
+    
+    def test_bloom_filter_no_false_negatives(self):
+        """Test every added item is reported as present"""
+        bloom = BloomFilter(capacity=1000)
+        items = [str(uuid.uuid4()) for _ in range(1000)]
+        for item in items:
+            bloom.add(item)
+        
+        self.assertTrue(all(item in bloom for item in items))
+    
+    def test_bloom_filter_false_positive_rate(self):
+        """Test the false positive rate stays close to the configured one"""
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for _ in range(1000):
+            bloom.add(str(uuid.uuid4()))
+        
+        false_positives = sum(1 for _ in range(10000) if str(uuid.uuid4()) in bloom)
+        self.assertLess(false_positives, 300)
+    
+    def test_revocation_set(self):
+        """Test loading and adding revoked token ids"""
+        revocation_set = RevocationSet('test_db')
+        revocation_set.load([('jti-1', 2000000000.0)])
+        
+        self.assertTrue(revocation_set.is_revoked('jti-1'))
+        self.assertFalse(revocation_set.is_revoked('jti-2'))
+        
+        revocation_set.add('jti-2', 2000000000.0)
+        self.assertTrue(revocation_set.is_revoked('jti-2'))
+        
+        # A reload replaces the whole set
+        revocation_set.load([])
+        self.assertFalse(revocation_set.is_revoked('jti-1'))
+        self.assertEqual(len(revocation_set), 0)
+    
+    def test_is_blacklisted(self):
+        """Test is_blacklisted sees revocations of the current transaction"""
+        user = self.env['res.users'].create({
+            'name': 'Revoked User',
+            'login': 'revokeduser',
+        })
+        TokenBlacklist = self.env['maki_api.token_blacklist']
+        jti = str(uuid.uuid4())
+        
+        self.assertFalse(TokenBlacklist.is_blacklisted(jti))
+        TokenBlacklist.add_token_to_blacklist(
+            jti=jti,
+            user_id=user.id,
+            token_type='access',
+            expires_at='2099-01-01T00:00:00',
+        )
+        self.assertTrue(TokenBlacklist.is_blacklisted(jti))
+    
+    def test_token_epoch(self):
+        """Test revoking all tokens of a user moves its token epoch forward"""
+        user = self.env['res.users'].create({
+            'name': 'Epoch User',
+            'login': 'epochuser',
+        })
+        
+        active, epoch, profile_epoch = self.env['res.users']._get_token_epoch(user.id)
+        self.assertTrue(active)
+        self.assertIsNone(epoch)
+        
+        user.revoke_all_tokens()
+        active, epoch, profile_epoch = self.env['res.users']._get_token_epoch(user.id)
+        self.assertTrue(active)
+        self.assertTrue(user.tokens_valid_after)
+        self.assertIsNotNone(epoch)
+        
+        user.write({'active': False})
+        self.assertFalse(self.env['res.users']._get_token_epoch(user.id)[0])
+    
+    def test_revocation_set_epochs(self):
+        """Test a stale epoch read never overwrites a notified epoch"""
+        revocation_set = RevocationSet('test_db')
+        version = revocation_set.epochs_version
+        revocation_set.set_epoch(1, True, 2000000000.0)
+        revocation_set.set_epoch(1, True, None, version=version)
+        
+        self.assertEqual(revocation_set.get_epoch(1), (True, 2000000000.0, None))
+    
+    def test_group_change_outdates_token_profile(self):
+        """Test adding a user to a group rejects its access tokens but not its refresh tokens"""
+        user = self.env['res.users'].create({
+            'name': 'Profile User',
+            'login': 'profileuser',
+        })
+        group = self.env['res.groups'].create({'name': 'Profile Group'})
+        issued_at = 0
+        
+        self.assertNotIn(group.id, user._get_token_profile()['gids'])
+        self.assertIsNone(self.env['res.users']._get_token_epoch(user.id)[2])
+        
+        group.write({'users': [(4, user.id)]})
+        epoch = self.env['res.users']._get_token_epoch(user.id)
+        self.assertIsNotNone(epoch[2])
+        self.assertIn(group.id, user._get_token_profile()['gids'])
+        
+        with self.assertRaises(JWTAuthError):
+            check_token_epoch({'type': 'access', 'iat': issued_at}, epoch)
+        check_token_epoch({'type': 'refresh', 'iat': issued_at}, epoch)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests.common import HttpCase, tagged
+
+from .common import JWTClientMixin
+
+@tagged('post_install', '-at_install')
+class TestSaleOrderLinePaging(JWTClientMixin, HttpCase):
+    
+    def setUp(self):
+        super(TestSaleOrderLinePaging, self).setUp()
+        self.create_api_user('linesuser', ['sales_team.group_sale_manager'])
+        product = self.env['product.product'].create({'name': 'Paged Product', 'list_price': 10.0})
+        # Secuencias negativas y repetidas: el cursor debe ordenar por (sequence, id)
+        self.order = self.env['sale.order'].create({
+            'partner_id': self.env['res.partner'].create({'name': 'Paged Customer'}).id,
+            'order_line': [(0, 0, {
+                'product_id': product.id,
+                'name': f'Line {index}',
+                'sequence': sequence,
+                'product_uom_qty': 1,
+            }) for index, sequence in enumerate((10, -5, 0, -5, 10))],
+        })
+        self.path = f'/api/v1/sales/orders/{self.order.id}'
+    
+    def test_lines_are_paged_with_the_cursor(self):
+        """Test paging the lines returns each line once, in (sequence, id) order, including negative sequences"""
+        expected = self.order.order_line.sorted(lambda line: (line.sequence, line.id)).ids
+        
+        line_ids, cursor, pages = [], None, 0
+        while True:
+            result = self.call_api(self.path, {'lines_limit': 2, 'lines_cursor': cursor}, method='GET')
+            self.assertTrue(result['success'], result)
+            data = result['data']
+            line_ids += [line['id'] for line in data['lines']]
+            pages += 1
+            cursor = data['lines_next_cursor']
+            self.assertEqual(data['lines_has_more'], bool(cursor))
+            if not cursor:
+                break
+        
+        self.assertEqual(line_ids, expected)
+        self.assertEqual(pages, 3)
+    
+    def test_invalid_cursor_is_rejected(self):
+        """Test a malformed lines cursor gets an explicit INVALID_CURSOR error"""
+        for cursor in ('not a cursor', '-5-12', 'WyJhIiwgMV0='):
+            result = self.call_api(self.path, {'lines_limit': 2, 'lines_cursor': cursor}, method='GET')
+            self.assertFalse(result['success'])
+            self.assertEqual(result['error']['code'], 'INVALID_CURSOR')
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests.common import HttpCase, tagged
+
+from .common import JWTClientMixin
+
+@tagged('post_install', '-at_install')
+class TestSyncFeed(JWTClientMixin, HttpCase):
+    
+    def setUp(self):
+        super(TestSyncFeed, self).setUp()
+        self.create_api_user('syncuser')
+        self.env['ir.config_parameter'].sudo().set_param('maki_api.sync_safety_lag', 0)
+        self.products = self.env['product.product'].create([
+            {'name': f'Sync Product {index}'} for index in range(3)
+        ])
+        # Los cambios se entregan cuando son anteriores al margen de seguridad
+        self._backdate('product_product', 'write_date', 60 * 24 * 60)
+    
+    def _backdate(self, table, column, minutes):
+        self.env.cr.execute(
+            f"UPDATE {table} SET {column} = (now() at time zone 'UTC') - interval '1 minute' * %s",
+            (minutes,)
+        )
+        self.env.invalidate_all()
+    
+    def _sync(self, **params):
+        result = self.call_api('/api/v1/sync/products', params)
+        self.assertTrue(result['success'], result)
+        return result['data']
+    
+    def _sync_to_end(self, cursor=None):
+        """Page through the feed; returns (record ids, deleted ids, last cursor)"""
+        record_ids, deleted_ids = [], []
+        while True:
+            data = self._sync(cursor=cursor, limit=500)
+            self.assertFalse(data['reset_required'])
+            record_ids += [record['id'] for record in data['records']]
+            deleted_ids += data['deleted']
+            cursor = data['next_cursor']
+            if not data['has_more']:
+                return record_ids, deleted_ids, cursor
+    
+    def test_paging_through_old_records(self):
+        """Test a first full load over records older than the tombstone retention never asks for a reset"""
+        first = self._sync(limit=2)
+        self.assertTrue(first['has_more'])
+        second = self._sync(cursor=first['next_cursor'], limit=2)
+        
+        self.assertFalse(second['reset_required'])
+        self.assertEqual(len(second['records']), 2)
+        first_ids = {record['id'] for record in first['records']}
+        self.assertFalse(first_ids & {record['id'] for record in second['records']})
+    
+    def test_cursor_round_trip(self):
+        """Test the cursor resumes after the last record and returns later changes only"""
+        record_ids, deleted_ids, cursor = self._sync_to_end()
+        self.assertEqual(len(record_ids), len(set(record_ids)))
+        self.assertTrue(set(self.products.ids) <= set(record_ids))
+        
+        self.assertEqual(self._sync(cursor=cursor)['records'], [])
+        
+        self.products[1].name = 'Sync Product renamed'
+        self._backdate('product_product', 'write_date', 1)
+        data = self._sync(cursor=cursor)
+        self.assertIn(self.products[1].id, [record['id'] for record in data['records']])
+    
+    def test_deletions(self):
+        """Test deleted records are returned once after the cursor"""
+        record_ids, deleted_ids, cursor = self._sync_to_end()
+        
+        product_id = self.products[0].id
+        self.products[0].unlink()
+        self._backdate('maki_api_sync_tombstone', 'deleted_at', 1)
+        data = self._sync(cursor=cursor)
+        self.assertEqual(data['deleted'], [product_id])
+        self.assertFalse(data['reset_required'])
+        
+        self.assertEqual(self._sync(cursor=data['next_cursor'])['deleted'], [])
+    
+    def test_purged_tombstones_require_reset(self):
+        """Test a cursor is reset only when tombstones after it have been purged"""
+        record_ids, deleted_ids, cursor = self._sync_to_end()
+        
+        self.products[0].unlink()
+        self._backdate('maki_api_sync_tombstone', 'deleted_at', 60 * 24 * 60)
+        self.env['maki_api.sync_tombstone'].cleanup_old_tombstones(days=30)
+        self.assertTrue(self._sync(cursor=cursor)['reset_required'])
+        
+        # Una carga completa nueva ya no depende de los tombstones purgados
+        record_ids, deleted_ids, cursor = self._sync_to_end()
+        self.assertNotIn(self.products[0].id, record_ids)
+        self.assertFalse(self._sync(cursor=cursor)['reset_required'])
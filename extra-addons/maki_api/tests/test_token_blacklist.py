@@ -117,4 +117,27 @@ class TestTokenBlacklist(TransactionCase):
         self.assertFalse(self.TokenBlacklist.search([('jti', '=', expired_jti)]).exists())
         
         # Verify valid token still exists
-        self.assertTrue(self.TokenBlacklist.search([('jti', '=', valid_jti)]).exists())
\ No newline at end of file
+        self.assertTrue(self.TokenBlacklist.search([('jti', '=', valid_jti)]).exists())
+    
+    def test_cleanup_expired_tokens_in_chunks(self):
+        """Test expired tokens are deleted in chunks and reported in the metrics"""
+        for days in (-3, -2, -1, 1):
+            self.TokenBlacklist.add_token_to_blacklist(
+                jti=str(uuid.uuid4()),
+                user_id=self.test_user.id,
+                token_type='access',
+                expires_at=datetime.now() + timedelta(days=days),
+            )
+        
+        self.assertGreaterEqual(self.TokenBlacklist.get_blacklist_metrics()['expired_rows'], 3)
+        
+        stats = self.TokenBlacklist.cleanup_expired_tokens(batch_size=2)
+        
+        self.assertGreaterEqual(stats['deleted'], 3)
+        self.assertGreaterEqual(stats['batches'], 2)
+        self.assertTrue(stats['finished'])
+        
+        metrics = self.TokenBlacklist.get_blacklist_metrics()
+        self.assertEqual(metrics['expired_rows'], 0)
+        self.assertGreaterEqual(metrics['rows'], 1)
+        self.assertEqual(metrics['last_cleanup']['deleted'], stats['deleted'])
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests.common import TransactionCase, tagged
+
+from odoo.addons.maki_api.tools.token_cache import VerifiedTokenCache
+
+@tagged('post_install', '-at_install')
+class TestTokenCache(TransactionCase):
+    
+    def setUp(self):
+        super(TestTokenCache, self).setUp()
+        self.cache = VerifiedTokenCache(max_size=2, max_staleness=30)
+        self.now = 1000000.0
+        self.payload = {'sub': '1', 'jti': 'abc', 'exp': self.now + 3600}
+    
+    def test_hit_after_put(self):
+        """Test a verified token is served from the cache"""
+        self.assertIsNone(self.cache.get('db', 'token', now=self.now))
+        self.cache.put('db', 'token', self.payload, now=self.now)
+        
+        self.assertEqual(self.cache.get('db', 'token', now=self.now + 1), self.payload)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 1)
+    
+    def test_keyed_by_database(self):
+        """Test the same token is not shared between databases"""
+        self.cache.put('db1', 'token', self.payload, now=self.now)
+        self.assertIsNone(self.cache.get('db2', 'token', now=self.now))
+    
+    def test_staleness_bound(self):
+        """Test entries older than the staleness bound are re-verified"""
+        self.cache.put('db', 'token', self.payload, now=self.now)
+        self.assertIsNone(self.cache.get('db', 'token', now=self.now + 31))
+        self.assertEqual(len(self.cache), 0)
+    
+    def test_token_expiry(self):
+        """Test entries never outlive the token exp claim"""
+        payload = dict(self.payload, exp=self.now + 10)
+        self.cache.put('db', 'token', payload, now=self.now)
+        self.assertIsNone(self.cache.get('db', 'token', now=self.now + 10))
+    
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted at capacity"""
+        self.cache.put('db', 'a', self.payload, now=self.now)
+        self.cache.put('db', 'b', self.payload, now=self.now)
+        self.cache.get('db', 'a', now=self.now)
+        self.cache.put('db', 'c', self.payload, now=self.now)
+        
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNotNone(self.cache.get('db', 'a', now=self.now))
+        self.assertIsNone(self.cache.get('db', 'b', now=self.now))
+    
+    def test_discard(self):
+        """Test a discarded token is no longer served"""
+        self.cache.put('db', 'token', self.payload, now=self.now)
+        self.cache.discard('db', 'token')
+        self.assertIsNone(self.cache.get('db', 'token', now=self.now))
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+import jwt
+import logging
+
+from odoo.tools import config
+
+from .revocation import get_revocation_set
+from .token_cache import VerifiedTokenCache
+
+_logger = logging.getLogger(__name__)
+
+# Cache de tokens verificados por worker. Tamaño y antigüedad máxima se
+# configuran en odoo.conf (maki_api_jwt_cache_size, maki_api_jwt_cache_staleness)
+token_cache = VerifiedTokenCache(
+    max_size=int(config.get('maki_api_jwt_cache_size', 10000)),
+    max_staleness=float(config.get('maki_api_jwt_cache_staleness', 30)),
+)
+
+class JWTAuthError(Exception):
+    """Token válido en formato pero rechazado (revocado, usuario inexistente...)"""
+
+def check_token_epoch(payload, epoch):
+    """Rechazar el token si el usuario no existe, está inactivo o revocó sus tokens
+
+    Los tokens de acceso también se rechazan si el perfil que llevan
+    (grupos, compañías, idioma...) cambió después de emitirlos; el cliente
+    obtiene uno nuevo con su refresh token.
+
+    Args:
+        payload: Payload verificado del token
+        epoch: (active, tokens_valid_after, profile_valid_after) de res.users._get_token_epoch
+    """
+    if epoch is None:
+        raise JWTAuthError('User not found')
+    active, valid_after, profile_valid_after = epoch
+    if not active:
+        raise JWTAuthError('Account is disabled')
+    issued_at = payload.get('iat', 0)
+    if valid_after and issued_at < valid_after:
+        raise JWTAuthError('Token has been revoked')
+    if profile_valid_after and payload.get('type') == 'access' and issued_at < profile_valid_after:
+        raise JWTAuthError('Token profile is outdated')
+
+def get_bearer_token(httprequest):
+    """Extraer el token del header Authorization, o None"""
+    auth_header = httprequest.headers.get('Authorization')
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return None
+    return auth_header.split(' ')[1]
+
+def verify_access_token(env, token):
+    """Verificar un token de acceso y devolver su payload
+    
+    Un acierto en la caché evita la decodificación, la búsqueda de la clave
+    y la comprobación del usuario; las revocaciones y la época de tokens
+    del usuario se consultan en memoria.
+    
+    Raises:
+        jwt.ExpiredSignatureError: El token ha expirado
+        jwt.InvalidTokenError: El token no es válido
+        JWTAuthError: El token ha sido revocado o el usuario no existe
+    """
+    dbname = env.cr.dbname
+    payload = token_cache.get(dbname, token)
+    if payload is not None:
+        # Los aciertos también consultan las revocaciones, pero solo en
+        # memoria; si el conjunto no está listo vale la antigüedad máxima
+        revocation_set = get_revocation_set(dbname)
+        if revocation_set.ready:
+            try:
+                if 'jti' in payload and revocation_set.is_revoked(payload['jti']):
+                    raise JWTAuthError('Token has been revoked')
+                epoch = revocation_set.get_epoch(int(payload['sub']))
+                if epoch is not None:
+                    check_token_epoch(payload, epoch)
+            except JWTAuthError:
+                token_cache.discard(dbname, token)
+                raise
+        return payload
+    
+    # First decode without verification to get the jti
+    unverified_payload = jwt.decode(token, options={"verify_signature": False})
+    
+    # Check if token is blacklisted
+    if 'jti' in unverified_payload:
+        blacklist_model = env['maki_api.token_blacklist'].sudo()
+        if blacklist_model.is_blacklisted(unverified_payload['jti']):
+            raise JWTAuthError('Token has been revoked')
+    
+    # Decode and verify the token with the key named by its kid
+    payload = env['maki_api.jwt_keys'].sudo().decode_token(token)
+    
+    # Check the user exists and is active, and the token is newer than its epoch
+    user_id = int(payload.get('sub'))
+    check_token_epoch(payload, env['res.users'].sudo()._get_token_epoch(user_id))
+    
+    token_cache.put(dbname, token, payload)
+    return payload
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import re
+import json
+from functools import lru_cache
+
+from odoo.tools import config
+
+# Claves cuyo valor nunca se guarda en los logs (búsqueda sin distinguir mayúsculas)
+SENSITIVE_KEYS = re.compile(r'password|token|secret|key|auth|credit_card', re.IGNORECASE)
+REDACTED = '***REDACTED***'
+
+class PayloadRedactor:
+    """Redact and truncate logged payloads in a single walk
+    
+    The structure is walked once, building the redacted copy directly (the
+    original is never modified, so it can still be in use by the request).
+    Sensitive keys are matched by one precompiled regex, memoized per key
+    name. The walk stops adding content once about ``max_size`` characters
+    are collected: long strings are cut at ``max_string`` and the rest of
+    a truncated dict or list is replaced by a marker, so the result stays
+    valid JSON. Strings much larger than the cap are not even parsed.
+    """
+    
+    def __init__(self, pattern=SENSITIVE_KEYS, max_size=8192, max_string=1024, max_depth=10):
+        self.max_size = max_size
+        self.max_string = max_string
+        self.max_depth = max_depth
+        self.is_sensitive = lru_cache(maxsize=4096)(lambda key: bool(pattern.search(key)))
+    
+    def redact(self, data):
+        """JSON text of data without sensitive values, or None if it cannot be logged"""
+        if data is None or data == '' or data == b'':
+            return None
+        if isinstance(data, bytes):
+            data = data.decode('utf-8', errors='replace')
+        if isinstance(data, str):
+            if len(data) > self.max_size * 16:
+                return json.dumps({'__truncated__': True, 'size': len(data)})
+            try:
+                data = json.loads(data)
+            except ValueError:
+                # Texto que no es JSON (formularios, etc.): no se puede redactar
+                return None
+        
+        budget = [self.max_size]
+        return json.dumps(self._walk(data, 0, budget), separators=(',', ':'), default=str)
+    
+    def _walk(self, value, depth, budget):
+        if isinstance(value, dict):
+            if depth >= self.max_depth:
+                budget[0] -= 5
+                return '...'
+            result = {}
+            for key, item in value.items():
+                if budget[0] <= 0:
+                    result['__truncated__'] = True
+                    break
+                key = str(key)
+                budget[0] -= len(key) + 4
+                if self.is_sensitive(key):
+                    result[key] = REDACTED
+                    budget[0] -= len(REDACTED)
+                else:
+                    result[key] = self._walk(item, depth + 1, budget)
+            return result
+        
+        if isinstance(value, (list, tuple)):
+            if depth >= self.max_depth:
+                budget[0] -= 5
+                return '...'
+            result = []
+            for index, item in enumerate(value):
+                if budget[0] <= 0:
+                    result.append(f'... {len(value) - index} more items')
+                    break
+                result.append(self._walk(item, depth + 1, budget))
+                budget[0] -= 1
+            return result
+        
+        if value is None or isinstance(value, (bool, int, float)):
+            budget[0] -= 6
+            return value
+        
+        if not isinstance(value, str):
+            value = str(value)
+        if len(value) > self.max_string:
+            value = value[:self.max_string] + '...'
+        budget[0] -= len(value) + 2
+        return value
+
+# Tamaño máximo aproximado (caracteres) de cada payload guardado, en odoo.conf
+payload_redactor = PayloadRedactor(max_size=int(config.get('maki_api_log_payload_max_size', 8192)))
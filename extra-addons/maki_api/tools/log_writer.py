@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import atexit
+import logging
+import threading
+from collections import deque
+
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest')
+
+class APILogWriter:
+    """Per-worker bounded queue of API calls, written to maki_api.log in batches
+    
+    Requests only append their entry to the queue; a background thread
+    sanitizes and writes the queue every ``interval`` seconds (or as soon
+    as ``batch_size`` entries are waiting) with one multi-row INSERT per
+    batch, on its own cursor. When the queue is full the oldest entry is
+    dropped (``drop_oldest``) or the new one is discarded (``drop_newest``),
+    so logging can never hold up or exhaust the memory of a worker. Entries
+    of a failed write are retried up to ``max_attempts`` times, then dropped.
+    """
+    
+    def __init__(self, max_size=10000, batch_size=500, interval=2.0, overflow='drop_oldest', max_attempts=3):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow}, expected one of {OVERFLOW_POLICIES}")
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.interval = interval
+        self.overflow = overflow
+        self.max_attempts = max_attempts
+        self.metrics = {
+            'enqueued': 0,
+            'written': 0,
+            'dropped': 0,
+            'failed_batches': 0,
+            'batches': 0,
+            'last_batch_duration': 0.0,
+        }
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+    
+    def enqueue(self, dbname, entry):
+        """Queue a log entry; returns False if it was dropped because the queue is full"""
+        with self._lock:
+            if len(self._queue) >= self.max_size:
+                self.metrics['dropped'] += 1
+                if self.overflow == 'drop_newest':
+                    return False
+                self._queue.popleft()
+            self._queue.append((dbname, entry, 0))
+            self.metrics['enqueued'] += 1
+            batch_ready = len(self._queue) >= self.batch_size
+        
+        self._ensure_started()
+        if batch_ready:
+            self._wakeup.set()
+        return True
+    
+    def _ensure_started(self):
+        # Los hilos no sobreviven al fork de los workers: uno por proceso
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._thread = threading.Thread(
+                        target=self._run, name='maki_api.log_writer', daemon=True
+                    )
+                    self._thread.start()
+                    self._pid = pid
+    
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+    
+    def flush(self):
+        """Write every queued entry, ``batch_size`` rows per INSERT
+        
+        A failed write does not stop the entries of the other databases in
+        the batch. Its entries go back to the head of the queue (as far as
+        they fit) and the flush stops until the next interval; after
+        ``max_attempts`` failed writes they are dropped, so a batch that
+        can never be written does not block the queue.
+        """
+        while True:
+            with self._lock:
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            if not batch:
+                return
+            
+            items_by_db = {}
+            for item in batch:
+                items_by_db.setdefault(item[0], []).append(item)
+            
+            failed = []
+            for dbname, items in items_by_db.items():
+                start = time.perf_counter()
+                try:
+                    self._write(dbname, [entry for _dbname, entry, _attempts in items])
+                except Exception as e:
+                    _logger.warning(f"Could not write {len(items)} API log entries in {dbname}: {e}")
+                    self.metrics['failed_batches'] += 1
+                    failed.extend(items)
+                    continue
+                self.metrics['written'] += len(items)
+                self.metrics['batches'] += 1
+                self.metrics['last_batch_duration'] = time.perf_counter() - start
+            
+            if failed:
+                self._requeue(failed)
+                return
+    
+    def _requeue(self, items):
+        """Put failed entries back at the head of the queue, dropping those out of attempts or room"""
+        retry = [(dbname, entry, attempts + 1) for dbname, entry, attempts in items if attempts + 1 < self.max_attempts]
+        if len(retry) < len(items):
+            _logger.error(f"Dropping {len(items) - len(retry)} API log entries after {self.max_attempts} failed writes")
+        with self._lock:
+            room = max(0, self.max_size - len(self._queue))
+            kept = retry[-room:] if room else []
+            self.metrics['dropped'] += len(items) - len(kept)
+            self._queue.extendleft(reversed(kept))
+    
+    def _write(self, dbname, entries):
+        import odoo
+        from odoo import api, SUPERUSER_ID
+        
+        with odoo.registry(dbname).cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            env['maki_api.log']._write_log_batch(entries)
+    
+    def get_metrics(self):
+        """Counters of this worker, plus the current queue size"""
+        with self._lock:
+            return dict(self.metrics, queued=len(self._queue))
+    
+    def __len__(self):
+        return len(self._queue)
+
+# Configurable en odoo.conf (maki_api_log_queue_size, maki_api_log_batch_size,
+# maki_api_log_flush_interval, maki_api_log_overflow, maki_api_log_max_attempts)
+log_writer = APILogWriter(
+    max_size=int(config.get('maki_api_log_queue_size', 10000)),
+    batch_size=int(config.get('maki_api_log_batch_size', 500)),
+    interval=float(config.get('maki_api_log_flush_interval', 2)),
+    overflow=config.get('maki_api_log_overflow', 'drop_oldest'),
+    max_attempts=int(config.get('maki_api_log_max_attempts', 3)),
+)
+
+# Best effort: no perder las llamadas pendientes al parar el servidor
+atexit.register(log_writer.flush)
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import atexit
+import logging
+import threading
+from datetime import datetime
+
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+class LoginTracker:
+    """Per-worker buffer of successful logins, written to res_users_log in batches
+    
+    Logins are recorded in memory and flushed by a background thread every
+    ``interval`` seconds with one INSERT per database, so authenticating
+    never waits on (or locks) the users' rows. Several logins of the same
+    user within an interval are stored once, with the latest date.
+    """
+    
+    def __init__(self, interval=5.0):
+        self.interval = interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+    
+    def track(self, dbname, user_id, login_date=None):
+        """Record a login; it is written to the database within ``interval`` seconds"""
+        login_date = login_date or datetime.utcnow().replace(microsecond=0)
+        with self._lock:
+            self._pending.setdefault(dbname, {})[user_id] = login_date
+        self._ensure_started()
+    
+    def _ensure_started(self):
+        # Los hilos no sobreviven al fork de los workers: uno por proceso
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._thread = threading.Thread(
+                        target=self._run, name='maki_api.login_tracker', daemon=True
+                    )
+                    self._thread.start()
+                    self._pid = pid
+    
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+    
+    def flush(self):
+        """Write every pending login; logins of a failed database are kept for the next flush"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        
+        for dbname, logins in pending.items():
+            try:
+                self._write(dbname, logins)
+            except Exception as e:
+                _logger.warning(f"Could not record {len(logins)} logins in {dbname}: {e}")
+                with self._lock:
+                    retry = self._pending.setdefault(dbname, {})
+                    for user_id, login_date in logins.items():
+                        retry.setdefault(user_id, login_date)
+    
+    def _write(self, dbname, logins):
+        import odoo.sql_db
+        from psycopg2.extras import execute_values
+        
+        with odoo.sql_db.db_connect(dbname).cursor() as cr:
+            execute_values(cr._obj, """
+                INSERT INTO res_users_log (create_uid, create_date, write_uid, write_date)
+                VALUES %s
+            """, [
+                (user_id, login_date, user_id, login_date)
+                for user_id, login_date in logins.items()
+            ])
+    
+    def __len__(self):
+        return sum(len(logins) for logins in self._pending.values())
+
+# Intervalo de escritura configurable en odoo.conf (maki_api_login_flush_interval)
+login_tracker = LoginTracker(interval=float(config.get('maki_api_login_flush_interval', 5)))
+
+# Best effort: no perder los logins pendientes al parar el servidor
+atexit.register(login_tracker.flush)
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import json
+import time
+import fcntl
+import logging
+import threading
+from bisect import bisect_left
+
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+# Límites superiores (segundos) de los histogramas de duración
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+# Tipo y descripción de cada métrica expuesta en /api/v1/metrics
+METRICS = {
+    'maki_api_request_duration_seconds': ('histogram', 'Duration of API calls'),
+    'maki_api_db_queries_total': ('counter', 'SQL queries run by API calls'),
+    'maki_api_rate_limit_rejections_total': ('counter', 'Requests rejected by the rate limiter'),
+    'maki_api_token_cache_hits_total': ('counter', 'Access tokens served from the verified token cache'),
+    'maki_api_token_cache_misses_total': ('counter', 'Access tokens fully verified'),
+    'maki_api_token_cache_entries': ('gauge', 'Verified tokens cached'),
+    'maki_api_rate_limit_keys': ('gauge', 'Keys tracked by the in-memory rate limiter'),
+    'maki_api_log_queue_entries': ('gauge', 'API calls waiting to be written to maki_api.log'),
+    'maki_api_log_written_total': ('counter', 'API calls written to maki_api.log'),
+    'maki_api_log_dropped_total': ('counter', 'API calls dropped because the log queue was full'),
+    'maki_api_log_failed_batches_total': ('counter', 'Failed maki_api.log batch writes'),
+    'maki_api_token_blacklist_rows': ('gauge', 'Rows of the token blacklist'),
+    'maki_api_token_blacklist_expired_rows': ('gauge', 'Expired rows of the token blacklist awaiting cleanup'),
+    'maki_api_token_blacklist_bytes': ('gauge', 'Size of the token blacklist table'),
+}
+
+WORKER_FILE = re.compile(r'^worker_(\d+)\.json$')
+ARCHIVE_FILE = 'archive.json'
+
+class MetricsRegistry:
+    """Per-worker counters and histograms, aggregated across prefork workers through files
+    
+    Recording only updates dictionaries of the worker. A background thread
+    writes them every ``interval`` seconds to ``<directory>/worker_<pid>.json``
+    (the worker serving a scrape writes its own first), and a scrape sums
+    the files of every worker. The files of dead workers are folded into
+    ``archive.json``, so counters keep growing when workers are recycled.
+    Collectors add values owned by other components (token cache, log
+    writer...) at write time.
+    """
+    
+    def __init__(self, directory, interval=10.0):
+        self.directory = directory
+        self.interval = interval
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+    
+    def inc(self, name, labels=(), value=1):
+        """Add value to a counter; labels is a tuple of (name, value) pairs"""
+        self._ensure_started()
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+    
+    def observe(self, name, labels, value):
+        """Record a value (seconds) in a DURATION_BUCKETS histogram"""
+        self._ensure_started()
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(DURATION_BUCKETS), 0.0]
+            histogram[0][bisect_left(DURATION_BUCKETS, value)] += 1
+            histogram[1] += value
+    
+    def register_collector(self, collector):
+        """Add a callable returning (name, labels, kind, value) tuples of this worker"""
+        self._collectors.append(collector)
+    
+    def _ensure_started(self):
+        # Los hilos no sobreviven al fork de los workers: uno por proceso
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    # Lo heredado del proceso padre ya lo cuenta el padre
+                    self._counters.clear()
+                    self._histograms.clear()
+                    self._thread = threading.Thread(
+                        target=self._run, name='maki_api.metrics', daemon=True
+                    )
+                    self._thread.start()
+                    self._pid = pid
+    
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.write()
+            except Exception as e:
+                _logger.warning(f"Could not write the API metrics of worker {os.getpid()}: {e}")
+    
+    def snapshot(self):
+        """Metrics of this worker, as stored in its file"""
+        with self._lock:
+            counters = [[name, labels, value] for (name, labels), value in self._counters.items()]
+            histograms = [
+                [name, labels, list(buckets), total]
+                for (name, labels), (buckets, total) in self._histograms.items()
+            ]
+        gauges = []
+        for collector in self._collectors:
+            try:
+                for name, labels, kind, value in collector():
+                    (counters if kind == 'counter' else gauges).append([name, labels, value])
+            except Exception as e:
+                _logger.warning(f"API metrics collector {collector} failed: {e}")
+        return {'counters': counters, 'histograms': histograms, 'gauges': gauges}
+    
+    def write(self):
+        """Write the metrics of this worker to its file (atomically)"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'worker_{os.getpid()}.json')
+        with open(f'{path}.tmp', 'w') as snapshot_file:
+            json.dump(self.snapshot(), snapshot_file)
+        os.replace(f'{path}.tmp', path)
+    
+    def collect(self):
+        """Sum of the metrics of every worker, live or dead
+        
+        Returns:
+            dict: {'counters': {key: value}, 'histograms': {key: [buckets, sum]}, 'gauges': {key: value}}
+        """
+        self.write()
+        totals = {'counters': {}, 'histograms': {}, 'gauges': {}}
+        with open(os.path.join(self.directory, 'archive.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            archive = self._read(ARCHIVE_FILE) or {'counters': [], 'histograms': [], 'gauges': []}
+            dead = []
+            for filename in os.listdir(self.directory):
+                match = WORKER_FILE.match(filename)
+                if not match:
+                    continue
+                snapshot = self._read(filename)
+                if snapshot is None:
+                    continue
+                if self._is_alive(int(match.group(1))):
+                    self._merge(totals, snapshot, gauges=True)
+                else:
+                    self._merge_into_archive(archive, snapshot)
+                    dead.append(filename)
+            if dead:
+                with open(os.path.join(self.directory, f'{ARCHIVE_FILE}.tmp'), 'w') as archive_file:
+                    json.dump(archive, archive_file)
+                os.replace(os.path.join(self.directory, f'{ARCHIVE_FILE}.tmp'), os.path.join(self.directory, ARCHIVE_FILE))
+                for filename in dead:
+                    os.remove(os.path.join(self.directory, filename))
+        self._merge(totals, archive, gauges=False)
+        return totals
+    
+    def _read(self, filename):
+        try:
+            with open(os.path.join(self.directory, filename)) as snapshot_file:
+                return json.load(snapshot_file)
+        except (OSError, ValueError):
+            return None
+    
+    @staticmethod
+    def _is_alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+    
+    @staticmethod
+    def _merge(totals, snapshot, gauges):
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            totals['counters'][key] = totals['counters'].get(key, 0) + value
+        for name, labels, buckets, total in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            histogram = totals['histograms'].setdefault(key, [[0] * len(DURATION_BUCKETS), 0.0])
+            histogram[0] = [current + added for current, added in zip(histogram[0], buckets)]
+            histogram[1] += total
+        if gauges:
+            for name, labels, value in snapshot['gauges']:
+                key = (name, tuple(map(tuple, labels)))
+                totals['gauges'][key] = totals['gauges'].get(key, 0) + value
+    
+    @classmethod
+    def _merge_into_archive(cls, archive, snapshot):
+        # Los gauges de un worker muerto ya no significan nada: solo contadores e histogramas
+        totals = {'counters': {}, 'histograms': {}, 'gauges': {}}
+        cls._merge(totals, archive, gauges=False)
+        cls._merge(totals, snapshot, gauges=False)
+        archive['counters'] = [[name, labels, value] for (name, labels), value in totals['counters'].items()]
+        archive['histograms'] = [
+            [name, labels, buckets, total] for (name, labels), (buckets, total) in totals['histograms'].items()
+        ]
+        archive['gauges'] = []
+    
+    def render(self, extra_gauges=()):
+        """Prometheus text exposition of the metrics of every worker
+        
+        Args:
+            extra_gauges: (name, labels, value) tuples computed by the caller
+        """
+        totals = self.collect()
+        for name, labels, value in extra_gauges:
+            totals['gauges'][(name, labels)] = value
+        
+        samples = {}
+        for kind in ('counters', 'gauges'):
+            for (name, labels), value in sorted(totals[kind].items()):
+                samples.setdefault(name, []).append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        for (name, labels), (buckets, total) in sorted(totals['histograms'].items()):
+            lines = samples.setdefault(name, [])
+            cumulative = 0
+            for upper, count in zip(DURATION_BUCKETS, buckets):
+                cumulative += count
+                le = '+Inf' if upper == float('inf') else _format_value(upper)
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", le),))} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(total)}')
+            lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+        
+        output = []
+        for name in sorted(samples):
+            kind, description = METRICS.get(name, ('untyped', name))
+            output.append(f'# HELP {name} {description}')
+            output.append(f'# TYPE {name} {kind}')
+            output.extend(samples[name])
+        return '\n'.join(output) + '\n'
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label_value(value)}"' for name, value in labels) + '}'
+
+def _escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+def _worker_collector():
+    """Counters and sizes kept by other components of this worker"""
+    from .jwt_auth import token_cache
+    from .log_writer import log_writer
+    from .rate_limiter import _fallback
+    
+    log_metrics = log_writer.get_metrics()
+    return [
+        ('maki_api_token_cache_hits_total', (), 'counter', token_cache.hits),
+        ('maki_api_token_cache_misses_total', (), 'counter', token_cache.misses),
+        ('maki_api_token_cache_entries', (), 'gauge', len(token_cache)),
+        ('maki_api_rate_limit_keys', (), 'gauge', len(_fallback.limiter)),
+        ('maki_api_log_queue_entries', (), 'gauge', log_metrics['queued']),
+        ('maki_api_log_written_total', (), 'counter', log_metrics['written']),
+        ('maki_api_log_dropped_total', (), 'counter', log_metrics['dropped']),
+        ('maki_api_log_failed_batches_total', (), 'counter', log_metrics['failed_batches']),
+    ]
+
+# Directorio compartido por los workers del servidor (maki_api_metrics_dir en odoo.conf)
+metrics = MetricsRegistry(
+    directory=config.get('maki_api_metrics_dir') or os.path.join(config['data_dir'], 'maki_api_metrics'),
+    interval=float(config.get('maki_api_metrics_interval', 10)),
+)
+metrics.register_collector(_worker_collector)
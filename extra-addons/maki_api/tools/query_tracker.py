@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import threading
+from collections import Counter
+
+from odoo.tools import config
+
+# Repeticiones de una misma consulta a partir de las que se marca un N+1 (odoo.conf)
+N_PLUS_ONE_THRESHOLD = int(config.get('maki_api_n_plus_one_threshold', 10))
+
+class QueryTracker:
+    """Count the SQL statements run by the current thread while active
+    
+    Registers a hook in the thread's ``query_hooks`` (called by the Odoo
+    cursor after each statement, as the profiler does), so it sees every
+    query of the request whatever cursor runs it. Statements are grouped
+    by shape, i.e. their SQL text before parameters are bound: the same
+    shape run ``threshold`` times or more is reported as a likely N+1.
+    
+    Usage::
+        
+        with QueryTracker() as tracker:
+            ...
+        tracker.count, tracker.time, tracker.n_plus_one
+    """
+    
+    def __init__(self, threshold=N_PLUS_ONE_THRESHOLD):
+        self.threshold = threshold
+        self.count = 0
+        self.time = 0.0
+        self.shapes = Counter()
+        self._thread = None
+    
+    def hook(self, cr, query, params, start, delay):
+        self.count += 1
+        self.time += delay
+        self.shapes[query if isinstance(query, str) else str(query)] += 1
+    
+    def __enter__(self):
+        self._thread = threading.current_thread()
+        if getattr(self._thread, 'query_hooks', None) is None:
+            self._thread.query_hooks = []
+        self._thread.query_hooks.append(self.hook)
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._thread.query_hooks.remove(self.hook)
+    
+    @property
+    def repeated(self):
+        """(shape, count) of the shapes run at least ``threshold`` times, most repeated first"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= self.threshold]
+    
+    @property
+    def n_plus_one(self):
+        return bool(self.repeated)
+    
+    def header(self):
+        """Value of the X-Maki-Queries debug header"""
+        max_repeat = self.shapes.most_common(1)[0][1] if self.shapes else 0
+        return (
+            f'count={self.count}; time_ms={self.time * 1000:.2f}; '
+            f'max_repeat={max_repeat}; n_plus_one={int(self.n_plus_one)}'
+        )
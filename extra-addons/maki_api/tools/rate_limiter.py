@@ -0,0 +1,400 @@
+# -*- coding: utf-8 -*-
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+class SlidingWindowLimiter:
+    """Sliding window counter rate limiter with constant memory per key
+    
+    Each key keeps the request counts of the current and the previous fixed
+    window; the requests in the sliding window are estimated by weighting
+    the previous count with the part of it still inside the sliding window.
+    A check is O(1) whatever the number of requests or keys.
+    
+    Keys are kept in LRU order: beyond ``max_keys`` the least recently used
+    key is dropped, and keys idle for two windows (whose counts no longer
+    matter) are dropped as new checks come in.
+    """
+    
+    # Claves inactivas revisadas por llamada, para que la expiración sea O(1)
+    EVICTION_STEPS = 2
+    
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def hit(self, key, limit, window, now=None):
+        """Count a request for key if it is within the limit
+        
+        Rejected requests are not counted.
+        
+        Returns:
+            tuple: (allowed, estimated requests in the window, seconds until the next window)
+        """
+        now = now or time.time()
+        index = int(now // window)
+        elapsed = now - index * window
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[3] != window or entry[0] < index - 1:
+                current, previous = 0, 0
+            elif entry[0] == index - 1:
+                current, previous = 0, entry[1]
+            else:
+                current, previous = entry[1], entry[2]
+            
+            estimated = previous * (window - elapsed) / window + current
+            allowed = estimated < limit
+            if allowed:
+                current += 1
+                estimated += 1
+            
+            self._entries[key] = (index, current, previous, window, now)
+            self._entries.move_to_end(key)
+            self._evict(now)
+        
+        return allowed, int(estimated), window - elapsed
+    
+    def _evict(self, now):
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+        for _ in range(self.EVICTION_STEPS):
+            if not self._entries:
+                break
+            key, entry = next(iter(self._entries.items()))
+            if now - entry[4] < 2 * entry[3]:
+                break
+            del self._entries[key]
+    
+    def reset(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+    
+    def __len__(self):
+        return len(self._entries)
+
+class MemoryBackend:
+    """Per-worker limiter: with N workers the effective limit is N times the configured one"""
+    
+    name = 'memory'
+    
+    def __init__(self, max_keys=100000):
+        self.limiter = SlidingWindowLimiter(max_keys=max_keys)
+    
+    def hit(self, env, key, limit, window):
+        return self.limiter.hit(key, limit, window)
+
+class CircuitOpenError(Exception):
+    """The backend is considered down; the check is not attempted"""
+
+class CircuitBreaker:
+    """Stop calling a failing backend for a while
+    
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls fail immediately for ``reset_timeout`` seconds. Then one trial
+    call is let through (half open): success closes the circuit, failure
+    opens it again.
+    """
+    
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+    
+    def allow(self):
+        """Whether a call may be attempted; in half open state only one caller gets through"""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            # Half open: el resto de llamadas sigue rechazado hasta que termine la prueba
+            self.opened_at = time.monotonic()
+            return True
+    
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+class RedisBackend:
+    """Cluster-wide sliding window counter in Redis, one atomic Lua script per check
+    
+    Uses the same algorithm as SlidingWindowLimiter with one counter key per
+    fixed window, expiring after two windows. The client and its connection
+    pool live as long as the backend (one per worker and URL); short
+    timeouts and a circuit breaker bound what a Redis outage costs a request.
+    """
+    
+    name = 'redis'
+    
+    # Cuenta ARGV[4] peticiones de golpe, solo si caben todas en el límite
+    SCRIPT = """
+        local limit = tonumber(ARGV[1])
+        local window = tonumber(ARGV[2])
+        local elapsed = tonumber(ARGV[3])
+        local count = tonumber(ARGV[4])
+        local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+        local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+        local estimated = previous * (window - elapsed) / window + current
+        if estimated + count > limit then
+            return {0, math.floor(estimated)}
+        end
+        if redis.call('INCRBY', KEYS[1], count) == count then
+            redis.call('EXPIRE', KEYS[1], window * 2)
+        end
+        return {1, math.floor(estimated + count)}
+    """
+    
+    RELEASE_SCRIPT = """
+        if redis.call('EXISTS', KEYS[1]) == 0 then
+            return 0
+        end
+        local value = redis.call('DECRBY', KEYS[1], ARGV[1])
+        if value < 0 then
+            redis.call('INCRBY', KEYS[1], -value)
+        end
+        return 1
+    """
+    
+    def __init__(self, url=None, client=None, prefix='maki_api:rl:', breaker=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(
+                url,
+                socket_timeout=float(config.get('maki_api_redis_timeout', 0.1)),
+                socket_connect_timeout=float(config.get('maki_api_redis_connect_timeout', 0.1)),
+                max_connections=int(config.get('maki_api_redis_max_connections', 20)),
+                health_check_interval=30,
+            )
+        self.client = client
+        self.prefix = prefix
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=int(config.get('maki_api_redis_failure_threshold', 5)),
+            reset_timeout=float(config.get('maki_api_redis_reset_timeout', 30)),
+        )
+        self._script = client.register_script(self.SCRIPT)
+        self._release_script = client.register_script(self.RELEASE_SCRIPT)
+    
+    def close(self):
+        self.client.connection_pool.disconnect()
+    
+    def _call(self, script, keys, args):
+        if not self.breaker.allow():
+            raise CircuitOpenError('Redis circuit is open')
+        try:
+            result = script(keys=keys, args=args)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
+    
+    def acquire(self, env, key, limit, window, count, now=None):
+        """Count ``count`` requests at once if they all fit in the limit"""
+        now = now or time.time()
+        index = int(now // window)
+        elapsed = now - index * window
+        base = f'{self.prefix}{key}:{window}:'
+        allowed, hits = self._call(
+            self._script, [f'{base}{index}', f'{base}{index - 1}'], [limit, window, elapsed, count]
+        )
+        return bool(allowed), int(hits), window - elapsed
+    
+    def hit(self, env, key, limit, window, now=None):
+        return self.acquire(env, key, limit, window, 1, now=now)
+    
+    def release(self, env, key, window, index, count):
+        """Give back ``count`` unused requests of window ``index``"""
+        self._call(self._release_script, [f'{self.prefix}{key}:{window}:{index}'], [count])
+
+class PostgresBackend:
+    """Cluster-wide sliding window counter in an UNLOGGED Postgres table
+    
+    Each check is one UPSERT on a cursor of its own (see
+    maki_api.rate_limit._check_rate_limit_db), outside the request transaction.
+    """
+    
+    name = 'postgres'
+    
+    def acquire(self, env, key, limit, window, count):
+        allowed, hits, _limit = env['maki_api.rate_limit'].sudo()._check_rate_limit_db(
+            key, limit=limit, window=window, count=count
+        )
+        return allowed, hits, window - time.time() % window
+    
+    def hit(self, env, key, limit, window):
+        return self.acquire(env, key, limit, window, 1)
+    
+    def release(self, env, key, window, index, count):
+        env['maki_api.rate_limit'].sudo()._release_rate_limit_db(key, window, index, count)
+
+class LeasedBackend:
+    """Two-level limiter: leases batches of the shared quota and spends them locally
+    
+    A check that finds no local tokens leases ``batch`` requests at once
+    from the shared backend (counted there immediately, so the limit is
+    never exceeded) and serves the next checks of the key from memory. With
+    a batch of ``limit * tolerance`` requests, the shared store sees one
+    round trip every batch checks, at the cost of other workers possibly
+    being refused up to that many requests per worker before the window
+    ends. Unused tokens are given back when a lease expires: leases of
+    every key are swept at most once per ``lease_ttl``, and a lease evicted
+    from the LRU is given back at once. Near the limit, when a whole batch
+    no longer fits, checks fall back to one request per round trip.
+    """
+    
+    def __init__(self, shared, tolerance=0.1, lease_ttl=5.0, max_keys=100000):
+        self.shared = shared
+        self.name = f'leased_{shared.name}'
+        self.tolerance = tolerance
+        self.lease_ttl = lease_ttl
+        self.max_keys = max_keys
+        self._leases = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+    
+    def close(self):
+        if hasattr(self.shared, 'close'):
+            self.shared.close()
+    
+    def hit(self, env, key, limit, window, now=None):
+        now = now or time.time()
+        index = int(now // window)
+        released = []
+        
+        with self._lock:
+            if now >= self._next_sweep:
+                released = self._pop_expired(now)
+                self._next_sweep = now + self.lease_ttl
+            lease = self._leases.get(key)
+            if lease is not None:
+                lease_window, lease_index, tokens, expires_at, hits = lease
+                if lease_window == window and lease_index == index and expires_at > now and tokens > 0:
+                    self._leases[key] = (lease_window, lease_index, tokens - 1, expires_at, hits)
+                    self._leases.move_to_end(key)
+                    self._release(env, released)
+                    return True, hits, window - (now - index * window)
+                del self._leases[key]
+                released.append((key, lease))
+        self._release(env, released)
+        
+        batch = max(1, int(limit * self.tolerance))
+        allowed, hits, reset_after = self.shared.acquire(env, key, limit, window, batch)
+        if not allowed and batch > 1 and hits + 1 <= limit:
+            batch = 1
+            allowed, hits, reset_after = self.shared.acquire(env, key, limit, window, 1)
+        
+        if allowed and batch > 1:
+            evicted = []
+            with self._lock:
+                self._leases[key] = (window, index, batch - 1, min(now + self.lease_ttl, (index + 1) * window), hits)
+                self._leases.move_to_end(key)
+                while len(self._leases) > self.max_keys:
+                    evicted.append(self._leases.popitem(last=False))
+            self._release(env, evicted)
+        return allowed, hits, reset_after
+    
+    def _pop_expired(self, now):
+        """Remove and return the (key, lease) pairs that have expired (called with the lock held)"""
+        expired = [(key, lease) for key, lease in self._leases.items() if lease[3] <= now]
+        for key, _lease in expired:
+            del self._leases[key]
+        return expired
+    
+    def _release(self, env, leases):
+        """Give the unused tokens of (key, lease) pairs back to the shared backend"""
+        for key, (window, index, tokens, _expires_at, _hits) in leases:
+            if tokens <= 0:
+                continue
+            try:
+                self.shared.release(env, key, window, index, tokens)
+            except Exception as e:
+                _logger.warning(f"Could not release {tokens} leased requests of {key}: {e}")
+
+# Backend del worker, creado una vez y reconstruido si cambia la configuración
+_backend = {'config': None, 'backend': None}
+_backend_lock = threading.Lock()
+_fallback = MemoryBackend(max_keys=int(config.get('maki_api_rate_limit_max_keys', 100000)))
+_last_failure_log = [0.0]
+
+def get_rate_limit_backend(env):
+    """Backend configured in ir.config_parameter (maki_api.rate_limit_backend)
+    
+    memory (default), redis (needs maki_api.redis_url) or postgres. With
+    maki_api.rate_limit_lease_tolerance > 0 (e.g. 0.1) the shared backends
+    are wrapped in a LeasedBackend. The parameters are ormcached, so this
+    costs no query per request.
+    """
+    ICP = env['ir.config_parameter'].sudo()
+    name = ICP.get_param('maki_api.rate_limit_backend', 'memory')
+    url = ICP.get_param('maki_api.redis_url') if name == 'redis' else None
+    tolerance = float(ICP.get_param('maki_api.rate_limit_lease_tolerance', 0) or 0)
+    current_config = (name, url, tolerance)
+    if _backend['config'] == current_config:
+        return _backend['backend']
+    
+    with _backend_lock:
+        if _backend['config'] != current_config:
+            previous = _backend['backend']
+            if name == 'redis':
+                backend = RedisBackend(url)
+            elif name == 'postgres':
+                backend = PostgresBackend()
+            else:
+                backend = _fallback
+            if tolerance > 0 and backend is not _fallback:
+                backend = LeasedBackend(
+                    backend,
+                    tolerance=tolerance,
+                    lease_ttl=float(ICP.get_param('maki_api.rate_limit_lease_ttl', 5)),
+                )
+            _backend['backend'], _backend['config'] = backend, current_config
+            if previous is not None and hasattr(previous, 'close'):
+                previous.close()
+        return _backend['backend']
+
+def check_rate_limit(env, key, limit, window):
+    """Count a request in the configured backend
+    
+    If the backend fails, or its circuit is open, the per-worker memory
+    limiter is used instead, so the API keeps working (with a looser limit)
+    while it is unavailable.
+    
+    Returns:
+        tuple: (allowed, estimated requests in the window, seconds until the next window)
+    """
+    try:
+        return get_rate_limit_backend(env).hit(env, key, limit, window)
+    except Exception as e:
+        now = time.time()
+        if now - _last_failure_log[0] > 60:
+            _last_failure_log[0] = now
+            _logger.warning(f"Rate limit backend failed, using the in-memory limiter: {e}")
+        return _fallback.hit(env, key, limit, window)
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import math
+import time
+import select
+import hashlib
+import logging
+import threading
+
+_logger = logging.getLogger(__name__)
+
+# Canal de Postgres por el que se anuncian las revocaciones a todos los workers
+REVOCATION_CHANNEL = 'maki_api_token_revoked'
+
+# Cada cuánto se recarga el conjunto completo (purga expirados y reconstruye el Bloom)
+RELOAD_INTERVAL = 300
+
+class BloomFilter:
+    """Bloom filter over strings, used as the negative fast path of RevocationSet
+    
+    Uses double hashing over a single BLAKE2b digest to derive the k bit
+    positions. False positives fall through to the exact set; there are no
+    false negatives.
+    """
+    
+    def __init__(self, capacity=100000, error_rate=0.001):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self._bits = bytearray((self.size + 7) // 8)
+    
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+    
+    def add(self, item):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+    
+    def __contains__(self, item):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+class RevocationSet:
+    """Revoked token ids and per-user token epochs of one database, held in memory by each worker
+    
+    ``ready`` is only true while the LISTEN connection is up and the set was
+    loaded after it started listening, i.e. while the set is known to be
+    complete. Callers must fall back to the database otherwise.
+    """
+    
+    def __init__(self, dbname):
+        self.dbname = dbname
+        self.ready = False
+        self._revoked = {}
+        self._bloom = BloomFilter()
+        self._epochs = {}
+        self._epochs_version = 0
+        self._lock = threading.Lock()
+    
+    def load(self, entries):
+        """Replace the whole set with (jti, expires_at timestamp) pairs"""
+        revoked = dict(entries)
+        bloom = BloomFilter(capacity=max(len(revoked) * 2, 100000))
+        for jti in revoked:
+            bloom.add(jti)
+        with self._lock:
+            self._revoked, self._bloom = revoked, bloom
+            self._epochs = {}
+            self._epochs_version += 1
+    
+    def add(self, jti, expires_at=None):
+        with self._lock:
+            self._revoked[jti] = expires_at
+            self._bloom.add(jti)
+    
+    def is_revoked(self, jti):
+        if jti not in self._bloom:
+            return False
+        return jti in self._revoked
+    
+    def get_epoch(self, user_id):
+        """Cached (active, tokens_valid_after, profile_valid_after) of a user, or None if unknown"""
+        return self._epochs.get(user_id)
+    
+    def set_epoch(self, user_id, active, epoch, profile_epoch=None, version=None):
+        """Cache the token epoch of a user
+        
+        When ``version`` is given (the epochs_version read before querying
+        the database), the value is only stored if no epoch notification
+        arrived meanwhile, so a stale read never overwrites a newer epoch.
+        """
+        with self._lock:
+            if version is not None and version != self._epochs_version:
+                return
+            self._epochs[user_id] = (active, epoch, profile_epoch)
+            if version is None:
+                self._epochs_version += 1
+    
+    @property
+    def epochs_version(self):
+        return self._epochs_version
+    
+    def __len__(self):
+        return len(self._revoked)
+
+class RevocationListener(threading.Thread):
+    """Background thread keeping a RevocationSet in sync through LISTEN/NOTIFY
+    
+    Listens before loading the set so no revocation committed in between is
+    missed, reloads it every RELOAD_INTERVAL seconds to drop expired entries,
+    and reconnects with backoff when the connection is lost.
+    """
+    
+    def __init__(self, revocation_set):
+        super().__init__(name=f'maki_api.revocation.{revocation_set.dbname}', daemon=True)
+        self.revocation_set = revocation_set
+    
+    def _load(self, cr):
+        cr.execute("""
+            SELECT jti, EXTRACT(EPOCH FROM expires_at) FROM maki_api_token_blacklist
+            WHERE expires_at > (now() at time zone 'UTC')
+        """)
+        self.revocation_set.load(cr.fetchall())
+    
+    def _dispatch(self, payload):
+        message = json.loads(payload)
+        if message.get('type') == 'epoch':
+            self.revocation_set.set_epoch(
+                message['uid'], message['active'], message['epoch'], message.get('profile')
+            )
+        else:
+            self.revocation_set.add(message['jti'], message.get('exp'))
+    
+    def _listen(self):
+        import odoo.sql_db
+        
+        with odoo.sql_db.db_connect(self.revocation_set.dbname).cursor() as cr:
+            conn = cr._cnx
+            cr.execute(f"LISTEN {REVOCATION_CHANNEL}")
+            self._load(cr)
+            cr.commit()
+            self.revocation_set.ready = True
+            loaded_at = time.time()
+            
+            while True:
+                if select.select([conn], [], [], RELOAD_INTERVAL) != ([], [], []):
+                    conn.poll()
+                    while conn.notifies:
+                        self._dispatch(conn.notifies.pop(0).payload)
+                if time.time() - loaded_at >= RELOAD_INTERVAL:
+                    self._load(cr)
+                    cr.commit()
+                    loaded_at = time.time()
+    
+    def run(self):
+        backoff = 1
+        while True:
+            try:
+                self._listen()
+            except Exception as e:
+                _logger.warning(f"Token revocation listener for {self.revocation_set.dbname} failed: {e}")
+            backoff = 1 if self.revocation_set.ready else min(backoff * 2, 60)
+            self.revocation_set.ready = False
+            time.sleep(backoff)
+
+_states = {}
+_states_lock = threading.Lock()
+
+def get_listener(dbname):
+    """Return the revocation listener of this worker for dbname, starting it if needed
+    
+    Threads do not survive the fork of prefork workers, so the listener is
+    started lazily in each process on first use.
+    """
+    pid = os.getpid()
+    state = _states.get(dbname)
+    if state is None or state[0] != pid:
+        with _states_lock:
+            state = _states.get(dbname)
+            if state is None or state[0] != pid:
+                listener = RevocationListener(RevocationSet(dbname))
+                listener.start()
+                state = _states[dbname] = (pid, listener)
+    return state[1]
+
+def get_revocation_set(dbname):
+    return get_listener(dbname).revocation_set
+
+def notify_revocation(cr, message):
+    """Announce a revocation to every worker once the transaction commits"""
+    cr.execute("SELECT pg_notify(%s, %s)", (REVOCATION_CHANNEL, json.dumps(message)))
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+class VerifiedTokenCache:
+    """Bounded per-worker LRU of verified JWT payloads
+    
+    Entries are keyed by a hash of the database name and the raw token, so
+    tokens are never kept in memory in clear. An entry is dropped when the
+    token expires (``exp`` claim) or when it was verified more than
+    ``max_staleness`` seconds ago, which bounds how long a revocation made in
+    another worker can go unnoticed.
+    """
+    
+    def __init__(self, max_size=10000, max_staleness=30):
+        self.max_size = max_size
+        self.max_staleness = max_staleness
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _key(dbname, token):
+        return hashlib.sha256(f'{dbname}:{token}'.encode('utf-8')).digest()
+    
+    def get(self, dbname, token, now=None):
+        """Return the cached payload of a verified token, or None"""
+        now = now or time.time()
+        key = self._key(dbname, token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                payload, expires_at, verified_at = entry
+                if expires_at > now and now - verified_at <= self.max_staleness:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return payload
+                del self._entries[key]
+            self.misses += 1
+            return None
+    
+    def put(self, dbname, token, payload, now=None):
+        """Cache the payload of a token that was just fully verified"""
+        now = now or time.time()
+        expires_at = payload.get('exp') or now + self.max_staleness
+        if expires_at <= now or self.max_size <= 0:
+            return
+        key = self._key(dbname, token)
+        with self._lock:
+            self._entries[key] = (payload, expires_at, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def discard(self, dbname, token):
+        """Forget a token, e.g. when it is revoked in this worker"""
+        with self._lock:
+            self._entries.pop(self._key(dbname, token), None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self):
+        return len(self._entries)